@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""
+録音済みのWAVをマイク入力と同じ 512 サンプル単位で任意の ASR バックエンドに流し込み、
+エンジン同士を比較するためのリプレイハーネス。
+
+計測項目:
+  - partial latency: 発話開始（最初に振幅が閾値を超えた位置）を流してから最初の Partial まで
+  - final latency  : 発話終了（最後に振幅が閾値を超えた位置）を流してから Final まで
+  - RTF            : デコード時間 / 音声長（バックエンドが decode_time_sec を報告する場合）
+  - CPU / audio sec: プロセスのCPU時間 / 流した音声の秒数
+
+使い方:
+    python benchmarks/asr_replay.py path/to/wavs --backend tiny --device cpu [--speed 2.0] [--vad]
+    python benchmarks/asr_replay.py path/to/wavs --backend mock
+
+chrome バックエンドはブラウザがマイクを直接認識し、add_audio に流した音声は件数を数えるだけなので、
+WAV をリプレイできない（指定するとエラーで終了する）。
+"""
+import os
+import sys
+import time
+import glob
+import wave
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+CHUNK = 512
+
+
+def load_wav_16k(path):
+    """WAVを 16kHz モノラル float32 に変換して返す"""
+    with wave.open(path, "rb") as wf:
+        channels = wf.getnchannels()
+        width = wf.getsampwidth()
+        rate = wf.getframerate()
+        raw = wf.readframes(wf.getnframes())
+    if width == 2:
+        audio = np.frombuffer(raw, dtype=np.int16).astype(np.float32) / 32768.0
+    elif width == 4:
+        audio = np.frombuffer(raw, dtype=np.int32).astype(np.float32) / 2147483648.0
+    elif width == 1:
+        audio = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    else:
+        raise ValueError(f"Unsupported sample width: {width}")
+    if channels > 1:
+        audio = audio.reshape(-1, channels).mean(axis=1)
+    if rate != SAMPLE_RATE:
+        n = int(len(audio) * SAMPLE_RATE / rate)
+        audio = np.interp(np.linspace(0, len(audio) - 1, n), np.arange(len(audio)), audio).astype(np.float32)
+    return audio
+
+
+def find_speech_bounds(audio, threshold=0.01, frame=480):
+    """平均振幅が閾値を超えた最初のフレームの先頭と、最後のフレームの終端（サンプル位置）"""
+    n = len(audio) // frame
+    if n == 0:
+        return 0, len(audio)
+    levels = np.abs(audio[:n * frame]).reshape(n, frame).mean(axis=1)
+    voiced = np.nonzero(levels > threshold)[0]
+    if not len(voiced):
+        return 0, len(audio)
+    return int(voiced[0] * frame), int((voiced[-1] + 1) * frame)
+
+
+def to_int16(audio):
+    return (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16)
+
+
+def replay_file(feed, audio, speed=1.0, tail_sec=4.0):
+    """
+    audio を実時間の speed 倍のペースで feed(chunk_float32) に渡し、続けて無音を tail_sec 秒流す。
+    発話開始・終了位置のチャンクを流した時刻 (perf_counter) を返す。
+    """
+    speech_start, speech_end = find_speech_bounds(audio)
+    padded = np.concatenate([audio, np.zeros(int(SAMPLE_RATE * tail_sec), dtype=np.float32)])
+    interval = CHUNK / SAMPLE_RATE / speed
+    speech_start_time = None
+    speech_end_time = None
+    start = time.perf_counter()
+    for i, pos in enumerate(range(0, len(padded) - CHUNK + 1, CHUNK)):
+        target = start + i * interval
+        delay = target - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        feed(padded[pos:pos + CHUNK])
+        now = time.perf_counter()
+        if speech_start_time is None and pos + CHUNK > speech_start:
+            speech_start_time = now
+        if speech_end_time is None and pos + CHUNK >= speech_end:
+            speech_end_time = now
+    return speech_start_time, speech_end_time
+
+
+def _summary(values):
+    if not values:
+        return "n/a"
+    arr = np.array(values) * 1000
+    return f"mean {arr.mean():.0f} ms, p50 {np.percentile(arr, 50):.0f} ms, p95 {np.percentile(arr, 95):.0f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="WAVファイル、またはWAVを含むディレクトリ")
+    parser.add_argument("--backend", default="tiny", help="large / tiny / mock（asr_engine 設定と同じ値。chrome は不可）")
+    parser.add_argument("--model", default=None, help="faster-whisper のモデルを直接指定する")
+    parser.add_argument("--device", default=None, help="auto / cuda / cpu")
+    parser.add_argument("--compute-type", default=None)
+    parser.add_argument("--cpu-threads", type=int, default=None)
+    parser.add_argument("--mode", default="local_agreement", choices=["local_agreement", "full"])
+    parser.add_argument("--decode-interval", type=float, default=0.2)
+    parser.add_argument("--speed", type=float, default=1.0, help="再生速度の倍率（1.0 = 実時間）")
+    parser.add_argument("--tail", type=float, default=4.0, help="各ファイルの後に流す無音（秒）")
+    parser.add_argument("--vad", action="store_true", help="VADGate を通して流す")
+    args = parser.parse_args()
+    if args.backend == "chrome":
+        # ブラウザ側で認識するため流し込んだ WAV は使われず、計測値が意味を持たない
+        parser.error("the chrome backend recognizes the browser microphone and cannot replay WAV files")
+
+    from scripts.asr_backend import create_asr_backend
+    from scripts.vad_gate import VADGate
+
+    files = sorted(glob.glob(os.path.join(args.path, "*.wav"))) if os.path.isdir(args.path) else [args.path]
+    overrides = {"asr_streaming_mode": args.mode, "asr_decode_interval": args.decode_interval}
+    if args.model:
+        overrides["model_size"] = args.model
+    if args.device:
+        overrides["asr_device"] = args.device
+    if args.cpu_threads is not None:
+        overrides["asr_cpu_threads"] = args.cpu_threads
+    if args.compute_type:
+        overrides["asr_compute_type"] = args.compute_type
+    backend = create_asr_backend(args.backend, **overrides)
+
+    partials = []
+    finals = []
+    final_event = threading.Event()
+
+    def on_result(text, is_final):
+        if is_final:
+            finals.append((time.perf_counter(), text))
+            final_event.set()
+        else:
+            partials.append((time.perf_counter(), text))
+
+    backend.start(on_result)
+    if args.vad:
+        gate = VADGate(backend.add_audio)
+        feed = lambda chunk: gate.process(to_int16(chunk))
+    else:
+        gate = None
+        feed = backend.add_audio
+
+    partial_latencies = []
+    final_latencies = []
+    audio_sec = 0.0
+    cpu_start = time.process_time()
+    for path in files:
+        audio = load_wav_16k(path)
+        audio_sec += len(audio) / SAMPLE_RATE
+        final_event.clear()
+        partials.clear()
+        finals.clear()
+        speech_start_time, speech_end_time = replay_file(feed, audio, speed=args.speed, tail_sec=args.tail)
+        final_event.wait(timeout=10)
+        first_partial = next((t for t, _ in partials if t >= speech_start_time), None)
+        if first_partial:
+            partial_latencies.append(first_partial - speech_start_time)
+        if finals and speech_end_time:
+            latency = finals[0][0] - speech_end_time
+            final_latencies.append(latency)
+            print(f"{os.path.basename(path)}: end-of-speech -> final {latency * 1000:7.0f} ms | {finals[0][1]}")
+        else:
+            print(f"{os.path.basename(path)}: no final result")
+    cpu_sec = time.process_time() - cpu_start
+
+    backend.stop()
+    stats = backend.get_stats()
+    print(f"\nbackend: {args.backend} ({len(files)} files, {audio_sec:.1f}s of audio, speed x{args.speed})")
+    print(f"partial latency: {_summary(partial_latencies)}")
+    print(f"final latency  : {_summary(final_latencies)}")
+    if stats.get("decode_time_sec") is not None and stats.get("received_sec"):
+        print(f"RTF            : {stats['decode_time_sec'] / stats['received_sec']:.3f} (decode time / received audio)")
+    print(f"CPU / audio sec: {cpu_sec / audio_sec:.3f}" if audio_sec else "CPU / audio sec: n/a")
+    print(f"backend stats  : {stats}")
+    if gate:
+        print(f"vad gate stats : {gate.get_stats()}")
+
+
+if __name__ == "__main__":
+    main()
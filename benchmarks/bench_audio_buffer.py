@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+StreamTranscriber の音声バッファに 60 秒分の合成音声（16kHz, 512サンプル単位）を流し込み、
+np.concatenate による追記と GrowableAudioBuffer の追記を比較するベンチマーク。
+
+  - append only     : 発話が60秒続いた場合（確定・消費なし）
+  - append + consume: LocalAgreement で 1 秒ごとに先頭 0.8 秒を確定して捨てる場合
+
+使い方:
+    python benchmarks/bench_audio_buffer.py [--seconds 60] [--repeat 5]
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from scripts.audio_buffer import GrowableAudioBuffer
+
+SAMPLE_RATE = 16000
+CHUNK = 512
+
+
+def make_chunks(seconds):
+    rng = np.random.default_rng(0)
+    total = SAMPLE_RATE * seconds
+    audio = (rng.standard_normal(total) * 0.1).astype(np.float32)
+    return [audio[i:i + CHUNK] for i in range(0, total, CHUNK)]
+
+
+def run_concatenate(chunks, consume):
+    buffer = np.array([], dtype=np.float32)
+    received = 0
+    copied = 0
+    for chunk in chunks:
+        buffer = np.concatenate([buffer, chunk])
+        copied += len(buffer)
+        received += len(chunk)
+        if consume and received % SAMPLE_RATE < CHUNK:
+            buffer = buffer[int(SAMPLE_RATE * 0.8):]
+    return len(buffer), copied
+
+
+def run_growable(chunks, consume):
+    buffer = GrowableAudioBuffer(SAMPLE_RATE * 30)
+    received = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        received += len(chunk)
+        if consume and received % SAMPLE_RATE < CHUNK:
+            buffer.consume(int(SAMPLE_RATE * 0.8))
+    return len(buffer), buffer.capacity
+
+
+def bench(func, chunks, consume, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(chunks, consume)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=int, default=60)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    chunks = make_chunks(args.seconds)
+    print(f"{args.seconds}s of audio in {len(chunks)} chunks of {CHUNK} samples")
+    for consume in (False, True):
+        label = "append + consume" if consume else "append only"
+        t_cat, (len_cat, copied) = bench(run_concatenate, chunks, consume, args.repeat)
+        t_grow, (len_grow, capacity) = bench(run_growable, chunks, consume, args.repeat)
+        assert len_cat == len_grow
+        print(f"[{label}]")
+        print(f"  np.concatenate      : {t_cat * 1000:8.1f} ms  ({copied * 4 / 1e6:.0f} MB copied)")
+        print(f"  GrowableAudioBuffer : {t_grow * 1000:8.1f} ms  (final capacity {capacity / SAMPLE_RATE:.0f}s)")
+        print(f"  per chunk           : {t_cat / len(chunks) * 1e6:.1f} us -> {t_grow / len(chunks) * 1e6:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+TTS再生時の音量調整コストを 44.1kHz / 1024 フレームのチャンク単位で比較するベンチマーク。
+
+旧経路: チャンクごとに frombuffer -> astype(float32) -> *= volume -> clip -> astype(int16) -> tobytes
+新経路: 1文全体をデコードして GainStage で一度だけ音量を掛け（作業バッファは使い回し）、
+        bytes にしてからチャンクを切り出す（PyAudio の write は bytes しか受け付けない）
+
+各形式（8/16/24/32bit 整数）の新経路と、旧経路が対応していた 8/16bit を計測する。
+1チャンクあたりの時間は「1文分の処理時間 / チャンク数」。
+
+使い方:
+    python benchmarks/bench_gain.py [--seconds 5] [--repeat 20] [--volume 0.5]
+"""
+import io
+import os
+import sys
+import time
+import wave
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from scripts.audio_output import GainStage, decode_wav
+
+RATE = 44100
+CHUNK = 1024
+
+
+def make_wav(seconds, width):
+    rng = np.random.default_rng(0)
+    x = np.clip(rng.standard_normal(RATE * seconds) * 0.2, -1.0, 1.0)
+    if width == 1:
+        raw = (x * 127 + 128).astype(np.uint8).tobytes()
+    elif width == 2:
+        raw = (x * 32767).astype(np.int16).tobytes()
+    elif width == 3:
+        i = (x * 8388607).astype(np.int32)
+        raw = np.stack([i & 255, (i >> 8) & 255, (i >> 16) & 255], axis=1).astype(np.uint8).tobytes()
+    else:
+        raw = (x * 2147483647).astype(np.int32).tobytes()
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(width)
+        wf.setframerate(RATE)
+        wf.writeframes(raw)
+    return buf.getvalue()
+
+
+def legacy_play(wav_data, volume, sink):
+    """旧 play_wav_data の音量調整部分"""
+    wf = wave.open(io.BytesIO(wav_data), "rb")
+    sample_width = wf.getsampwidth()
+    data = wf.readframes(CHUNK)
+    while data:
+        if volume != 1.0:
+            if sample_width == 2:
+                audio_array = np.frombuffer(data, dtype=np.int16).astype(np.float32)
+                audio_array *= volume
+                audio_array = np.clip(audio_array, -32768, 32767)
+                data = audio_array.astype(np.int16).tobytes()
+            elif sample_width == 1:
+                audio_array = np.frombuffer(data, dtype=np.uint8).astype(np.float32)
+                audio_array = (audio_array - 128) * volume + 128
+                audio_array = np.clip(audio_array, 0, 255)
+                data = audio_array.astype(np.uint8).tobytes()
+        sink(data)
+        data = wf.readframes(CHUNK)
+
+
+def make_new_play(gain):
+    def new_play(wav_data, volume, sink):
+        samples, _ = decode_wav(wav_data)
+        data = gain.apply(samples, volume).tobytes()
+        block = CHUNK * 2
+        for pos in range(0, len(data), block):
+            sink(data[pos:pos + block])
+    return new_play
+
+
+def measure(func, wav_data, volume, repeat, chunks):
+    sink = lambda data: None
+    func(wav_data, volume, sink)  # 作業バッファの確保を済ませる
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(wav_data, volume, sink)
+        best = min(best, time.perf_counter() - start)
+
+    # 1文を処理する間の一時確保量のピーク（tracemalloc）
+    tracemalloc.start()
+    base, _ = tracemalloc.get_traced_memory()
+    func(wav_data, volume, sink)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best / chunks * 1e6, (peak - base) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--volume", type=float, default=0.5)
+    args = parser.parse_args()
+
+    chunks = RATE * args.seconds // CHUNK
+    gain = GainStage()
+    new_play = make_new_play(gain)
+    print(f"{args.seconds}s @ {RATE}Hz, {chunks} chunks of {CHUNK} frames, volume {args.volume}")
+    print(f"{'format':<12}{'path':<8}{'us/chunk':>10}{'peak KiB':>10}")
+    for width, label in ((1, "8bit"), (2, "16bit"), (3, "24bit"), (4, "32bit")):
+        wav_data = make_wav(args.seconds, width)
+        if width in (1, 2):
+            us, peak = measure(legacy_play, wav_data, args.volume, args.repeat, chunks)
+            print(f"{label:<12}{'legacy':<8}{us:>10.2f}{peak:>10.0f}")
+        us, peak = measure(new_play, wav_data, args.volume, args.repeat, chunks)
+        print(f"{label:<12}{'new':<8}{us:>10.2f}{peak:>10.0f}")
+
+    wav_data = make_wav(args.seconds, 2)
+    us, peak = measure(new_play, wav_data, 1.0, args.repeat, chunks)
+    print(f"{'16bit x1.0':<12}{'new':<8}{us:>10.2f}{peak:>10.0f}  (fast path)")
+
+
+if __name__ == "__main__":
+    main()
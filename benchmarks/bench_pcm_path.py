@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+マイク入力1コールバック分（512フレーム）のPCM受け渡しコストを比較するマイクロベンチマーク。
+
+旧経路: struct.unpack_from でタプル化 + astype/除算で float32 化 + np.abs().mean() でメーター計算
+新経路: リングバッファへコピー + 作業バッファへの int16→float32 変換 + 作業バッファでのメーター計算
+（Porcupine 本体の推論コストは両経路で同じなので含めない）
+
+使い方:
+    python benchmarks/bench_pcm_path.py [--iterations 20000]
+"""
+import os
+import sys
+import time
+import struct
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from scripts.audio_buffer import AudioRingBuffer, PorcupineFrameProcessor, int16_to_float32, mean_abs
+
+CHUNK = 512
+
+
+def legacy_callback(in_data):
+    pcm = struct.unpack_from("h" * CHUNK, in_data)
+    audio_float = np.frombuffer(in_data, dtype=np.int16).astype(np.float32) / 32768.0
+    vol = np.abs(np.frombuffer(in_data, dtype=np.int16)).mean()
+    return pcm, audio_float, vol
+
+
+class _FakePorcupine:
+    """ポインタ受け渡しのコストだけを測るため、ネイティブ関数の代わりに何もしない関数を持つ"""
+    frame_length = CHUNK
+    _handle = None
+
+    @staticmethod
+    def _process_func(handle, pcm_ptr, result_ref):
+        return 0
+
+
+def make_new_path():
+    ring = AudioRingBuffer(CHUNK, capacity=128)
+    porcupine_frame = np.zeros(CHUNK, dtype=np.int16)
+    listener_frame = np.zeros(CHUNK, dtype=np.int16)
+    meter_frame = np.zeros(CHUNK, dtype=np.int16)
+    listener_scratch = np.empty(CHUNK, dtype=np.float32)
+    meter_scratch = np.empty(CHUNK, dtype=np.float32)
+    processor = PorcupineFrameProcessor(_FakePorcupine())
+
+    def new_callback(in_data):
+        # コールバック: コピーのみ
+        ring.write(in_data)
+        slot = ring.frames[(ring.write_seq - 1) % ring.capacity]
+        # 各コンシューマー: 自分の作業バッファへコピーしてから処理
+        np.copyto(porcupine_frame, slot)
+        idx = processor.process(porcupine_frame)
+        np.copyto(listener_frame, slot)
+        audio_float = int16_to_float32(listener_frame, listener_scratch)
+        np.copyto(meter_frame, slot)
+        vol = mean_abs(meter_frame, meter_scratch)
+        return idx, audio_float, vol
+
+    return new_callback
+
+
+def make_ring_write_only():
+    """新経路のうち、リアルタイムコールバックスレッドで実行される部分だけ"""
+    ring = AudioRingBuffer(CHUNK, capacity=128)
+    return ring.write
+
+
+def measure(func, payloads, iterations):
+    # 時間
+    start = time.perf_counter()
+    for i in range(iterations):
+        func(payloads[i % len(payloads)])
+    elapsed = time.perf_counter() - start
+
+    # 1回あたりの確保量（tracemalloc のピーク差分）と、呼び出し後も残る確保ブロック数
+    sample = min(iterations, 2000)
+    tracemalloc.start()
+    peak_total = 0
+    blocks_total = 0
+    for i in range(sample):
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        snap_before = tracemalloc.take_snapshot() if i == 0 else None
+        result = func(payloads[i % len(payloads)])
+        if snap_before is not None:
+            snap_after = tracemalloc.take_snapshot()
+            blocks_total = sum(max(0, s.count_diff) for s in snap_after.compare_to(snap_before, "lineno"))
+        _, peak = tracemalloc.get_traced_memory()
+        peak_total += peak - before
+        del result
+    tracemalloc.stop()
+
+    return {
+        "us_per_call": elapsed / iterations * 1e6,
+        "bytes_per_call": peak_total / sample,
+        "live_blocks_per_call": blocks_total,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    payloads = [rng.integers(-8000, 8000, CHUNK, dtype=np.int16).tobytes() for _ in range(64)]
+
+    results = {
+        "legacy": measure(legacy_callback, payloads, args.iterations),
+        "ring + scratch": measure(make_new_path(), payloads, args.iterations),
+        "  callback only": measure(make_ring_write_only(), payloads, args.iterations),
+    }
+
+    # 旧経路はすべてコールバック内で実行されていた。新経路の合計はコンシューマースレッド側の処理を含む
+    print(f"{'path':<16}{'us/call':>10}{'bytes/call':>14}{'alloc blocks/call':>18}")
+    for name, r in results.items():
+        print(f"{name:<16}{r['us_per_call']:>10.2f}{r['bytes_per_call']:>14.0f}{r['live_blocks_per_call']:>18}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+TTSサーバーへの1文あたりのHTTPオーバーヘッドを、ローカルに立てた代役サーバーで計測するベンチマーク。
+代役サーバーは /audio_query と /synthesis に即座に応答する（合成時間はゼロ）ので、
+計測値はほぼ接続・リクエスト処理のコストだけになる。
+
+  - fresh x2   : 旧実装。requests.post を2回（毎回新しいTCP接続）
+  - pooled x2  : 共有 Session（keep-alive）で /audio_query + /synthesis（VOICEVOX）
+  - pooled x1  : 共有 Session でクエリをクライアント側で作り /synthesis のみ（Style-Bert-VITS2）
+
+使い方:
+    python benchmarks/bench_tts_http.py [--sentences 200]
+"""
+import io
+import os
+import sys
+import json
+import time
+import wave
+import argparse
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+from scripts import tts_http
+from scripts.tts_engines import StyleBertVits2Engine
+
+
+def make_wav(seconds=0.5, rate=44100):
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(rate)
+        wf.writeframes(b"\x00\x00" * int(rate * seconds))
+    return buf.getvalue()
+
+
+WAV = make_wav()
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """VOICEVOX互換の最小サーバー（keep-alive 対応のため HTTP/1.1 で応答する）"""
+    protocol_version = "HTTP/1.1"
+    # ヘッダとボディを別々に書くため、Nagle を切らないと keep-alive 時に遅延ACK待ちが入る
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        if length:
+            self.rfile.read(length)
+        path = urllib.parse.urlparse(self.path).path
+        if path == "/audio_query":
+            query = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+            body = json.dumps({"text": query.get("text", [""])[0], "speedScale": 1.0}).encode("utf-8")
+            content_type = "application/json"
+        else:
+            body = WAV
+            content_type = "audio/wav"
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def fresh_two_calls(base_url, text):
+    encoded_text = urllib.parse.quote(text)
+    r = requests.post(f"{base_url}/audio_query?text={encoded_text}&speaker=0", timeout=10)
+    r.raise_for_status()
+    r = requests.post(f"{base_url}/synthesis?speaker=0", json=r.json(), timeout=60)
+    r.raise_for_status()
+    return r.content
+
+
+def pooled_two_calls(base_url, text):
+    r = tts_http.post(base_url, "/audio_query", 10, params={"text": text, "speaker": 0})
+    r = tts_http.post(base_url, "/synthesis", 60, params={"speaker": 0}, json=r.json())
+    return r.content
+
+
+def pooled_one_call(base_url, text, engine=StyleBertVits2Engine()):
+    r = tts_http.post(base_url, "/synthesis", 60, params={"speaker": 0}, json=engine.build_query(text))
+    return r.content
+
+
+def measure(func, base_url, sentences):
+    func(base_url, "ウォームアップ")
+    samples = []
+    for i in range(sentences):
+        start = time.perf_counter()
+        data = func(base_url, f"テスト文その{i}ですわん。")
+        samples.append(time.perf_counter() - start)
+        assert data == WAV
+    samples.sort()
+    return sum(samples) / len(samples) * 1000, samples[len(samples) // 2] * 1000, samples[int(len(samples) * 0.95)] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sentences", type=int, default=200)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    print(f"{args.sentences} sentences against {base_url} (stand-in server, zero synthesis time)")
+    print(f"{'path':<12}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for name, func in (("fresh x2", fresh_two_calls), ("pooled x2", pooled_two_calls), ("pooled x1", pooled_one_call)):
+        mean, p50, p95 = measure(func, base_url, args.sentences)
+        print(f"{name:<12}{mean:>10.2f}{p50:>10.2f}{p95:>10.2f}")
+    tts_http.close_sessions()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
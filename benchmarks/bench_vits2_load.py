@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+起動中の Style-Bert-VITS2 ブリッジサーバー (scripts/vits2_server.py) に同時リクエストを送る負荷ベンチマーク。
+/synthesis を --concurrency 並列で --requests 回投げてスループットとレイテンシ (p50/p95) を出し、
+同時に /speakers を定期的に叩いて、合成中にイベントループが止まっていないか（応答時間）を計測する。
+
+マイクロバッチの効果を見るときは、サーバーを --batch-window-ms 付きで起動して比較する:
+    python scripts/vits2_server.py                       # バッチなし
+    python scripts/vits2_server.py --batch-window-ms 5   # 5 ms 以内に届いた短文をまとめる
+
+使い方:
+    python benchmarks/bench_vits2_load.py [--url http://127.0.0.1:50021] [--speaker 0]
+                                          [--concurrency 8] [--requests 64] [--stream]
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+from scripts.tts_engines import StyleBertVits2Engine
+
+SENTENCES = [
+    "こんにちは！",
+    "今日はいい天気ですね。",
+    "そのボス、かなり手強そうですわん。",
+    "回復アイテムを先に使った方がいいと思います。",
+    "なるほど、そういう作戦もありですね。",
+    "うわっ、危なかった！",
+    "次のエリアに進む前にセーブしておきましょう。",
+    "それは見逃せないポイントですわん。",
+]
+
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))] if samples else float("nan")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:50021")
+    parser.add_argument("--speaker", type=int, default=0)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--stream", action="store_true", help="/synthesis_stream を使う（最初のPCMまでの時間も計測）")
+    args = parser.parse_args()
+
+    engine = StyleBertVits2Engine(speaker_id=args.speaker, base_url=args.url)
+    path = "/synthesis_stream" if args.stream else "/synthesis"
+    session = requests.Session()
+    session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=args.concurrency + 1))
+
+    # モデルのロードと暖機はサーバー側で済ませておく
+    session.post(f"{args.url}/initialize", params={"speaker": args.speaker}, timeout=600).raise_for_status()
+
+    def one(i):
+        text = SENTENCES[i % len(SENTENCES)]
+        start = time.perf_counter()
+        first = None
+        received = 0
+        with session.post(f"{args.url}{path}", params={"speaker": args.speaker},
+                          json=engine.build_query(text), timeout=120, stream=True) as r:
+            status = r.status_code
+            for block in r.iter_content(8192):
+                received += len(block)
+                # ストリーミングではWAVヘッダ（44バイト）の後の最初のPCMが届いた時刻
+                if first is None and received > 44:
+                    first = time.perf_counter() - start
+        return status, time.perf_counter() - start, first
+
+    probes = []
+    done = threading.Event()
+
+    def probe():
+        while not done.is_set():
+            start = time.perf_counter()
+            try:
+                session.get(f"{args.url}/speakers", timeout=30)
+                probes.append(time.perf_counter() - start)
+            except requests.RequestException:
+                pass
+            time.sleep(0.1)
+
+    prober = threading.Thread(target=probe, daemon=True)
+    prober.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(one, range(args.requests)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    prober.join()
+
+    ok = [r for r in results if r[0] == 200]
+    latencies = [r[1] for r in ok]
+    print(f"{args.requests} requests to {path}, concurrency {args.concurrency}")
+    print(f"  ok {len(ok)}, rejected (503) {sum(r[0] == 503 for r in results)}, "
+          f"errors {sum(r[0] not in (200, 503) for r in results)}")
+    print(f"  throughput   {len(ok) / elapsed:8.2f} req/s")
+    print(f"  latency      p50 {percentile(latencies, 0.5) * 1000:8.1f} ms   p95 {percentile(latencies, 0.95) * 1000:8.1f} ms")
+    if args.stream:
+        firsts = [r[2] for r in ok if r[2] is not None]
+        print(f"  first PCM    p50 {percentile(firsts, 0.5) * 1000:8.1f} ms   p95 {percentile(firsts, 0.95) * 1000:8.1f} ms")
+    print(f"  /speakers    p50 {percentile(probes, 0.5) * 1000:8.1f} ms   max {max(probes, default=0) * 1000:8.1f} ms "
+          f"({len(probes)} probes)")
+    try:
+        print(f"  scheduler    {session.get(f'{args.url}/scheduler_stats', timeout=5).json()}")
+    except (requests.RequestException, ValueError):
+        pass
+
+
+if __name__ == "__main__":
+    main()
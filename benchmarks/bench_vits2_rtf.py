@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+Style-Bert-VITS2 の推論バックエンドごとの実時間係数 (RTF = 合成時間 / 音声の長さ) を比較するベンチマーク。
+scripts/vits2_server.py のモデル構築をそのまま使い、バックエンドごとに別プロセスで
+モデルをロード・暖機してから、同じ文を --repeat 回ずつ合成する（1未満なら実時間より速い）。
+特徴量キャッシュは無効にするので、BERT の計算も毎回含まれる。
+
+    torch      PyTorch（GPU があれば CUDA）
+    onnx       ONNX Runtime (CPU, fp32)
+    onnx-int8  ONNX Runtime (CPU, Generator と BERT を int8 動的量子化)
+
+初回の onnx / onnx-int8 はモデルの ONNX 変換（と量子化）を行うので、その時間は load に含まれる（RTF には含まない）。
+
+使い方:
+    python benchmarks/bench_vits2_rtf.py [--speaker 0] [--backends torch onnx onnx-int8]
+                                         [--threads 4] [--repeat 3]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SENTENCES = [
+    "こんにちは！",
+    "今日はいい天気ですね。",
+    "そのボス、かなり手強そうですわん。",
+    "回復アイテムを先に使った方がいいと思います。",
+    "次のエリアに進む前に、装備を整えてセーブしておきましょう。",
+    "なるほど、そういう作戦もありですね。でも、敵の数が多いので気をつけてください。",
+]
+
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))] if samples else float("nan")
+
+
+def run_worker(args):
+    """1つのバックエンドで計測して結果を JSON で標準出力に書く（子プロセス側）"""
+    # サーバーと同じくリポジトリのルートからの相対パスでモデルを探す
+    os.chdir(ROOT)
+    from scripts import vits2_server as server
+
+    backend, _, variant = args.worker.partition("-")
+    server.backend_options.update(backend=backend, threads=args.threads, int8=variant == "int8")
+    server.feature_cache.configure(memory_mb=0, cache_dir="", disk_mb=0)
+    server.scan_models()
+
+    start = time.perf_counter()
+    model = server.ensure_model_loaded(args.speaker)
+    load_sec = time.perf_counter() - start
+
+    latencies = []
+    synth_sec = 0.0
+    audio_sec = 0.0
+    for _ in range(args.repeat):
+        for text in SENTENCES:
+            start = time.perf_counter()
+            sr, wav = model.infer(text=text, language=server.Languages.JP, speaker_id=0,
+                                  length=server.length_from_speed(1.0), **server.INFER_PARAMS)
+            elapsed = time.perf_counter() - start
+            latencies.append(elapsed)
+            synth_sec += elapsed
+            audio_sec += len(wav) / sr
+    print(json.dumps({
+        "backend": args.worker,
+        "resolved": "onnx" if isinstance(model, server.OnnxTTSModel) else "torch",
+        "load_sec": load_sec,
+        "rtf": synth_sec / audio_sec if audio_sec else float("nan"),
+        "p50": percentile(latencies, 0.5),
+        "p95": percentile(latencies, 0.95),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--speaker", type=int, default=0)
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "onnx-int8"],
+                        choices=["torch", "onnx", "onnx-int8"])
+    parser.add_argument("--threads", type=int, default=0, help="CPU 推論のスレッド数（0 でライブラリの既定値）")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    print(f"{len(SENTENCES)} sentences x {args.repeat}, speaker {args.speaker}, threads {args.threads or 'default'}")
+    print(f"  {'backend':<10} {'load':>8} {'RTF':>7} {'p50':>9} {'p95':>9}")
+    for backend in args.backends:
+        # スレッド設定や BERT の差し替えが混ざらないよう、バックエンドごとに別プロセスで測る
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--worker", backend, "--speaker", str(args.speaker),
+             "--threads", str(args.threads), "--repeat", str(args.repeat)],
+            capture_output=True, text=True)
+        lines = proc.stdout.strip().splitlines()
+        if proc.returncode != 0 or not lines:
+            print(f"  {backend:<10} failed: {proc.stderr.strip().splitlines()[-1:] or proc.returncode}")
+            continue
+        r = json.loads(lines[-1])
+        note = "" if r["resolved"] == backend.partition("-")[0] else f"  (fell back to {r['resolved']})"
+        print(f"  {backend:<10} {r['load_sec']:7.1f}s {r['rtf']:7.3f} {r['p50'] * 1000:7.0f}ms {r['p95'] * 1000:7.0f}ms{note}")
+
+
+if __name__ == "__main__":
+    main()
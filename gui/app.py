@@ -124,6 +124,9 @@ class GameAssistantApp:
         
         self.settings_manager = SettingsManager()
         self.state = AppState(self.root, self.settings_manager)
+        # TTSエンジンの設定はメモリ上の設定から取得し、変更は通知で反映する
+        voice.bind_settings(self.settings_manager)
+        voice.preload_earcons(self.settings_manager)
         self.cleanup_temp_files()
         
         self._init_services()
@@ -144,7 +147,10 @@ class GameAssistantApp:
         
         self.tts_manager = TTSManager(
             on_playback_start=lambda: self.root.after(0, lambda: self.update_status('tts', True)),
-            on_playback_end=self._on_tts_playback_finished
+            on_playback_end=self._on_tts_playback_finished,
+            crossfade_ms=int(self.settings_manager.get("tts_crossfade_ms", 30)),
+            synthesis_workers=int(self.settings_manager.get("tts_synthesis_workers", 2)),
+            max_ahead=int(self.settings_manager.get("tts_max_ahead", 3))
         )
         self.tts_manager.start()
 
@@ -268,7 +274,7 @@ class GameAssistantApp:
 
     def on_closing(self):
         self.cleanup_temp_files(); self.stop_vits2_server()
-        self.memory_manager.stop(); self.tts_manager.stop(); self.root.destroy()
+        self.memory_manager.stop(); self.tts_manager.stop(); voice.close_earcons(); self.root.destroy()
 
     def cleanup_temp_files(self):
         for f in glob.glob("temp_recording_*.wav"):
@@ -410,17 +416,30 @@ class GameAssistantApp:
             except: pass
         threading.Thread(target=_req, daemon=True).start()
     def refresh_vits2_models(self):
-        def _f():
-            import requests
-            for _ in range(10):
-                try:
-                    r = requests.get("http://localhost:50021/speakers", timeout=2)
-                    if r.status_code == 200:
-                        self.vits2_speakers = r.json(); names = [s['name'] for s in self.vits2_speakers]
-                        self.root.after(0, lambda: self._update_vits2_dropdown(names)); self.pre_load_vits2_model(self.state.vits2_speaker_id.get()); return
-                except: pass
-                time.sleep(1)
-        threading.Thread(target=_f, daemon=True).start()
+        # 話者一覧はサーバーが起動すればすぐ返るので1回だけ取り、準備完了は /health/stream の通知で受け取る
+        if getattr(self, 'vits2_watcher', None) and self.vits2_watcher.is_alive(): return
+        self.vits2_watcher = threading.Thread(target=self._watch_vits2_server, daemon=True); self.vits2_watcher.start()
+    def _watch_vits2_server(self):
+        import requests
+        base = "http://localhost:50021"; self.state.is_vits2_ready = False
+        for _ in range(60):  # サーバープロセスがポートを開くまでの接続待ち
+            try:
+                with requests.get(f"{base}/health/stream", stream=True, timeout=(2, 60)) as r:
+                    self.vits2_speakers = requests.get(f"{base}/speakers", timeout=5).json(); names = [s['name'] for s in self.vits2_speakers]
+                    self.root.after(0, lambda: self._update_vits2_dropdown(names))
+                    if r.status_code == 404: self.state.is_vits2_ready = True; self.pre_load_vits2_model(self.state.vits2_speaker_id.get()); return  # /health の無い旧サーバー
+                    message = None
+                    for line in r.iter_lines(decode_unicode=True):
+                        if not line or not line.startswith("data:"): continue
+                        h = json.loads(line[5:])
+                        if h['message'] != message: message = h['message']; logging.info(f"VITS2: {message} ({h['progress']:.0%})")
+                        if h['status'] == 'error': logging.error(f"VITS2サーバーの準備に失敗しました: {h['message']}"); return
+                        if h['status'] == 'ready': self.state.is_vits2_ready = True; self.pre_load_vits2_model(self.state.vits2_speaker_id.get()); return
+                        if h['status'] == 'idle': self.pre_load_vits2_model(self.state.vits2_speaker_id.get())  # 起動時に読み込まないサーバーには読み込みを依頼する
+                return
+            except requests.ConnectionError: time.sleep(0.5)
+            except Exception as e: logging.warning(f"VITS2サーバーの状態を取得できませんでした: {e}"); return
+        logging.warning("VITS2サーバーに接続できませんでした。")
     def _update_vits2_dropdown(self, n):
         if hasattr(self, 'vits2_model_dropdown') and self.vits2_model_dropdown.winfo_exists(): self.vits2_model_dropdown.config(values=n); self.vits2_model_dropdown.set(n[0] if n else "")
     def start_vits2_server(self):
@@ -428,7 +447,7 @@ class GameAssistantApp:
             try:
                 self.vits2_job = win32job.CreateJobObject(None, ""); info = win32job.QueryInformationJobObject(self.vits2_job, win32job.JobObjectExtendedLimitInformation)
                 info['BasicLimitInformation']['LimitFlags'] = win32job.JOB_OBJECT_LIMIT_KILL_ON_JOB_CLOSE; win32job.SetInformationJobObject(self.vits2_job, win32job.JobObjectExtendedLimitInformation, info)
-                self.vits2_server_process = subprocess.Popen([sys.executable, "scripts/vits2_server.py"], creationflags=subprocess.CREATE_NO_WINDOW | win32con.HIGH_PRIORITY_CLASS); win32job.AssignProcessToJobObject(self.vits2_job, self.vits2_server_process._handle)
+                self.vits2_server_process = subprocess.Popen([sys.executable, "scripts/vits2_server.py", "--default-speaker", str(self.state.vits2_speaker_id.get())], creationflags=subprocess.CREATE_NO_WINDOW | win32con.HIGH_PRIORITY_CLASS); win32job.AssignProcessToJobObject(self.vits2_job, self.vits2_server_process._handle)
             except: pass
     def stop_vits2_server(self): (self.vits2_server_process.terminate() if self.vits2_server_process else None); self.vits2_server_process = None
     def _write_log(self, record, from_history=False):
@@ -107,6 +107,7 @@ class SettingsWindow(tk.Toplevel):
         asr_frame.pack(fill=X, pady=(0, 10))
         ttk.Radiobutton(asr_frame, text="LARGE (High Accuracy)", variable=self.app.state.asr_engine, value="large").pack(anchor="w", pady=2)
         ttk.Radiobutton(asr_frame, text="TINY (Lightweight)", variable=self.app.state.asr_engine, value="tiny").pack(anchor="w", pady=2)
+        ttk.Radiobutton(asr_frame, text="CHROME (Web Speech API)", variable=self.app.state.asr_engine, value="chrome").pack(anchor="w", pady=2)
 
         ttk.Separator(tab, orient="horizontal").pack(fill=X, pady=15)
 
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+import logging
+import threading
+import time
+from typing import Callable, Protocol, runtime_checkable
+
+import numpy as np
+
+from scripts.whisper_profile import profile_from_settings
+
+ASRCallback = Callable[[str, bool], None]
+
+# asr_engine 設定値 -> faster-whisper のモデル
+WHISPER_MODELS = {
+    "large": "kotoba-tech/kotoba-whisper-v2.0-faster",
+    "tiny": "tiny",
+}
+
+
+@runtime_checkable
+class ASRBackend(Protocol):
+    """
+    SessionManager が扱う音声認識エンジンの共通インターフェース。
+
+    add_audio: AudioService から 16kHz float32 チャンクを受け取る（配列は作業バッファなので保持する場合はコピー）
+    start: callback(text, is_final) を登録して認識を開始する
+    stop: 認識を停止する
+    get_stats: ログやベンチマーク用の統計 dict
+    """
+    def add_audio(self, audio_chunk) -> None: ...
+    def start(self, callback: ASRCallback) -> None: ...
+    def stop(self) -> None: ...
+    def get_stats(self) -> dict: ...
+
+
+class ChromeASRBackend:
+    """
+    ChromeASR（Web Speech API）を ASRBackend の形に合わせるアダプタ。
+    ブラウザがマイクを直接聴くため、add_audio は受信量を数えるだけ。
+    """
+    def __init__(self):
+        self._asr = None
+        self.sample_rate = 16000
+        self.received_samples = 0
+        self.partial_count = 0
+        self.final_count = 0
+
+    def add_audio(self, audio_chunk):
+        self.received_samples += len(audio_chunk)
+
+    def start(self, callback):
+        from scripts.chrome_asr import ChromeASR
+
+        def _on_result(text, is_final):
+            if is_final:
+                self.final_count += 1
+            else:
+                self.partial_count += 1
+            callback(text, is_final)
+
+        self._asr = ChromeASR(_on_result)
+        self._asr.start()
+
+    def stop(self):
+        if self._asr:
+            self._asr.stop()
+            self._asr = None
+
+    def get_stats(self):
+        return {
+            "received_sec": round(self.received_samples / self.sample_rate, 1),
+            "partials": self.partial_count,
+            "finals": self.final_count,
+        }
+
+
+class MockASRBackend:
+    """
+    モデルを使わない擬似エンジン（リプレイハーネスやGUIの動作確認用）。
+    振幅が閾値を超えている間は発話長を Partial として通知し、
+    silence_sec 続けて無音になったら Final を通知する。
+    """
+    def __init__(self, threshold=0.01, silence_sec=1.2, processing_delay=0.0):
+        self.threshold = threshold
+        self.silence_sec = silence_sec
+        self.processing_delay = processing_delay
+        self.sample_rate = 16000
+        self.callback = None
+        self.is_running = False
+        self._lock = threading.Lock()
+        self._speech_samples = 0
+        self._silence_samples = 0
+        self.received_samples = 0
+        self.partial_count = 0
+        self.final_count = 0
+
+    def add_audio(self, audio_chunk):
+        if not self.is_running:
+            return
+        level = float(np.abs(audio_chunk).mean()) if len(audio_chunk) else 0.0
+        event = None
+        with self._lock:
+            self.received_samples += len(audio_chunk)
+            if level >= self.threshold:
+                self._speech_samples += len(audio_chunk)
+                self._silence_samples = 0
+                event = (f"[mock speech {self._speech_samples / self.sample_rate:.1f}s]", False)
+            elif self._speech_samples:
+                self._silence_samples += len(audio_chunk)
+                if self._silence_samples >= self.silence_sec * self.sample_rate:
+                    event = (f"[mock speech {self._speech_samples / self.sample_rate:.1f}s]", True)
+                    self._speech_samples = 0
+                    self._silence_samples = 0
+        if event:
+            if self.processing_delay:
+                time.sleep(self.processing_delay)
+            if event[1]:
+                self.final_count += 1
+            else:
+                self.partial_count += 1
+            self.callback(*event)
+
+    def start(self, callback):
+        self.callback = callback
+        self.is_running = True
+
+    def stop(self):
+        self.is_running = False
+
+    def get_stats(self):
+        return {
+            "received_sec": round(self.received_samples / self.sample_rate, 1),
+            "partials": self.partial_count,
+            "finals": self.final_count,
+        }
+
+
+def _whisper_model_for(engine_type, overrides):
+    model_size = overrides.get("model_size") or WHISPER_MODELS.get(engine_type)
+    if model_size is None:
+        logging.warning(f"Unknown ASR engine '{engine_type}'. Falling back to large.")
+        model_size = WHISPER_MODELS["large"]
+    return model_size
+
+
+def create_asr_backend(engine_type, settings_manager=None, **overrides) -> ASRBackend:
+    """
+    asr_engine 設定値からエンジンを生成する。
+    "large" / "tiny": faster-whisper (StreamTranscriber), "chrome": Web Speech API, "mock": 擬似エンジン
+    """
+    def _setting(key, default):
+        if key in overrides:
+            return overrides[key]
+        return settings_manager.get(key, default) if settings_manager else default
+
+    if engine_type == "chrome":
+        return ChromeASRBackend()
+    if engine_type == "mock":
+        return MockASRBackend()
+
+    from scripts.streaming_whisper import StreamTranscriber
+
+    model_size = _whisper_model_for(engine_type, overrides)
+    logging.info(f"Selected Whisper model: {model_size}")
+
+    profile = profile_from_settings(settings_manager, **overrides)
+    kwargs = dict(
+        model_size=model_size,
+        device=profile.device,
+        compute_type=profile.compute_type,
+        cpu_threads=profile.cpu_threads,
+        num_workers=profile.num_workers,
+        cpu_affinity=profile.cpu_affinity,
+        streaming_mode=_setting("asr_streaming_mode", "local_agreement"),
+        window_overlap_sec=float(_setting("asr_window_overlap_sec", 1.0)),
+        max_window_sec=float(_setting("asr_max_window_sec", 15.0)),
+        decode_interval=float(_setting("asr_decode_interval", 0.2)),
+    )
+    return StreamTranscriber(**kwargs)
+
+
+def preload_asr_backend(engine_type, settings_manager=None, **overrides):
+    """
+    Whisper 系エンジンのモデルをバックグラウンドでロード・ウォームアップしておく。
+    start_session で create_asr_backend した時点でロード済みのモデルが使われる。
+    """
+    if engine_type in ("chrome", "mock"):
+        return
+    import scripts.whisper_registry as whisper_registry
+
+    model_size = _whisper_model_for(engine_type, overrides)
+    whisper_registry.preload(model_size, profile_from_settings(settings_manager, **overrides))
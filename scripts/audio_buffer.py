@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+import threading
+import logging
+import ctypes
+import numpy as np
+
+# ドロップポリシー
+# DROP_OLDEST: 追いつけなかった古いフレームを捨て、まだ残っている最古のフレームから読み直す
+# DROP_TO_LATEST: 溜まっている分はすべて捨て、最新フレームだけを読む（レベルメーター向け）
+DROP_OLDEST = "drop_oldest"
+DROP_TO_LATEST = "latest"
+
+INT16_SCALE = 1.0 / 32768.0
+
+
+def int16_to_float32(frame, out):
+    """int16フレームを事前確保済みの float32 バッファに [-1, 1) で書き込む（一時配列を作らない）"""
+    np.copyto(out, frame, casting="unsafe")
+    out *= INT16_SCALE
+    return out
+
+
+def mean_abs(frame, scratch):
+    """レベルメーター用の平均絶対振幅。scratch (float32) を作業領域に使う"""
+    np.copyto(scratch, frame, casting="unsafe")
+    np.abs(scratch, out=scratch)
+    return float(scratch.mean())
+
+
+class PorcupineFrameProcessor:
+    """
+    Porcupine に int16 フレームを渡すラッパー。
+
+    pvporcupine の process() は Python の int シーケンスから ctypes 配列を組み立てるため、
+    可能であればネイティブ関数に numpy バッファのポインタを直接渡す。
+    内部APIが見つからない・失敗した場合は通常の process() にフォールバックする。
+    """
+    def __init__(self, porcupine):
+        self.porcupine = porcupine
+        self.frame_length = porcupine.frame_length
+        self._result = ctypes.c_int()
+        self._result_ref = ctypes.byref(self._result)
+        self._direct = hasattr(porcupine, "_process_func") and hasattr(porcupine, "_handle")
+        # 同じ作業バッファが毎回渡されるので、ポインタは配列ごとにキャッシュする
+        self._ptr_frame = None
+        self._ptr = None
+
+    def _pointer(self, frame):
+        if frame is not self._ptr_frame:
+            self._ptr = frame.ctypes.data_as(ctypes.POINTER(ctypes.c_short))
+            self._ptr_frame = frame
+        return self._ptr
+
+    def process(self, frame):
+        """frame: 長さ frame_length の C連続な int16 配列。検出したキーワードのindex（なければ-1）を返す"""
+        if self._direct and frame.dtype == np.int16 and frame.flags.c_contiguous and len(frame) == self.frame_length:
+            try:
+                status = self.porcupine._process_func(self.porcupine._handle, self._pointer(frame), self._result_ref)
+                if getattr(status, "value", status) == 0:
+                    return self._result.value
+            except (ctypes.ArgumentError, TypeError, AttributeError) as e:
+                logging.warning(f"Porcupine direct processing unavailable, falling back: {e}")
+                self._direct = False
+        # 通常経路（エラー時は pvporcupine 側の例外がそのまま送出される）
+        return self.porcupine.process(frame.tolist())
+
+
+class AudioRingBuffer:
+    """
+    PortAudioコールバックから書き込まれる、事前確保済みの共有リングバッファ。
+
+    書き込みはコールバックスレッドのみ（シングルライター）で、データへのロックは取らない。
+    コールバックはフレームをスロットにコピーして書き込みシーケンスを進めるだけで、
+    各コンシューマーは自分の読み取りカーソルと書き込みシーケンスの差から
+    未読フレーム数と上書き（オーバーラン）を判定する。
+    """
+    def __init__(self, frame_length, capacity=128, dtype=np.int16):
+        self.frame_length = frame_length
+        self.capacity = capacity
+        self.frames = np.zeros((capacity, frame_length), dtype=dtype)
+        # これまでに書き込まれた総フレーム数（単調増加）
+        self.write_seq = 0
+        # コールバック側はタプルを読むだけ（追加・削除時に丸ごと差し替える）
+        self._consumers = ()
+        self._consumers_lock = threading.Lock()
+
+    def write(self, in_data):
+        """コールバックから呼ばれる。フレームをスロットにコピーし、コンシューマーを起こすだけ。"""
+        src = np.frombuffer(in_data, dtype=self.frames.dtype)
+        slot = self.frames[self.write_seq % self.capacity]
+        if len(src) == self.frame_length:
+            np.copyto(slot, src)
+        else:
+            n = min(len(src), self.frame_length)
+            slot[:n] = src[:n]
+            slot[n:] = 0
+        # コピー完了後にシーケンスを公開する
+        self.write_seq += 1
+        for consumer in self._consumers:
+            consumer._wake.set()
+
+    def attach(self, consumer):
+        with self._consumers_lock:
+            if consumer not in self._consumers:
+                self._consumers = self._consumers + (consumer,)
+
+    def detach(self, consumer):
+        with self._consumers_lock:
+            self._consumers = tuple(c for c in self._consumers if c is not consumer)
+
+
+class RingConsumer:
+    """
+    AudioRingBuffer を専用スレッドで読み、フレームごとに handler(frame) を呼ぶコンシューマー。
+
+    handler に渡す frame はコンシューマー専用の作業バッファで、次のフレームで上書きされる。
+    保持したい場合は handler 側でコピーすること。
+    """
+    def __init__(self, ring, handler, name="RingConsumer", drop_policy=DROP_OLDEST, poll_timeout=0.5):
+        self.ring = ring
+        self.handler = handler
+        self.name = name
+        self.drop_policy = drop_policy
+        self.poll_timeout = poll_timeout
+
+        self.read_seq = ring.write_seq
+        self._frame = np.zeros(ring.frame_length, dtype=ring.frames.dtype)
+
+        # 統計
+        self.overruns = 0
+        self.dropped_frames = 0
+        self.processed_frames = 0
+
+        self._wake = threading.Event()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        # 開始時点以降のフレームだけを読む
+        self.read_seq = self.ring.write_seq
+        self.ring.attach(self)
+        self._thread = threading.Thread(target=self._run, daemon=True, name=f"Audio-{self.name}")
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        self.ring.detach(self)
+        self._wake.set()
+        if self._thread and self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1.0)
+        self._thread = None
+
+    def get_stats(self):
+        return {
+            "name": self.name,
+            "processed_frames": self.processed_frames,
+            "dropped_frames": self.dropped_frames,
+            "overruns": self.overruns,
+        }
+
+    def _skip_to(self, seq):
+        self.dropped_frames += seq - self.read_seq
+        self.read_seq = seq
+
+    def _run(self):
+        while self._running:
+            self._wake.wait(timeout=self.poll_timeout)
+            self._wake.clear()
+            self._drain()
+
+    def _drain(self):
+        ring = self.ring
+        while self._running:
+            available = ring.write_seq - self.read_seq
+            if available <= 0:
+                return
+
+            if self.drop_policy == DROP_TO_LATEST:
+                if available > 1:
+                    self._skip_to(ring.write_seq - 1)
+            elif available >= ring.capacity:
+                # 書き込みに追い越された（差が capacity ちょうどでも、次に書かれるのは読むスロット）。
+                # ライターが次に書くスロットと衝突しないよう余裕を持って読み直す
+                self.overruns += 1
+                self._skip_to(ring.write_seq - ring.capacity + max(1, ring.capacity // 4))
+                logging.warning(f"[{self.name}] audio ring overrun (dropped total: {self.dropped_frames} frames)")
+
+            np.copyto(self._frame, ring.frames[self.read_seq % ring.capacity])
+            # コピー中に上書きされていたら（上書き中の可能性があるなら）破棄してやり直す。
+            # write は write_seq % capacity のスロットへ書いてから write_seq を進めるので、差が capacity でも衝突しうる
+            if ring.write_seq - self.read_seq >= ring.capacity:
+                self.overruns += 1
+                continue
+            self.read_seq += 1
+
+            try:
+                self.handler(self._frame)
+                self.processed_frames += 1
+            except Exception as e:
+                logging.error(f"[{self.name}] audio consumer error: {e}", exc_info=True)
+
+
+class GrowableAudioBuffer:
+    """
+    追記と先頭からの消費を、毎回の再確保なしで行う float32 バッファ。
+
+    容量が足りない時だけ、消費済みの先頭領域を詰めるか容量を倍にする（償却 O(1) の追記）。
+    view() はコピーせずに有効区間を返すが、次の append / consume / clear までしか有効でない。
+    """
+    def __init__(self, initial_capacity=16000 * 30, dtype=np.float32):
+        self._data = np.empty(max(1, initial_capacity), dtype=dtype)
+        self._start = 0
+        self._end = 0
+
+    def __len__(self):
+        return self._end - self._start
+
+    @property
+    def capacity(self):
+        return len(self._data)
+
+    def append(self, chunk):
+        n = len(chunk)
+        if self._end + n > len(self._data):
+            self._make_room(n)
+        self._data[self._end:self._end + n] = chunk
+        self._end += n
+
+    def _make_room(self, n):
+        size = len(self)
+        if size + n <= len(self._data) // 2:
+            # 消費済み領域が大きいので先頭へ詰める（重なる区間のコピーは numpy が安全に扱う）
+            self._data[:size] = self._data[self._start:self._end]
+        else:
+            grown = np.empty(max(len(self._data) * 2, size + n), dtype=self._data.dtype)
+            grown[:size] = self._data[self._start:self._end]
+            self._data = grown
+        self._start = 0
+        self._end = size
+
+    def view(self):
+        return self._data[self._start:self._end]
+
+    def consume(self, n):
+        """先頭から n サンプルを捨てる"""
+        self._start = min(self._start + max(0, n), self._end)
+        if self._start == self._end:
+            self._start = self._end = 0
+
+    def clear(self):
+        self._start = self._end = 0
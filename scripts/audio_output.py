@@ -0,0 +1,491 @@
+# -*- coding: utf-8 -*-
+import io
+import time
+import wave
+import queue
+import logging
+import threading
+from collections import deque
+
+import numpy as np
+
+# PyAudio optional（無い環境でもデコード・変換処理は使える）
+try:
+    import pyaudio  # type: ignore
+    _HAS_PYAUDIO = True
+except Exception:
+    _HAS_PYAUDIO = False
+
+# soundfile optional（wave モジュールで読めない float WAV 用）
+try:
+    import soundfile as sf  # type: ignore
+    _HAS_SOUNDFILE = True
+except Exception:
+    _HAS_SOUNDFILE = False
+
+OUTPUT_WIDTH = 2  # 出力ストリームは int16 固定
+BLOCK_FRAMES = 1024
+INT16_MAX = 32767.0
+STREAM_POLL_SEC = 0.05          # ストリーム再生で stop_event を見る間隔
+STREAM_BLOCK_TIMEOUT_SEC = 60   # 次のブロックがこれ以上届かなければ受信失敗とみなす
+
+
+def decode_wav(wav_data):
+    """
+    WAVバイト列を (samples[n, channels], rate) に変換する。
+    16bit はバイト列をそのまま参照する int16 配列（コピーなし）、
+    8/24/32bit 整数と float WAV は float32 (-1.0〜1.0) で返す。
+    """
+    try:
+        with wave.open(io.BytesIO(wav_data), "rb") as wf:
+            channels = wf.getnchannels()
+            width = wf.getsampwidth()
+            rate = wf.getframerate()
+            raw = wf.readframes(wf.getnframes())
+    except wave.Error:
+        # wave は IEEE float (format 3) を読めない
+        if not _HAS_SOUNDFILE:
+            raise
+        samples, rate = sf.read(io.BytesIO(wav_data), dtype="float32", always_2d=True)
+        return samples, rate
+
+    if width == 2:
+        return np.frombuffer(raw, dtype=np.int16).reshape(-1, channels), rate
+    if width == 1:
+        samples = np.frombuffer(raw, dtype=np.uint8).astype(np.float32)
+        samples -= 128.0
+        samples *= 1.0 / 128.0
+    elif width == 3:
+        b = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3)
+        # 上位バイトを符号付きで読み、下位2バイトを足して 24bit 値にする
+        ints = b[:, 2].view(np.int8).astype(np.int32) << 16
+        ints |= b[:, 1].astype(np.int32) << 8
+        ints |= b[:, 0]
+        samples = ints.astype(np.float32)
+        samples *= 1.0 / 8388608.0
+    elif width == 4:
+        samples = np.frombuffer(raw, dtype=np.int32).astype(np.float32)
+        samples *= 1.0 / 2147483648.0
+    else:
+        raise wave.Error(f"Unsupported sample width: {width}")
+    return samples.reshape(-1, channels), rate
+
+
+def convert_format(samples, src_rate, dst_rate, dst_channels):
+    """チャンネル数を合わせ、線形補間で dst_rate にリサンプリングする（float32 で返す）"""
+    if samples.dtype == np.int16:
+        samples = samples.astype(np.float32) / 32768.0
+    src_channels = samples.shape[1]
+    if src_channels != dst_channels:
+        if dst_channels == 1:
+            samples = samples.mean(axis=1, keepdims=True)
+        else:
+            samples = np.repeat(samples.mean(axis=1, keepdims=True) if src_channels != 1 else samples,
+                                dst_channels, axis=1)
+
+    if src_rate != dst_rate and len(samples):
+        n_out = int(round(len(samples) * dst_rate / src_rate))
+        positions = np.arange(n_out, dtype=np.float64) * (src_rate / dst_rate)
+        src_index = np.arange(len(samples), dtype=np.float64)
+        samples = np.stack([np.interp(positions, src_index, samples[:, c]) for c in range(dst_channels)],
+                           axis=1).astype(np.float32)
+    return samples
+
+
+def trim_silence(samples, rate, threshold=0.003, lead_pad_ms=20, tail_pad_ms=40):
+    """先頭と末尾の無音（振幅が threshold 未満）を削る。子音の立ち上がりを残すため前後に少し余白を残す"""
+    if not len(samples):
+        return samples
+    if samples.dtype == np.int16:
+        threshold *= 32768
+    loud = np.nonzero(np.abs(samples).max(axis=1) >= threshold)[0]
+    if not len(loud):
+        return samples[:0]
+    start = max(0, loud[0] - rate * lead_pad_ms // 1000)
+    end = min(len(samples), loud[-1] + 1 + rate * tail_pad_ms // 1000)
+    return samples[start:end]
+
+
+def trim_leading_silence(samples, rate, threshold=0.003, lead_pad_ms=20):
+    """先頭の無音だけを削る（ストリーミング受信中のブロック用。末尾はまだ届いていない）"""
+    if not len(samples):
+        return samples
+    if samples.dtype == np.int16:
+        threshold *= 32768
+    loud = np.nonzero(np.abs(samples).max(axis=1) >= threshold)[0]
+    if not len(loud):
+        return samples[:0]
+    return samples[max(0, loud[0] - rate * lead_pad_ms // 1000):]
+
+
+def crossfade(tail, head):
+    """
+    int16 の tail をフェードアウト、head の先頭をフェードインさせて重ねたものを返す（長さは len(tail)）。
+    対象はクロスフェード長だけなので作業用の配列をその場で作る。
+    """
+    n = min(len(tail), len(head))
+    fade_in = np.linspace(0.0, 1.0, n, endpoint=False, dtype=np.float32)[:, None]
+    mixed = tail[:n] * (1.0 - fade_in) + head[:n] * fade_in
+    out = tail.copy()
+    out[:n] = np.clip(mixed, -32768, 32767)
+    return out
+
+
+class GainStage:
+    """
+    デコード済みの1文全体に音量を一度だけ掛け、使い回す int16 バッファに書き込むゲイン段。
+    バッファは必要なときだけ拡張し、以降の文では確保しない。
+    """
+    def __init__(self, initial_samples=44100 * 10):
+        self._work = np.empty(initial_samples, dtype=np.float32)
+        self._out = np.empty(initial_samples, dtype=np.int16)
+
+    def _buffers(self, shape):
+        n = shape[0] * shape[1]
+        if n > len(self._out):
+            size = max(n, len(self._out) * 2)
+            self._work = np.empty(size, dtype=np.float32)
+            self._out = np.empty(size, dtype=np.int16)
+        return self._work[:n].reshape(shape), self._out[:n].reshape(shape)
+
+    def apply(self, samples, gain=1.0):
+        """
+        samples（int16 または -1.0〜1.0 の float32）に gain を掛けた int16 配列を返す。
+        int16 入力で gain == 1.0 の場合は何もせずそのまま返す。
+        戻り値は次の apply 呼び出しで上書きされる。
+        """
+        if samples.dtype == np.int16:
+            if gain == 1.0:
+                return samples
+            scale = gain
+        else:
+            scale = INT16_MAX * gain
+        work, out = self._buffers(samples.shape)
+        np.multiply(samples, scale, out=work)
+        np.clip(work, -32768, 32767, out=work)
+        np.copyto(out, work, casting="unsafe")
+        return out
+
+
+class AudioOutputEngine:
+    """
+    TTS再生用の常駐出力エンジン。
+
+    PyAudio と出力ストリームを開いたまま使い回し、文ごとのデバイスの開閉をなくす。
+    ストリームは (rate, channels, width) ごとに1本だけ開き、既に開いているストリームと
+    形式が異なるWAV（Gemini 24kHz と VOICEVOX/VITS2 44.1kHz など）は開いている側の形式に変換して流す。
+    output_rate を指定した場合は最初からその形式のストリームに揃える。
+
+    連続する文は先頭・末尾の無音を削り、hold_tail=True で再生した文の末尾 crossfade_ms を保留して
+    次の文の先頭とクロスフェードさせてから書き込む。保留分は flush_tail / end_utterance で書き出す。
+    """
+    def __init__(self, block_frames=BLOCK_FRAMES, output_rate=None, output_channels=None):
+        self.block_frames = block_frames
+        self.output_rate = output_rate
+        self.output_channels = output_channels
+        self._pa = None
+        self._streams = {}          # (rate, channels, width) -> stream
+        self._current_key = None
+        self._lock = threading.Lock()
+        self._tail = None           # 次の文と重ねるために保留している末尾（出力形式・音量適用済みの int16）
+        self._gain = GainStage()
+
+        # 文と文の間の隙間（前の文の最後の書き込み完了 -> 次の文の最初の書き込み開始）
+        self._last_write_end = None
+        self._in_utterance = False
+        self.gaps = deque(maxlen=200)
+        self.stream_opens = 0
+        self.played_sec = 0.0
+        self.converted_count = 0
+        # ストリーミング合成: リクエスト送信から最初のPCMブロック受信まで
+        self.stream_first_block = deque(maxlen=200)
+        # earcon を重ねている間だけ音量を下げる（ダッキング）
+        self._duck_gain = 1.0
+        self._duck_until = 0.0
+
+    def _get_stream(self, rate, channels):
+        """使うストリームの形式を決め、開いていなければ開く"""
+        if self._current_key is not None:
+            key = self._current_key
+        else:
+            key = (self.output_rate or rate, self.output_channels or channels, OUTPUT_WIDTH)
+        stream = self._streams.get(key)
+        if stream is None:
+            if self._pa is None:
+                self._pa = pyaudio.PyAudio()
+            start = time.perf_counter()
+            stream = self._pa.open(format=self._pa.get_format_from_width(OUTPUT_WIDTH),
+                                   channels=key[1], rate=key[0], output=True,
+                                   frames_per_buffer=self.block_frames)
+            self._streams[key] = stream
+            self.stream_opens += 1
+            logging.info(f"Audio output stream opened: {key[0]}Hz, {key[1]}ch "
+                         f"({(time.perf_counter() - start) * 1000:.0f} ms)")
+        self._current_key = key
+        return key, stream
+
+    def _drop_stream(self, key):
+        stream = self._streams.pop(key, None)
+        if self._current_key == key:
+            self._current_key = None
+        if stream is not None:
+            try:
+                stream.stop_stream()
+                stream.close()
+            except Exception:
+                pass
+
+    def play(self, wav_data, volume=1.0, stop_event=None, crossfade_ms=0, hold_tail=False):
+        """
+        WAVデータを再生する（再生が終わるまでブロックする）。
+        stop_event がセットされたら block_frames 単位で中断する。最後まで再生したら True。
+        crossfade_ms > 0 のときは前後の無音を削り、保留中の末尾があればクロスフェードでつなぐ。
+        hold_tail=True なら末尾 crossfade_ms を書き込まずに保留する（次の文が続く場合）。
+        """
+        if not _HAS_PYAUDIO:
+            logging.error("PyAudio is not available. Cannot play audio.")
+            return False
+        samples, rate = decode_wav(wav_data)
+
+        with self._lock:
+            key, stream = self._get_stream(rate, samples.shape[1])
+            out_rate, out_channels, _ = key
+            if crossfade_ms:
+                samples = trim_silence(samples, rate)
+            if (rate, samples.shape[1]) != (out_rate, out_channels):
+                samples = convert_format(samples, rate, out_rate, out_channels)
+                self.converted_count += 1
+
+            # 音量は1文全体に一度だけ掛ける（int16 で 1.0 倍ならそのまま）
+            pcm = self._gain.apply(samples, volume)
+
+            record_gap = True
+            if self._tail is not None:
+                tail, self._tail = self._tail, None
+                if crossfade_ms and len(pcm):
+                    head = crossfade(tail, pcm)
+                    pcm = pcm[len(head):]
+                else:
+                    head = tail
+                if not self._write(key, stream, head.tobytes(), stop_event):
+                    return False
+                record_gap = False
+
+            if hold_tail and crossfade_ms:
+                n = min(len(pcm), out_rate * crossfade_ms // 1000)
+                if n:
+                    self._tail = pcm[len(pcm) - n:].copy()
+                    pcm = pcm[:len(pcm) - n]
+
+            return self._write(key, stream, pcm.tobytes(), stop_event, record_gap)
+
+    def play_stream(self, audio, volume=1.0, stop_event=None, crossfade_ms=0, hold_tail=False):
+        """
+        受信中の StreamingAudio（tts_stream）を届いたブロックから順に再生する。
+        play と同じく先頭の無音を削って保留中の末尾とクロスフェードし、常に末尾 crossfade_ms 分を
+        書き込まずに持っておいて、最後のブロックまで来たら hold_tail に応じて保留または書き出す。
+        形式変換はブロック単位で行う（44.1kHz のVITS2を既に開いている 44.1kHz ストリームに流す通常経路では変換しない）。
+        ブロックの到着は STREAM_POLL_SEC ごとに stop_event を見ながらロックを持たずに待ち、
+        ロックは届いたブロックを書き込む間だけ取る（受信待ちの間も earcon などは再生できる）。
+        """
+        if not _HAS_PYAUDIO:
+            logging.error("PyAudio is not available. Cannot play audio.")
+            audio.cancel()
+            return False
+        if audio.width != 2:
+            logging.error(f"Unsupported streaming sample width: {audio.width}")
+            audio.cancel()
+            return False
+
+        key = None
+        started = not crossfade_ms   # 先頭の無音を削り終えたか
+        record_gap = True
+        pending = None               # 書き込みを保留している末尾 hold サンプル
+        waited = 0.0
+
+        try:
+            while True:
+                if stop_event is not None and stop_event.is_set():
+                    logging.info("音声再生を中断しました。")
+                    audio.cancel()
+                    with self._lock:
+                        self._tail = None
+                    return False
+                try:
+                    block = audio.next_block(STREAM_POLL_SEC)
+                except queue.Empty:
+                    waited += STREAM_POLL_SEC
+                    if waited >= STREAM_BLOCK_TIMEOUT_SEC:
+                        raise TimeoutError(f"no audio block for {STREAM_BLOCK_TIMEOUT_SEC} s")
+                    continue
+                waited = 0.0
+                if block is None:
+                    break
+
+                samples = np.frombuffer(block, dtype=np.int16).reshape(-1, audio.channels)
+                if not started:
+                    samples = trim_leading_silence(samples, audio.rate)
+                    if not len(samples):
+                        continue
+                    started = True
+                    if audio.first_block_at is not None:
+                        self.stream_first_block.append(audio.first_block_at - audio.started_at)
+
+                with self._lock:
+                    new_key, stream = self._get_stream(audio.rate, audio.channels)
+                    if new_key != key:
+                        # 出力ストリームが開き直されたら、前の形式で保留していた末尾は捨てる
+                        if key is not None:
+                            pending = None
+                        key = new_key
+                        out_rate, out_channels, _ = key
+                        convert = (audio.rate, audio.channels) != (out_rate, out_channels)
+                        if convert:
+                            self.converted_count += 1
+                        hold = out_rate * crossfade_ms // 1000 if crossfade_ms else 0
+                    if convert:
+                        samples = convert_format(samples, audio.rate, out_rate, out_channels)
+                    pcm = self._gain.apply(samples, volume)
+
+                    if self._tail is not None:
+                        tail, self._tail = self._tail, None
+                        if crossfade_ms:
+                            head = crossfade(tail, pcm)
+                            pcm = pcm[len(head):]
+                        else:
+                            head = tail
+                        if not self._write(key, stream, head.tobytes(), stop_event, record_gap):
+                            audio.cancel()
+                            return False
+                        record_gap = False
+
+                    if hold:
+                        pcm = pcm if pending is None else np.concatenate([pending, pcm])
+                        pending = pcm[max(0, len(pcm) - hold):].copy()
+                        pcm = pcm[:len(pcm) - len(pending)]
+                    if len(pcm):
+                        if not self._write(key, stream, pcm.tobytes(), stop_event, record_gap):
+                            audio.cancel()
+                            return False
+                        record_gap = False
+        except Exception as e:
+            logging.error(f"Streaming TTS playback error: {e}")
+            audio.cancel()
+            with self._lock:
+                self._tail = None
+            return False
+
+        if pending is not None and len(pending):
+            with self._lock:
+                if hold_tail:
+                    self._tail = pending
+                else:
+                    new_key, stream = self._get_stream(audio.rate, audio.channels)
+                    if new_key == key:
+                        return self._write(key, stream, pending.tobytes(), stop_event, record_gap)
+        return True
+
+    def _write(self, key, stream, data, stop_event, record_gap=True):
+        """
+        ロックを保持した状態で data をブロック単位で書き込む。
+        PyAudio の write は bytes しか受け付けないため、1文分を一度 bytes にしてから切り出す。
+        """
+        out_rate, out_channels, _ = key
+        frame_bytes = out_channels * OUTPUT_WIDTH
+        block_bytes = self.block_frames * frame_bytes
+        completed = True
+        try:
+            for pos in range(0, len(data), block_bytes):
+                if stop_event is not None and stop_event.is_set():
+                    logging.info("音声再生を中断しました。")
+                    self._tail = None
+                    completed = False
+                    break
+                if pos == 0 and record_gap:
+                    self._record_gap()
+                block = data[pos:pos + block_bytes]
+                if self._duck_until and time.perf_counter() < self._duck_until:
+                    block = (np.frombuffer(block, dtype=np.int16) * self._duck_gain).astype(np.int16).tobytes()
+                stream.write(block)
+        except Exception as e:
+            logging.error(f"Audio output error: {e}")
+            self._drop_stream(key)
+            self._tail = None
+            completed = False
+        finally:
+            self._last_write_end = time.perf_counter()
+            self._in_utterance = True
+        self.played_sec += len(data) / frame_bytes / out_rate
+        return completed
+
+    def duck(self, gain, seconds):
+        """これから seconds 秒の間に書き込むブロックの音量を gain 倍にする（earcon 用）"""
+        self._duck_gain = gain
+        self._duck_until = time.perf_counter() + seconds
+
+    def has_tail(self):
+        return self._tail is not None
+
+    def flush_tail(self, stop_event=None):
+        """保留中の末尾を書き出す（次の文が間に合わなかった場合・応答の終わり）"""
+        with self._lock:
+            if self._tail is None or self._current_key is None:
+                self._tail = None
+                return
+            tail, self._tail = self._tail, None
+            key = self._current_key
+            self._write(key, self._streams[key], tail.tobytes(), stop_event, record_gap=False)
+
+    def _record_gap(self):
+        if self._in_utterance and self._last_write_end is not None:
+            self.gaps.append(time.perf_counter() - self._last_write_end)
+
+    def end_utterance(self, flush=True):
+        """
+        応答の区切り。保留中の末尾を書き出し（flush=False なら捨て）、
+        次の再生までの時間は文間の隙間として数えない。
+        """
+        if flush:
+            self.flush_tail()
+        with self._lock:
+            self._tail = None
+            self._in_utterance = False
+        stats = self.get_stats()
+        if stats["gap_count"]:
+            logging.info(f"TTS inter-sentence gap: avg {stats['avg_gap_ms']} ms, "
+                         f"max {stats['max_gap_ms']} ms ({stats['gap_count']} gaps)")
+
+    def get_stats(self):
+        gaps = list(self.gaps)
+        first_blocks = list(self.stream_first_block)
+        return {
+            "gap_count": len(gaps),
+            "avg_gap_ms": round(sum(gaps) / len(gaps) * 1000, 1) if gaps else None,
+            "max_gap_ms": round(max(gaps) * 1000, 1) if gaps else None,
+            "stream_opens": self.stream_opens,
+            "converted": self.converted_count,
+            "played_sec": round(self.played_sec, 1),
+            "avg_stream_first_block_ms": (round(sum(first_blocks) / len(first_blocks) * 1000, 1)
+                                          if first_blocks else None),
+        }
+
+    def close(self):
+        with self._lock:
+            for key in list(self._streams):
+                self._drop_stream(key)
+            if self._pa is not None:
+                self._pa.terminate()
+                self._pa = None
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_output_engine():
+    """プロセス全体で共有する出力エンジンを取得"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = AudioOutputEngine()
+        return _engine
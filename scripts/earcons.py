@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+import random
+import logging
+import threading
+
+import numpy as np
+
+from scripts.audio_output import decode_wav, convert_format, get_output_engine
+
+# PyAudio optional（無い場合は play が False を返し、呼び出し側が通常の再生にフォールバックする）
+try:
+    import pyaudio  # type: ignore
+    _HAS_PYAUDIO = True
+except Exception:
+    _HAS_PYAUDIO = False
+
+EARCON_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "wav", "nod")
+EARCON_RATE = 24000
+CALLBACK_FRAMES = 256  # 24kHz で約 11 ms
+
+
+class EarconPlayer:
+    """
+    頷き音などの短い効果音（earcon）専用の低遅延出力。
+
+    起動時に wav/nod の WAV をすべて float32 PCM にデコードしてメモリに置き、
+    コールバック方式で開きっぱなしにした専用ストリームでミックスして鳴らす。
+    play は発音を登録するだけなので、ファイル読み込みやデバイスのオープンを待たない。
+    TTS の再生とは別ストリームなので上に重ねて鳴り、duck=True なら鳴っている間 TTS の音量を下げる。
+    """
+    def __init__(self, earcon_dir=EARCON_DIR, rate=EARCON_RATE, frames_per_buffer=CALLBACK_FRAMES,
+                 duck=True, duck_gain=0.3):
+        self.earcon_dir = earcon_dir
+        self.rate = rate
+        self.frames_per_buffer = frames_per_buffer
+        self.duck = duck
+        self.duck_gain = duck_gain
+        self._earcons = {}      # 名前（拡張子なしのファイル名） -> float32 モノラル PCM
+        self._paths = {}        # 実パス -> 名前
+        self._voices = []       # 発音中の [pcm, 再生位置]
+        self._lock = threading.Lock()
+        self._pa = None
+        self._stream = None
+        self.triggers = 0
+        self.trigger_to_start = []   # play 呼び出しから最初のコールバックで鳴り始めるまで
+
+    def load(self):
+        """earcon_dir の WAV をすべてデコードしてメモリに置く"""
+        start = time.perf_counter()
+        if not os.path.isdir(self.earcon_dir):
+            logging.warning(f"Earcon directory not found: {self.earcon_dir}")
+            return
+        for name in sorted(os.listdir(self.earcon_dir)):
+            if not name.endswith(".wav"):
+                continue
+            path = os.path.join(self.earcon_dir, name)
+            try:
+                with open(path, "rb") as f:
+                    samples, rate = decode_wav(f.read())
+                pcm = convert_format(samples, rate, self.rate, 1)
+                if pcm.dtype != np.float32:
+                    pcm = pcm.astype(np.float32)
+                key = os.path.splitext(name)[0]
+                self._earcons[key] = np.ascontiguousarray(pcm[:, 0])
+                self._paths[os.path.realpath(path)] = key
+            except Exception as e:
+                logging.warning(f"Failed to load earcon {name}: {e}")
+        logging.info(f"Earcons loaded: {sorted(self._earcons)} ({(time.perf_counter() - start) * 1000:.0f} ms)")
+
+    def open(self):
+        """専用の出力ストリームを開く（以降は閉じるまで無音を流し続ける）"""
+        if not _HAS_PYAUDIO or self._stream is not None:
+            return self._stream is not None
+        try:
+            self._pa = pyaudio.PyAudio()
+            self._stream = self._pa.open(format=pyaudio.paInt16, channels=1, rate=self.rate, output=True,
+                                         frames_per_buffer=self.frames_per_buffer,
+                                         stream_callback=self._callback)
+            self._stream.start_stream()
+            return True
+        except Exception as e:
+            logging.error(f"Failed to open earcon output stream: {e}")
+            self.close()
+            return False
+
+    def names(self):
+        return sorted(self._earcons)
+
+    def name_for_path(self, path):
+        """WAVファイルのパスが読み込み済みの earcon なら、その名前を返す"""
+        return self._paths.get(os.path.realpath(path))
+
+    def play(self, name):
+        """earcon を鳴らす（ブロックしない）。鳴らせなかったら False"""
+        pcm = self._earcons.get(name)
+        if pcm is None or self._stream is None:
+            return False
+        with self._lock:
+            self._voices.append([pcm, 0, time.perf_counter()])
+            self.triggers += 1
+        if self.duck:
+            get_output_engine().duck(self.duck_gain, len(pcm) / self.rate)
+        return True
+
+    def play_random(self):
+        if not self._earcons:
+            return False
+        return self.play(random.choice(list(self._earcons)))
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        mix = np.zeros(frame_count, dtype=np.float32)
+        with self._lock:
+            active = []
+            for voice in self._voices:
+                pcm, pos, triggered_at = voice
+                if pos == 0 and triggered_at is not None:
+                    self.trigger_to_start.append(time.perf_counter() - triggered_at)
+                    del self.trigger_to_start[:-50]
+                    voice[2] = None
+                n = min(frame_count, len(pcm) - pos)
+                mix[:n] += pcm[pos:pos + n]
+                voice[1] = pos + n
+                if voice[1] < len(pcm):
+                    active.append(voice)
+            self._voices = active
+        np.clip(mix, -1.0, 1.0, out=mix)
+        mix *= 32767.0
+        return mix.astype(np.int16).tobytes(), pyaudio.paContinue
+
+    def get_stats(self):
+        with self._lock:
+            starts = list(self.trigger_to_start)
+        return {
+            "earcons": len(self._earcons),
+            "triggers": self.triggers,
+            "avg_trigger_to_start_ms": round(sum(starts) / len(starts) * 1000, 1) if starts else None,
+        }
+
+    def close(self):
+        if self._stream is not None:
+            try:
+                self._stream.stop_stream()
+                self._stream.close()
+            except Exception:
+                pass
+            self._stream = None
+        if self._pa is not None:
+            self._pa.terminate()
+            self._pa = None
+
+
+_player = None
+_player_lock = threading.Lock()
+
+
+def get_earcon_player():
+    """プロセス全体で共有する earcon プレイヤーを取得（未初期化なら None）"""
+    return _player
+
+
+def init_earcons(settings_manager=None):
+    """起動時に一度呼び、earcon の読み込みと専用ストリームのオープンを済ませる"""
+    global _player
+    with _player_lock:
+        if _player is None:
+            get = settings_manager.get if settings_manager is not None else (lambda key, default=None: default)
+            player = EarconPlayer(duck=bool(get("earcon_duck", True)),
+                                  duck_gain=float(get("earcon_duck_gain", 0.3)))
+            player.load()
+            player.open()
+            _player = player
+        return _player
+
+
+def close_earcons():
+    """専用ストリームを閉じる（アプリ終了時）"""
+    global _player
+    with _player_lock:
+        if _player is not None:
+            _player.close()
+            _player = None
@@ -3,10 +3,13 @@ import numpy as np
 import wave
 import os
 import pvporcupine
-import struct
 import logging
 from dotenv import load_dotenv
 import threading
+from scripts.audio_buffer import (
+    AudioRingBuffer, RingConsumer, DROP_OLDEST, DROP_TO_LATEST,
+    PorcupineFrameProcessor, int16_to_float32, mean_abs
+)
 
 load_dotenv()
 
@@ -18,6 +21,7 @@ FORMAT = pyaudio.paInt16
 CHANNELS = 1
 CHUNK = 512 # Porcupineのフレーム長(512)に合わせるのが効率的
 SAMPLE_RATE = 16000 # PorcupineとWhisperの標準レート
+RING_CAPACITY = 128 # 共有リングバッファのフレーム数（512フレーム x 128 = 約4秒）
 
 # --- Picovoice Porcupine 設定 ---
 ACCESS_KEY = os.getenv("POR_ACCESS_KEY")
@@ -25,57 +29,135 @@ KEYWORD_FILE_PATH = 'porcupine/ねえぐり_ja_windows_v3_0_0.ppn'
 MODEL_FILE_PATH = 'porcupine/porcupine_params_ja.pv'
 STOP_KEYWORD_PATH = 'porcupine/ストップ_ja_windows_v3_0_0.ppn'
 
+# ホットワード定義（settings.json の "hotwords" で上書き可能）
+# 1つのPorcupineインスタンスにまとめて登録するため、ホットワードを増やしてもフレームあたりの処理は1回
+DEFAULT_HOTWORDS = [
+    {"name": "wake", "path": KEYWORD_FILE_PATH, "sensitivity": 0.5},
+    {"name": "stop", "path": STOP_KEYWORD_PATH, "sensitivity": 0.5},
+]
+
 class AudioService:
     def __init__(self, app_logic):
         self.app = app_logic
         self.stream = None
         self.is_running = False
         
+        # コールバックは共有リングバッファにコピーするだけで、
+        # リスナー・Porcupine・レベルメーターはそれぞれのコンシューマースレッドで読む
+        self.ring = AudioRingBuffer(CHUNK, capacity=RING_CAPACITY)
+        self.input_overflows = 0
+        
         # コールバックリスト
-        self.listeners = [] # func(pcm_data: bytes)
+        self.listeners = [] # func(audio_float32: np.ndarray)
+        self._listener_consumers = {} # callback -> RingConsumer
+        self._porcupine_consumer = RingConsumer(self.ring, self._process_hotwords, name="Porcupine")
+        self._meter_consumer = RingConsumer(self.ring, self._update_meter, name="LevelMeter", drop_policy=DROP_TO_LATEST)
         
-        # Porcupine (ウェイクワード検知)
+        # Porcupine (ウェイクワード・ストップワード等をまとめて検知)
         self.porcupine = None
-        self.stop_porcupine = None
+        self._porcupine_processor = None
+        self._hotword_names = [] # Porcupineのキーワードindex -> ホットワード名
+        # レベルメーター用の作業バッファ
+        self._meter_scratch = np.empty(CHUNK, dtype=np.float32)
         
-        # イベント
-        self.wake_word_detected_callback = None
-        self.stop_word_detected_callback = None
+        # イベント (ホットワード名 -> コールバック)
+        self.hotword_callbacks = {}
 
-    def add_listener(self, callback):
-        """音声データを受け取るリスナーを追加"""
+    def add_listener(self, callback, drop_policy=DROP_OLDEST, dtype=np.float32):
+        """
+        音声データを受け取るリスナーを追加（リスナーごとに専用スレッドで呼ばれる）。
+        dtype=np.float32 なら [-1, 1) の float32、np.int16 ならマイク入力そのままの int16 を渡す。
+        渡される配列は再利用される作業バッファなので、保持する場合はコピーすること。
+        """
+        if callback in self.listeners:
+            return
         self.listeners.append(callback)
+        if np.dtype(dtype) == np.int16:
+            handler = callback
+        else:
+            scratch = np.empty(CHUNK, dtype=np.float32)
+            handler = lambda frame: callback(int16_to_float32(frame, scratch))
+        consumer = RingConsumer(
+            self.ring,
+            handler,
+            name=f"Listener-{getattr(callback, '__qualname__', 'callback')}",
+            drop_policy=drop_policy
+        )
+        self._listener_consumers[callback] = consumer
+        if self.is_running:
+            consumer.start()
 
     def remove_listener(self, callback):
         if callback in self.listeners:
             self.listeners.remove(callback)
+        consumer = self._listener_consumers.pop(callback, None)
+        if consumer:
+            consumer.stop()
+
+    def get_stats(self):
+        """リングバッファのコンシューマーごとの処理数・ドロップ数・オーバーラン数"""
+        consumers = [self._porcupine_consumer, self._meter_consumer] + list(self._listener_consumers.values())
+        return {
+            "frames_written": self.ring.write_seq,
+            "input_overflows": self.input_overflows,
+            "consumers": [c.get_stats() for c in consumers],
+        }
+
+    def register_hotword(self, name, callback):
+        """ホットワード検知時のコールバックを登録する（None で解除）"""
+        if callback is None:
+            self.hotword_callbacks.pop(name, None)
+        else:
+            self.hotword_callbacks[name] = callback
+
+    def _load_hotwords(self):
+        """設定からホットワード定義を読み込み、キーワードファイルが存在するものだけを返す"""
+        settings_manager = getattr(self.app, "settings_manager", None)
+        entries = settings_manager.get("hotwords", DEFAULT_HOTWORDS) if settings_manager else DEFAULT_HOTWORDS
+        hotwords = []
+        for entry in entries:
+            path = entry.get("path")
+            if not entry.get("name") or not path:
+                continue
+            if not os.path.exists(path):
+                logging.warning(f"Hotword '{entry['name']}' keyword file not found: {path}")
+                continue
+            hotwords.append(entry)
+        return hotwords
 
     def start_stream(self, wake_word_callback=None, stop_word_callback=None):
         """マイク入力を開始し、登録されたリスナーとPorcupineにデータを流す"""
         if self.stream:
             return
 
-        self.wake_word_detected_callback = wake_word_callback
-        self.stop_word_detected_callback = stop_word_callback
+        if wake_word_callback:
+            self.register_hotword("wake", wake_word_callback)
+        if stop_word_callback:
+            self.register_hotword("stop", stop_word_callback)
         self.is_running = True
 
-        # Porcupineの初期化
+        # Porcupineの初期化（全キーワードを1つのインスタンスに登録）
         try:
-            self.porcupine = pvporcupine.create(
-                access_key=ACCESS_KEY,
-                keyword_paths=[KEYWORD_FILE_PATH],
-                model_path=MODEL_FILE_PATH
-            )
-            # ストップワード用（オプション）
-            if os.path.exists(STOP_KEYWORD_PATH):
-                self.stop_porcupine = pvporcupine.create(
+            hotwords = self._load_hotwords()
+            if hotwords:
+                self.porcupine = pvporcupine.create(
                     access_key=ACCESS_KEY,
-                    keyword_paths=[STOP_KEYWORD_PATH],
+                    keyword_paths=[h["path"] for h in hotwords],
+                    sensitivities=[float(h.get("sensitivity", 0.5)) for h in hotwords],
                     model_path=MODEL_FILE_PATH
                 )
+                self._hotword_names = [h["name"] for h in hotwords]
+                self._porcupine_processor = PorcupineFrameProcessor(self.porcupine)
+                logging.info(f"Porcupine initialized with hotwords: {self._hotword_names}")
         except Exception as e:
             logging.error(f"Porcupine Init Error: {e}")
 
+        # コンシューマースレッド開始
+        self._porcupine_consumer.start()
+        self._meter_consumer.start()
+        for consumer in self._listener_consumers.values():
+            consumer.start()
+
         # PyAudioストリーム開始
         device_index = self.app.state.device_index
         
@@ -130,13 +212,18 @@ class AudioService:
             except OSError as e:
                 logging.warning(f"Error checking/stopping stream: {e}")
             self.stream = None
+
+        self._porcupine_consumer.stop()
+        self._meter_consumer.stop()
+        for consumer in self._listener_consumers.values():
+            consumer.stop()
+        logging.info(f"Audio ring stats: {self.get_stats()}")
         
+        self._porcupine_processor = None
+        self._hotword_names = []
         if self.porcupine:
             self.porcupine.delete()
             self.porcupine = None
-        if self.stop_porcupine:
-            self.stop_porcupine.delete()
-            self.stop_porcupine = None
             
         logging.info("Audio stream stopped.")
 
@@ -144,49 +231,39 @@ class AudioService:
         if not self.is_running:
             return (None, pyaudio.paComplete)
 
-        # 1. Porcupine処理 (int16 pcm)
-        if self.porcupine:
-            try:
-                # Porcupineは正確なフレーム長を要求する
-                # CHUNK=512ならそのまま渡せる（Porcupineの標準も512）
-                pcm = struct.unpack_from("h" * frame_count, in_data)
-                
-                # ウェイクワード
-                idx = self.porcupine.process(pcm)
-                if idx >= 0 and self.wake_word_detected_callback:
-                    self.wake_word_detected_callback()
-                
-                # ストップワード
-                if self.stop_porcupine:
-                    idx_stop = self.stop_porcupine.process(pcm)
-                    if idx_stop >= 0 and self.stop_word_detected_callback:
-                        self.stop_word_detected_callback()
-            except Exception as e:
-                logging.error(f"Porcupine processing error: {e}", exc_info=True)
-
-        # 2. Whisper処理 (float32 numpy)
+        # リアルタイムスレッドではリングバッファへのコピーのみ行う
+        if status & pyaudio.paInputOverflow:
+            self.input_overflows += 1
+        self.ring.write(in_data)
+
+        return (in_data, pyaudio.paContinue)
+
+    def _process_hotwords(self, frame):
+        """Porcupine処理 (int16 pcm)"""
+        processor = self._porcupine_processor
+        if not processor:
+            return
         try:
-            # リスナーには Whisper 用の形式で渡す
-            audio_float = np.frombuffer(in_data, dtype=np.int16).astype(np.float32) / 32768.0
+            # Porcupineは正確なフレーム長を要求する
+            # CHUNK=512ならそのまま渡せる（Porcupineの標準も512）
+            # int16フレームをタプル化せずそのまま渡す
+            idx = processor.process(frame)
+            if idx < 0:
+                return
             
-            for listener in self.listeners:
-                try:
-                    listener(audio_float)
-                except Exception as e:
-                    logging.error(f"Audio listener error: {e}", exc_info=True)
+            # 検知したキーワードに対応するコールバックへディスパッチ
+            name = self._hotword_names[idx] if idx < len(self._hotword_names) else None
+            callback = self.hotword_callbacks.get(name)
+            if callback:
+                callback()
         except Exception as e:
-             logging.error(f"Audio conversion error: {e}", exc_info=True)
-        
-        # 3. レベルメーター (GUI更新)
-        # メインスレッド以外からのGUI操作になるため、App側でafter等を使うか、ここで簡単な計算だけする
-        # （ここではシンプルに値を渡す）
-        try:
-            vol = np.abs(np.frombuffer(in_data, dtype=np.int16)).mean()
-            self.app.update_level_meter(vol)
-        except Exception as e:
-            logging.error(f"Level meter update error: {e}", exc_info=True)
+            logging.error(f"Porcupine processing error: {e}", exc_info=True)
 
-        return (in_data, pyaudio.paContinue)
+    def _update_meter(self, frame):
+        """レベルメーター (GUI更新)"""
+        # メインスレッド以外からのGUI操作になるため、App側でafter等を使う
+        vol = mean_abs(frame, self._meter_scratch)
+        self.app.update_level_meter(vol)
 
 # ヘルパー関数
 def get_audio_device_names():
@@ -7,10 +7,12 @@ import threading
 import logging
 import re
 import time
+import numpy as np
 from scripts.twitch_bot import TwitchService
 from twitchio import ChatMessage as TwitchChatMessage
 from scripts.record import AudioService
-from scripts.streaming_whisper import StreamTranscriber
+from scripts.asr_backend import create_asr_backend, preload_asr_backend
+from scripts.vad_gate import VADGate
 from scripts.voice import play_random_nod
 import scripts.voice as voice
 from scripts.auto_commentary import AutoCommentaryService
@@ -57,15 +59,28 @@ class SessionManager:
         # 初期状態ではエンジンを作成せず、start_session時に作成する
         self.transcriber = None
         self.asr_engine_type = None
+        # AudioServiceとtranscriberの間に置くVADゲート（無効時はNone）
+        self.vad_gate = None
+        self._asr_listener = None
         
         self.auto_commentary_service = AutoCommentaryService(app, self)
 
         self._stop_event = threading.Event()
+
+        # Whisper モデルはアプリ起動時にバックグラウンドでロードしておき、エンジン切り替え時も先読みする
+        self._preload_asr_model()
+        self.app.state.asr_engine.trace_add("write", lambda *_: self._preload_asr_model())
         
         # プロンプト処理用の状態管理
         self.is_collecting_prompt = False
         self.prompt_cooldown_until = 0.0 # この時刻まではプロンプトとして受け付けない
 
+    def _preload_asr_model(self):
+        try:
+            preload_asr_backend(self.app.state.asr_engine.get(), self.app.settings_manager)
+        except Exception as e:
+            logging.warning(f"ASR model preload failed: {e}")
+
     def is_session_active(self):
         return self.session_running
 
@@ -76,6 +91,7 @@ class SessionManager:
             if self.transcriber:
                 logging.info("Stopping existing transcriber instance...")
                 try:
+                    self._detach_asr_listener()
                     self.transcriber.stop()
                 except Exception as e:
                     logging.warning(f"Error stopping old transcriber: {e}")
@@ -89,24 +105,15 @@ class SessionManager:
             self.asr_engine_type = self.app.state.asr_engine.get()
             logging.info(f"Using ASR Engine Mode: {self.asr_engine_type}")
             
-            model_size = "kotoba-tech/kotoba-whisper-v2.0-faster" # Default (Large)
-            if self.asr_engine_type == "tiny":
-                # 軽量モデル (Faster-Whisper Tiny)
-                model_size = "tiny"
-                logging.info("Selected Tiny model for lightweight performance.")
-            
-            self.transcriber = StreamTranscriber(
-                model_size=model_size,
-                compute_type="int8"
-            )
+            self.transcriber = create_asr_backend(self.asr_engine_type, self.app.settings_manager)
 
             logging.debug("Starting Twitch connection...")
             self.twitch_service.connect_twitch_bot()
             
-            logging.debug(f"Starting ASR Engine ({model_size})...")
+            logging.debug(f"Starting ASR Engine ({self.asr_engine_type})...")
             self.transcriber.start(self._on_transcription_result)
             
-            self.audio_service.add_listener(self.transcriber.add_audio)
+            self._attach_asr_listener()
             
             logging.debug("Starting AudioService stream...")
             self.audio_service.start_stream(
@@ -135,8 +142,9 @@ class SessionManager:
         self.audio_service.stop_stream()
         
         if self.transcriber:
-            self.audio_service.remove_listener(self.transcriber.add_audio)
+            self._detach_asr_listener()
             self.transcriber.stop()
+            logging.info(f"ASR stats: {self.transcriber.get_stats()}")
             self.transcriber = None
         
         if self.session_memory:
@@ -146,6 +154,32 @@ class SessionManager:
             if summary:
                 self.app.memory_manager.add_or_update_memory(self.session_memory.session_id, summary, type='session_summary')
 
+    def _attach_asr_listener(self):
+        """マイク入力をtranscriberへ接続する。VADが有効なら発話区間だけを流す"""
+        settings = self.app.settings_manager
+        if settings.get("vad_enabled", True):
+            self.vad_gate = VADGate(
+                self.transcriber.add_audio,
+                aggressiveness=int(settings.get("vad_aggressiveness", 2)),
+                pre_roll_ms=int(settings.get("vad_pre_roll_ms", 300)),
+                post_roll_ms=int(settings.get("vad_post_roll_ms", 600)),
+                energy_threshold=float(settings.get("vad_energy_threshold", 150.0)),
+            )
+            self._asr_listener = self.vad_gate.process
+            self.audio_service.add_listener(self._asr_listener, dtype=np.int16)
+        else:
+            self.vad_gate = None
+            self._asr_listener = self.transcriber.add_audio
+            self.audio_service.add_listener(self._asr_listener)
+
+    def _detach_asr_listener(self):
+        if self._asr_listener:
+            self.audio_service.remove_listener(self._asr_listener)
+            self._asr_listener = None
+        if self.vad_gate:
+            logging.info(f"VAD gate stats: {self.vad_gate.get_stats()}")
+            self.vad_gate = None
+
     def _on_wake_word(self):
         """Porcupineが「ねえぐり」を検知した時の処理"""
         logging.info("【Porcupine】ウェイクワード検知！プロンプト待機モードへ移行します。")
@@ -1,9 +1,12 @@
 import json
+import logging
 
 class SettingsManager:
     def __init__(self, settings_file="settings.json"):
         self.settings_file = settings_file
         self.settings = self.load()
+        # (callback, keys) のリスト。set で値が変わったときに callback(key, value) を呼ぶ
+        self._subscribers = []
 
     def load(self):
         try:
@@ -21,4 +24,23 @@ class SettingsManager:
         return self.settings.get(key, default)
 
     def set(self, key, value):
+        changed = self.settings.get(key) != value
         self.settings[key] = value
+        if changed:
+            self._notify(key, value)
+
+    def subscribe(self, callback, keys=None):
+        """設定変更の通知を受け取る。keys を指定した場合はそのキーの変更だけを通知する"""
+        self._subscribers.append((callback, set(keys) if keys else None))
+
+    def unsubscribe(self, callback):
+        self._subscribers = [(cb, keys) for cb, keys in self._subscribers if cb != callback]
+
+    def _notify(self, key, value):
+        for callback, keys in list(self._subscribers):
+            if keys is not None and key not in keys:
+                continue
+            try:
+                callback(key, value)
+            except Exception as e:
+                logging.error(f"Settings subscriber error ({key}): {e}")
@@ -1,46 +1,83 @@
 # -*- coding: utf-8 -*-
-import os
-import queue
 import threading
 import time
 import numpy as np
 import logging
-from faster_whisper import WhisperModel
+from collections import deque
+from scripts.audio_buffer import GrowableAudioBuffer
+from scripts.whisper_profile import resolve_profile, set_thread_affinity
+import scripts.whisper_registry as whisper_registry
 
 class StreamTranscriber:
-    def __init__(self, model_size="kotoba-tech/kotoba-whisper-v2.0-faster", device="cuda", compute_type="int8"):
+    def __init__(self, model_size="kotoba-tech/kotoba-whisper-v2.0-faster", device="auto", compute_type="auto",
+                 streaming_mode="local_agreement", window_overlap_sec=1.0, max_window_sec=15.0,
+                 decode_interval=0.2, cpu_threads=0, num_workers=1, cpu_affinity=None):
         """
         VRAM 1GB前後。Porcupineと併用するため高精度モデルを採用。
-        """
-        # faster-whisperのログを抑制
-        logging.getLogger("faster_whisper").setLevel(logging.WARNING)
-
-        # ローカルパスの確認
-        local_path = "./models/kotoba-whisper-v2.0-faster"
-        if os.path.exists(local_path) and os.listdir(local_path):
-            model_size = local_path
-            logging.info(f"Loading local Whisper model from: {model_size}")
-        else:
-            logging.info(f"Local model not found. Downloading from HF: {model_size}")
 
-        logging.info(f"Initializing Faster-Whisper ({model_size}, {device}, {compute_type})...")
-        self.model = WhisperModel(model_size, device=device, compute_type=compute_type)
+        streaming_mode:
+          "local_agreement" - 連続する2回のデコード結果で一致した先頭部分を確定(commit)し、
+                              確定済みの音声をバッファから削って残りの窓だけをデコードする
+          "full"            - 発話の先頭から毎回すべてを再デコードする（従来の動作）
+        window_overlap_sec: 確定位置より手前に残す文脈用の音声（秒）
+        max_window_sec: デコード窓の上限（秒）。超えた場合は一致を待たずに確定して窓を詰める
+        decode_interval: 新しい音声がこの秒数分溜まるごとにデコードする（入力が途切れた場合はその時点で行う）
+
+        device / compute_type: "auto" なら CUDA の有無で cuda/int8_float16 か cpu/int8 を選ぶ
+        cpu_threads / num_workers: CPU推論時の CTranslate2 スレッド数（0 = 自動）と並列デコード数
+        cpu_affinity: CPU推論スレッドを固定するコア番号のリスト（None = 固定しない）
+        """
+        self.profile = resolve_profile(device, compute_type, cpu_threads, num_workers, cpu_affinity)
+        # モデルはプロセス全体で共有する（プリロード済みならロード・ウォームアップ済みのものを受け取る）
+        self.model, self.startup_rtf = whisper_registry.get_model(model_size, self.profile)
+        logging.info(f"Whisper profile: {self.profile.describe()} (warm-up RTF {self.startup_rtf:.2f})")
 
-        self.audio_queue = queue.Queue()
         self.is_running = False
         self.sample_rate = 16000
+        self.thread = None
 
-        # 音声バッファ
-        self.audio_buffer = np.array([], dtype=np.float32)
+        # 音声バッファ（追記・先頭の消費で再確保しない）
+        # add_audio（AudioServiceのスレッド）とワーカーで共有するため _cond で保護する
+        self.audio_buffer = GrowableAudioBuffer(self.sample_rate * 30)
+        self._cond = threading.Condition()
+        self.decode_interval = decode_interval
+        self._decode_step_samples = max(1, int(self.sample_rate * decode_interval))
+        self._min_decode_samples = int(self.sample_rate * 0.5)  # 最低0.5秒分
+        self._new_samples = 0          # 前回デコード以降に届いたサンプル数
+        self._decoded_len = 0          # 最後のデコードが対象にしたバッファ先頭からのサンプル数
+        self._last_audio_time = None   # 最後に音声が届いた時刻 (monotonic)
         self.last_final_text = ""
         self.last_partial_text = ""
 
-        # 沈黙検知用
-        self.silence_start_time = None
+        # 逐次確定 (LocalAgreement) 用
+        self.streaming_mode = streaming_mode
+        self.window_overlap_sec = window_overlap_sec
+        self.max_window_sec = max_window_sec
+        self.committed_text = ""      # 現在の発話で確定済みのテキスト
+        self.committed_end = 0.0      # 確定済みの最後の単語の終了時刻（発話先頭からの秒）
+        self.buffer_time_offset = 0.0 # audio_buffer[0] の発話先頭からの時刻（秒）
+        self.prev_words = []          # 前回デコードの未確定部分 [(start, end, word), ...]
+
+        # 沈黙検知用: テキストが最後に更新されてから SILENCE_THRESHOLD 後に確定する
         self.SILENCE_THRESHOLD = 1.2  # 1秒の沈黙で確定とみなす
+        self._finalize_deadline = None  # monotonic
+
+        # 統計
+        self.decode_count = 0
+        self.decoded_samples = 0
+        self.decode_time = 0.0
+        self.received_samples = 0
+        self.final_latencies = deque(maxlen=100)  # 最後の音声到着 -> Final通知 (秒)
 
     def add_audio(self, audio_chunk):
-        self.audio_queue.put(audio_chunk)
+        # AudioService から渡される配列は作業バッファなのでバッファへコピーして保持する
+        with self._cond:
+            self.audio_buffer.append(audio_chunk)
+            self.received_samples += len(audio_chunk)
+            self._new_samples += len(audio_chunk)
+            self._last_audio_time = time.monotonic()
+            if self._new_samples >= self._decode_step_samples:
+                self._cond.notify()
 
     def start(self, callback):
         """
@@ -52,57 +89,182 @@ class StreamTranscriber:
         self.thread.start()
 
     def stop(self):
-        self.is_running = False
+        with self._cond:
+            self.is_running = False
+            self._cond.notify_all()
+
+    def get_stats(self):
+        """受け取った音声秒数と、Whisperでデコードした延べ秒数・処理時間"""
+        latencies = list(self.final_latencies)
+        return {
+            "received_sec": round(self.received_samples / self.sample_rate, 1),
+            "decodes": self.decode_count,
+            "decoded_audio_sec": round(self.decoded_samples / self.sample_rate, 1),
+            "decode_time_sec": round(self.decode_time, 1),
+            "avg_final_latency_sec": round(sum(latencies) / len(latencies), 3) if latencies else None,
+            "rtf": round(self.decode_time * self.sample_rate / self.decoded_samples, 3) if self.decoded_samples else None,
+            "profile": self.profile.describe(),
+        }
+
+    def _wait_for_work(self):
+        """
+        次にやるべきことが起きるまでブロックする。
+        "decode": 新しい音声が decode_interval 分溜まった、または入力が途切れて未デコードの音声がある
+        "finalize": テキスト更新から SILENCE_THRESHOLD が経過した
+        None: 停止
+        """
+        with self._cond:
+            while self.is_running:
+                now = time.monotonic()
+                # デコードが追いつかない場合でも確定が遅れないよう、期限を先に判定する
+                deadline = self._finalize_deadline
+                if deadline is not None and now >= deadline:
+                    return "finalize"
+                if self._new_samples >= self._decode_step_samples:
+                    return "decode"
+                idle_at = self._last_audio_time + self.decode_interval if self._new_samples else None
+                if idle_at is not None and now >= idle_at:
+                    return "decode"
+
+                wake_times = [t for t in (idle_at, deadline) if t is not None]
+                self._cond.wait(timeout=(min(wake_times) - now) if wake_times else None)
+            return None
 
     def _worker_loop(self):
+        if self.profile.cpu_affinity:
+            set_thread_affinity(self.profile.cpu_affinity)
         while self.is_running:
             try:
-                # データを取得
-                while not self.audio_queue.empty():
-                    chunk = self.audio_queue.get_nowait()
-                    self.audio_buffer = np.concatenate([self.audio_buffer, chunk])
+                action = self._wait_for_work()
+                if action == "decode":
+                    self._decode_tick()
+                elif action == "finalize":
+                    self._finalize()
+            except Exception as e:
+                logging.error(f"StreamTranscriber Error: {e}")
+                time.sleep(1)
+
+    def _decode_tick(self):
+        with self._cond:
+            self._new_samples = 0
+            if len(self.audio_buffer) < self._min_decode_samples:
+                return
+            # デコード中も add_audio が追記できるよう、窓をコピーしてロックを外す
+            audio = self.audio_buffer.view().copy()
+            self._decoded_len = len(audio)
 
-                if len(self.audio_buffer) < self.sample_rate * 0.5:  # 最低0.5秒分
-                    time.sleep(0.1)
+        # 推論
+        decode_start = time.time()
+        if self.streaming_mode == "local_agreement":
+            current_text = self._decode_local_agreement(audio)
+        else:
+            current_text = self._decode_full(audio)
+        self.decode_count += 1
+        self.decoded_samples += len(audio)
+        self.decode_time += time.time() - decode_start
+
+        if current_text and current_text != self.last_partial_text:
+            # テキストが更新されたらPartial通知し、確定期限を延長
+            self.callback(current_text, is_final=False)
+            self.last_partial_text = current_text
+            self._finalize_deadline = time.monotonic() + self.SILENCE_THRESHOLD
+        elif current_text and self._finalize_deadline is None:
+            # テキストはあるが変化していない（＝話し終わりの可能性）
+            self._finalize_deadline = time.monotonic() + self.SILENCE_THRESHOLD
+
+    def _finalize(self):
+        """確定判定: 最終更新から一定時間経過したらFinalとする"""
+        self._finalize_deadline = None
+        if not self.last_partial_text:
+            return
+        logging.info(f"Finalize by silence: {self.last_partial_text}")
+        self.callback(self.last_partial_text, is_final=True)
+        if self._last_audio_time is not None:
+            self.final_latencies.append(time.monotonic() - self._last_audio_time)
+        self.last_final_text = self.last_partial_text
+        self._reset_utterance()
+
+    def _reset_utterance(self):
+        """発話単位の状態をクリアする"""
+        with self._cond:
+            self.last_partial_text = ""
+            # 確定したテキストの元になった音声だけを捨てる。最後のデコードの後に届いた音声
+            # （デコード中や確定期限の直前に話し始めた分）は次の発話の先頭として残し、デコードさせる
+            self.audio_buffer.consume(self._decoded_len)
+            self._decoded_len = 0
+            self._new_samples = len(self.audio_buffer)
+            self._finalize_deadline = None
+            self.committed_text = ""
+            self.committed_end = 0.0
+            self.buffer_time_offset = 0.0
+            self.prev_words = []
+
+    def _decode_full(self, audio):
+        """バッファ全体をデコードする（従来方式）"""
+        segments, info = self.model.transcribe(
+            audio,
+            language="ja",
+            beam_size=1,
+            vad_filter=True,
+            vad_parameters=dict(min_silence_duration_ms=300),
+        )
+        return "".join([s.text for s in segments]).strip()
+
+    def _decode_local_agreement(self, audio):
+        """
+        未確定の窓だけをデコードし、前回の仮説と一致した先頭の単語列を確定する。
+        audio は audio_buffer の先頭からのコピー（先頭が buffer_time_offset に対応）。
+        戻り値は 確定済みテキスト + 未確定の仮説。
+        """
+        segments, info = self.model.transcribe(
+            audio,
+            language="ja",
+            beam_size=1,
+            vad_filter=True,
+            vad_parameters=dict(min_silence_duration_ms=300),
+            word_timestamps=True,
+            condition_on_previous_text=False,
+            initial_prompt=self.committed_text[-100:] or None,
+        )
+
+        # 発話先頭基準の時刻に直し、オーバーラップ区間で確定済みの単語は捨てる
+        words = []
+        for segment in segments:
+            for w in (segment.words or []):
+                start = self.buffer_time_offset + w.start
+                end = self.buffer_time_offset + w.end
+                if end <= self.committed_end + 0.05:
                     continue
+                words.append((start, end, w.word))
 
-                # 推論
-                segments, info = self.model.transcribe(
-                    self.audio_buffer,
-                    language="ja",
-                    beam_size=1,
-                    vad_filter=True,
-                    vad_parameters=dict(min_silence_duration_ms=300),
-                )
-
-                current_text = "".join([s.text for s in segments]).strip()
-
-                if current_text:
-                    if current_text != self.last_partial_text:
-                        # テキストが更新されたらPartial通知
-                        self.callback(current_text, is_final=False)
-                        self.last_partial_text = current_text
-                        self.silence_start_time = time.time() # 最終更新時刻をリセット
-                    else:
-                        # テキストはあるが変化していない（＝話し終わりの可能性）
-                        if self.silence_start_time is None:
-                            self.silence_start_time = time.time()
-                else:
-                    # 音声はあるが認識結果がない（完全な無音）
-                    if self.silence_start_time is None:
-                        self.silence_start_time = time.time()
-
-                # 確定判定: 最終更新から一定時間経過したらFinalとする
-                if self.last_partial_text and self.silence_start_time:
-                    if time.time() - self.silence_start_time > self.SILENCE_THRESHOLD:
-                        logging.info(f"Finalize by silence: {self.last_partial_text}")
-                        self.callback(self.last_partial_text, is_final=True)
-                        self.last_partial_text = ""
-                        self.audio_buffer = np.array([], dtype=np.float32) # バッファクリア
-                        self.silence_start_time = None
-
-                time.sleep(0.2)
+        # 前回の仮説との共通接頭辞を確定
+        agreed = 0
+        for prev, cur in zip(self.prev_words, words):
+            if prev[2].strip() != cur[2].strip():
+                break
+            agreed += 1
 
-            except Exception as e:
-                logging.error(f"StreamTranscriber Error: {e}")
-                time.sleep(1)
+        buffer_sec = len(audio) / self.sample_rate
+        if agreed == 0 and buffer_sec > self.max_window_sec and len(words) > 1:
+            # 窓が上限を超えても一致しない場合は、最後の単語以外を強制的に確定する
+            agreed = len(words) - 1
+            logging.debug(f"Window cap reached ({buffer_sec:.1f}s). Force committing {agreed} words.")
+
+        if agreed:
+            self.committed_text += "".join(w[2] for w in words[:agreed])
+            self.committed_end = words[agreed - 1][1]
+        self.prev_words = words[agreed:]
+
+        # 確定済み音声を削る（文脈用のオーバーラップは残す）
+        trim_to = self.committed_end - self.window_overlap_sec
+        if buffer_sec > self.max_window_sec:
+            # 認識結果が無いまま窓が伸びた場合も上限までに抑える
+            trim_to = max(trim_to, self.buffer_time_offset + buffer_sec - self.max_window_sec)
+        trim_samples = int((trim_to - self.buffer_time_offset) * self.sample_rate)
+        if trim_samples > 0:
+            with self._cond:
+                self.audio_buffer.consume(trim_samples)
+                self._decoded_len = max(0, self._decoded_len - trim_samples)
+                self.buffer_time_offset += trim_samples / self.sample_rate
+
+        return (self.committed_text + "".join(w[2] for w in self.prev_words)).strip()
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+import io
+import os
+import wave
+import struct
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+# soundfile optional（あればディスクには FLAC で保存する）
+try:
+    import soundfile as sf  # type: ignore
+    import numpy as np
+    _HAS_SOUNDFILE = True
+except Exception:
+    _HAS_SOUNDFILE = False
+
+CACHE_DIR = "./cache/tts"
+# 生PCM形式のヘッダ: マジック, サンプルレート, チャンネル数, サンプル幅
+_RAW_MAGIC = b"TTSP"
+_RAW_HEADER = struct.Struct("<4sIHH")
+
+
+def make_key(engine, voice, text, speed=1.0):
+    """(エンジン, 話者/スタイル, 話速, テキスト) のハッシュ"""
+    source = f"{engine}\x00{voice}\x00{speed}\x00{text}"
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+
+def _read_wav(wav_data):
+    with wave.open(io.BytesIO(wav_data), "rb") as wf:
+        return wf.getframerate(), wf.getnchannels(), wf.getsampwidth(), wf.readframes(wf.getnframes())
+
+
+def _write_wav(rate, channels, width, frames):
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wf:
+        wf.setnchannels(channels)
+        wf.setsampwidth(width)
+        wf.setframerate(rate)
+        wf.writeframes(frames)
+    return buf.getvalue()
+
+
+def encode_compact(wav_data):
+    """ディスク保存用の形式に変換する（16bit は FLAC、それ以外・soundfile 無しは生PCM + ヘッダ）"""
+    rate, channels, width, frames = _read_wav(wav_data)
+    if _HAS_SOUNDFILE and width == 2:
+        pcm = np.frombuffer(frames, dtype=np.int16).reshape(-1, channels)
+        buf = io.BytesIO()
+        sf.write(buf, pcm, rate, format="FLAC", subtype="PCM_16")
+        return ".flac", buf.getvalue()
+    return ".pcm", _RAW_HEADER.pack(_RAW_MAGIC, rate, channels, width) + frames
+
+
+def decode_compact(ext, data):
+    """encode_compact の逆変換（WAVバイト列に戻す）"""
+    if ext == ".flac":
+        pcm, rate = sf.read(io.BytesIO(data), dtype="int16", always_2d=True)
+        return _write_wav(rate, pcm.shape[1], 2, pcm.tobytes())
+    magic, rate, channels, width = _RAW_HEADER.unpack_from(data)
+    if magic != _RAW_MAGIC:
+        raise ValueError("Invalid TTS cache entry.")
+    return _write_wav(rate, channels, width, data[_RAW_HEADER.size:])
+
+
+class TTSCache:
+    """
+    合成済み音声のキャッシュ（メモリ + ディスクの2段 LRU）。
+    メモリにはそのまま再生できるWAVバイト列を、ディスクには FLAC（または生PCM）を
+    key のファイル名で保存し、それぞれ合計サイズが上限を超えたら最も古く使われたものから捨てる。
+    """
+    def __init__(self, cache_dir=CACHE_DIR, memory_bytes=32 * 1024 * 1024, disk_bytes=256 * 1024 * 1024,
+                 report_interval=50):
+        self.cache_dir = cache_dir
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.report_interval = report_interval
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()   # key -> wav bytes
+        self._memory_size = 0
+        self._disk = OrderedDict()     # key -> (filename, size)
+        self._disk_size = 0
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._scan_disk()
+
+    def _scan_disk(self):
+        """既存のキャッシュファイルを最終使用時刻順に読み込む"""
+        if not self.disk_bytes:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            entries = []
+            for name in os.listdir(self.cache_dir):
+                key, ext = os.path.splitext(name)
+                if ext not in (".flac", ".pcm"):
+                    continue
+                st = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((st.st_mtime, key, name, st.st_size))
+            for _, key, name, size in sorted(entries):
+                self._disk[key] = (name, size)
+                self._disk_size += size
+            self._evict_disk()
+        except OSError as e:
+            logging.warning(f"TTS cache directory is not available: {e}")
+            self.disk_bytes = 0
+
+    def get(self, key):
+        """キャッシュされたWAVを返す（無ければ None）"""
+        with self._lock:
+            wav = self._memory.get(key)
+            if wav is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                self._maybe_report()
+                return wav
+            entry = self._disk.get(key)
+            if entry is not None:
+                self._disk.move_to_end(key)
+
+        if entry is not None:
+            path = os.path.join(self.cache_dir, entry[0])
+            try:
+                with open(path, "rb") as f:
+                    wav = decode_compact(os.path.splitext(entry[0])[1], f.read())
+                os.utime(path)
+                with self._lock:
+                    self.disk_hits += 1
+                    self._put_memory(key, wav)
+                    self._maybe_report()
+                return wav
+            except Exception as e:
+                logging.warning(f"Failed to read TTS cache entry {entry[0]}: {e}")
+                self._remove_disk(key)
+
+        with self._lock:
+            self.misses += 1
+            self._maybe_report()
+        return None
+
+    def put(self, key, wav_data):
+        """合成結果を保存する"""
+        if not wav_data:
+            return
+        with self._lock:
+            self._put_memory(key, wav_data)
+            if not self.disk_bytes or key in self._disk:
+                return
+        try:
+            ext, data = encode_compact(wav_data)
+            name = key + ext
+            # 同じ文を複数のスレッドが同時に書くことがあるので、一時ファイル名は書き手ごとに分ける
+            tmp = os.path.join(self.cache_dir, f"{name}.{os.getpid()}-{threading.get_ident()}.tmp")
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, os.path.join(self.cache_dir, name))
+        except Exception as e:
+            logging.warning(f"Failed to write TTS cache entry: {e}")
+            return
+        with self._lock:
+            # 書いている間に別のスレッドが同じキーを登録していたら、その分を差し引いてから数え直す
+            old = self._disk.pop(key, None)
+            if old is not None:
+                self._disk_size -= old[1]
+                if old[0] != name:
+                    try:
+                        os.remove(os.path.join(self.cache_dir, old[0]))
+                    except OSError:
+                        pass
+            self._disk[key] = (name, len(data))
+            self._disk_size += len(data)
+            self._evict_disk()
+
+    def _put_memory(self, key, wav):
+        if len(wav) > self.memory_bytes:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_size -= len(old)
+        self._memory[key] = wav
+        self._memory_size += len(wav)
+        while self._memory_size > self.memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
+
+    def _evict_disk(self):
+        while self._disk_size > self.disk_bytes and self._disk:
+            key, (name, size) = self._disk.popitem(last=False)
+            self._disk_size -= size
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
+
+    def _remove_disk(self, key):
+        with self._lock:
+            entry = self._disk.pop(key, None)
+            if entry is None:
+                return
+            self._disk_size -= entry[1]
+        try:
+            os.remove(os.path.join(self.cache_dir, entry[0]))
+        except OSError:
+            pass
+
+    def _maybe_report(self):
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        if self.report_interval and lookups % self.report_interval == 0:
+            logging.info(f"TTS cache stats: {self._stats()}")
+
+    def _stats(self):
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "lookups": lookups,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "memory_mb": round(self._memory_size / 1e6, 1),
+            "disk_mb": round(self._disk_size / 1e6, 1),
+            "disk_entries": len(self._disk),
+        }
+
+    def get_stats(self):
+        with self._lock:
+            return self._stats()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_tts_cache():
+    """プロセス全体で共有するキャッシュを取得"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = TTSCache()
+        return _cache
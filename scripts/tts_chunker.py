@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+import re
+import logging
+import threading
+
+# fugashi optional（無い場合は句読点とひらがな→漢字/カタカナの切り替わりで文節を近似する）
+try:
+    import fugashi  # type: ignore
+    _HAS_FUGASHI = True
+except Exception:
+    _HAS_FUGASHI = False
+
+# 文節の後ろにつく品詞（UniDic の pos1）。これらの直後に自立語が来たら文節の切れ目とする
+_FUNCTIONAL_POS = {"助詞", "助動詞", "接尾辞", "補助記号"}
+_SENTENCE_END = "。！？!?\n"
+_FALLBACK_BOUNDARY = re.compile(r'(?<=[、。！？!?,\n])|(?<=[ぁ-ん])(?=[一-龯ァ-ヶー])')
+
+# 日本語の読み上げ速度の目安（秒/文字）。1チャンクの再生時間の見積もりに使う
+SPEECH_SEC_PER_CHAR = 0.13
+
+_tagger = None
+_tagger_lock = threading.Lock()
+
+
+def _get_tagger():
+    global _tagger
+    with _tagger_lock:
+        if _tagger is None:
+            _tagger = fugashi.Tagger()
+        return _tagger
+
+
+def split_phrases(text):
+    """テキストを文節（に近い単位）のリストにする。連結すると元のテキストに戻る"""
+    if not _HAS_FUGASHI:
+        return [p for p in _FALLBACK_BOUNDARY.split(text) if p]
+    phrases = []
+    current = ""
+    prev_functional = False
+    for word in _get_tagger()(text):
+        pos = word.feature.pos1
+        functional = pos in _FUNCTIONAL_POS
+        if current and prev_functional and not functional:
+            phrases.append(current)
+            current = ""
+        current += word.white_space + word.surface
+        prev_functional = functional
+    if current:
+        phrases.append(current)
+    # 形態素解析で落ちた末尾の空白などは最後の文節に含めて元のテキストに戻るようにする
+    rest = text[len("".join(phrases)):]
+    if rest and phrases:
+        phrases[-1] += rest
+    return phrases or [text]
+
+
+class SynthesisLatency:
+    """
+    エンジンごとの合成時間（秒/文字）の指数移動平均。
+    voice の合成処理が実測値を record し、AdaptiveChunker がチャンク長の決定に使う。
+    """
+    def __init__(self, alpha=0.2, default_sec_per_char=0.05):
+        self.alpha = alpha
+        self.default_sec_per_char = default_sec_per_char
+        self._sec_per_char = {}
+        self._lock = threading.Lock()
+
+    def record(self, engine, chars, seconds):
+        if chars <= 0 or seconds <= 0:
+            return
+        value = seconds / chars
+        with self._lock:
+            old = self._sec_per_char.get(engine)
+            self._sec_per_char[engine] = value if old is None else old + self.alpha * (value - old)
+
+    def sec_per_char(self, engine):
+        with self._lock:
+            return self._sec_per_char.get(engine, self.default_sec_per_char)
+
+    def get_stats(self):
+        with self._lock:
+            return {engine: round(v * 1000, 1) for engine, v in self._sec_per_char.items()}
+
+
+_latency = SynthesisLatency()
+
+
+def get_synthesis_latency():
+    """プロセス全体で共有する合成時間の計測値"""
+    return _latency
+
+
+class AdaptiveChunker:
+    """
+    TTSに渡す文を、最初は短く、後になるほど長いチャンクに分ける。
+
+    最初のチャンクは予測合成時間が first_chunk_sec に収まる文字数にして再生開始を早め、
+    以降は「前のチャンクを再生している間に合成が終わる」長さまで伸ばしてリクエスト数を減らす。
+    切れ目は文節境界で、1つの応答（reset から reset まで）の間でチャンク長の状態を持ち越す。
+    """
+    def __init__(self, latency=None, first_chunk_sec=0.6, min_chars=6, max_chars=120, max_growth=3.0,
+                 parallelism=1):
+        self.latency = latency or get_synthesis_latency()
+        self.parallelism = max(1, parallelism)   # 並列に合成できる数（TTSManager の synthesis_workers）
+        self.first_chunk_sec = first_chunk_sec
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self.max_growth = max_growth
+        self._limit = None
+
+    def reset(self):
+        """応答の区切り。次のチャンクはまた短いものから始める"""
+        self._limit = None
+
+    def _next_limit(self, engine, chars):
+        """
+        直前のチャンク（chars 文字）を再生している間に合成できる文字数。
+        合成が再生より遅いエンジンでは短くしても追いつけないので、チャンク長は縮めない。
+        """
+        sec_per_char = self.latency.sec_per_char(engine)
+        budget = int(chars * SPEECH_SEC_PER_CHAR * self.parallelism / sec_per_char)
+        grown = min(self.max_chars, int(chars * self.max_growth), budget)
+        return max(self.min_chars, self._limit, grown)
+
+    def split(self, text, engine):
+        text = text.strip()
+        if not text:
+            return []
+        if self._limit is None:
+            sec_per_char = self.latency.sec_per_char(engine)
+            self._limit = max(self.min_chars, min(self.max_chars, int(self.first_chunk_sec / sec_per_char)))
+        if len(text) <= self._limit:
+            self._limit = self._next_limit(engine, len(text))
+            return [text]
+
+        chunks = []
+        current = ""
+        for phrase in split_phrases(text):
+            if len(current) >= self.min_chars and len(current) + len(phrase) > self._limit:
+                chunks.append(current)
+                self._limit = self._next_limit(engine, len(current))
+                current = ""
+            current += phrase
+            # 文末では制限内でも区切る（後続の文末までまとめると最初の音が遅れる）
+            if current[-1] in _SENTENCE_END and len(current) >= self._limit // 2:
+                chunks.append(current)
+                self._limit = self._next_limit(engine, len(current))
+                current = ""
+        if current:
+            chunks.append(current)
+            self._limit = self._next_limit(engine, len(current))
+        chunks = [c.strip() for c in chunks if c.strip()]
+        logging.debug(f"TTS chunks ({engine}): {[len(c) for c in chunks]}")
+        return chunks
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+import io
+import json
+import wave
+import logging
+import threading
+from abc import ABC, abstractmethod
+
+import requests
+
+from scripts import tts_http, tts_stream
+
+VOICEVOX_URL = "http://localhost:50021"
+VITS2_URL = "http://localhost:50021"
+
+_gemini_session = None
+_gemini_lock = threading.Lock()
+
+
+def _gemini_speech(text):
+    """Gemini TTS で合成し、24kHz 16bit モノラルのWAVにして返す"""
+    global _gemini_session
+    with _gemini_lock:
+        if _gemini_session is None:
+            from scripts.gemini import GeminiSession
+            _gemini_session = GeminiSession()
+    pcm_data = _gemini_session.generate_speech(text)
+    if not pcm_data:
+        return None
+    # PCMデータをWAV形式に変換
+    wav_data = io.BytesIO()
+    with wave.open(wav_data, 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(24000)
+        wf.writeframes(pcm_data)
+    return wav_data.getvalue()
+
+
+class TTSEngine(ABC):
+    """
+    音声合成エンジンの共通インターフェース。
+    name: tts_engine 設定値
+    voice_id: キャッシュキーに含める話者・スタイルの識別子
+    synthesize(text): (WAVデータ, 実際に使ったエンジン名) を返す
+    """
+    name = ""
+
+    @property
+    def voice_id(self):
+        return ""
+
+    @abstractmethod
+    def synthesize(self, text):
+        """(WAVデータ, 実際に使ったエンジン名) を返す"""
+
+
+class GeminiTTSEngine(TTSEngine):
+    name = "gemini"
+
+    def synthesize(self, text):
+        return _gemini_speech(text), self.name
+
+
+class VoicevoxEngine(TTSEngine):
+    """VOICEVOX（接続できない場合は Gemini TTS にフォールバック）"""
+    name = "voicevox"
+
+    def __init__(self, speaker_id=46, core_version=None, base_url=VOICEVOX_URL,
+                 query_timeout=3, synthesis_timeout=10, retries=1):
+        self.speaker_id = speaker_id
+        self.core_version = core_version
+        self.base_url = base_url
+        self.query_timeout = query_timeout
+        self.synthesis_timeout = synthesis_timeout
+        self.retries = retries
+
+    @property
+    def voice_id(self):
+        return f"{self.speaker_id}:{self.core_version or ''}"
+
+    def synthesize(self, text):
+        params = {"speaker": self.speaker_id}
+        if self.core_version:
+            params["core_version"] = self.core_version
+
+        try:
+            # 1. クエリ作成APIを呼び出す（アクセント句の解析はエンジン側でしかできない）
+            response = tts_http.post(self.base_url, "/audio_query", self.query_timeout, self.retries,
+                                     params={"text": text, **params})
+            query_data = response.json()
+
+            # 2. 音声合成APIを呼び出す
+            response = tts_http.post(self.base_url, "/synthesis", self.synthesis_timeout, self.retries,
+                                     params=params, json=query_data)
+            return response.content, self.name
+
+        except (requests.exceptions.RequestException, json.JSONDecodeError) as e:
+            print(f"VOICEVOX接続エラーのため、Gemini TTSにフォールバックします: {e}")
+            return _gemini_speech(text), GeminiTTSEngine.name
+
+
+class StyleBertVits2Engine(TTSEngine):
+    """Style-Bert-VITS2 ブリッジサーバー (scripts/vits2_server.py)"""
+    name = "style_bert_vits2"
+
+    def __init__(self, speaker_id=0, base_url=VITS2_URL, synthesis_timeout=60, retries=2, streaming=True):
+        self.speaker_id = speaker_id
+        self.base_url = base_url
+        # 大型モデル向けに長めのタイムアウトを設定
+        self.synthesis_timeout = synthesis_timeout
+        self.retries = retries
+        # /synthesis_stream が使えない（aiohttp 無し・旧サーバー）と分かったら以降は通常の合成のみ
+        self.streaming = streaming and tts_stream.is_available()
+
+    @property
+    def voice_id(self):
+        return str(self.speaker_id)
+
+    def build_query(self, text, speed_scale=1.0):
+        """/audio_query はテキストを詰め直すだけなので、同じ内容をクライアント側で作って往復を省く"""
+        return {
+            "text": text,
+            "speaker_id": self.speaker_id,
+            "speedScale": speed_scale,
+            "pitchScale": 0.0,
+            "intonationScale": 1.0,
+            "volumeScale": 1.0,
+            "outputSamplingRate": 44100,
+        }
+
+    def synthesize(self, text):
+        try:
+            response = tts_http.post(self.base_url, "/synthesis", self.synthesis_timeout, self.retries,
+                                     params={"speaker": self.speaker_id}, json=self.build_query(text))
+            return response.content, self.name
+        except Exception as e:
+            print(f"Style-Bert-VITS2接続エラー: {e}")
+            return None, self.name
+
+    def synthesize_stream(self, text, on_complete=None):
+        """
+        /synthesis_stream で合成し、WAVヘッダを受け取った時点で tts_stream.StreamingAudio を返す。
+        最後まで受信できたら on_complete(WAVデータ) が呼ばれる。
+        ストリーミングが使えない場合は synthesize と同じ (WAVデータ, エンジン名) を返す。
+        """
+        if not self.streaming:
+            return self.synthesize(text)
+        try:
+            audio = tts_stream.get_stream_client().open_stream(
+                f"{self.base_url}/synthesis_stream", params={"speaker": self.speaker_id},
+                json=self.build_query(text), read_timeout=self.synthesis_timeout, on_complete=on_complete)
+            return audio, self.name
+        except Exception as e:
+            if getattr(e, "status", None) in (404, 405):
+                logging.warning("VITS2 server has no /synthesis_stream endpoint. Streaming disabled.")
+                self.streaming = False
+            else:
+                logging.warning(f"Streaming synthesis failed, retrying without streaming: {e}")
+            return self.synthesize(text)
+
+
+def create_engine(name, settings):
+    """tts_engine 設定値と設定 dict（または SettingsManager）からエンジンを生成する"""
+    if name == GeminiTTSEngine.name:
+        return GeminiTTSEngine()
+    if name == StyleBertVits2Engine.name:
+        return StyleBertVits2Engine(speaker_id=settings.get("vits2_speaker_id", 0),
+                                    streaming=settings.get("vits2_streaming", True))
+    if name != VoicevoxEngine.name:
+        logging.warning(f"Unknown TTS engine '{name}'. Using VOICEVOX.")
+    return VoicevoxEngine()
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+import time
+import random
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# ローカルTTSサーバーごとに共有する Session（keep-alive でTCP接続を使い回す）
+_sessions = {}
+_lock = threading.Lock()
+
+POOL_MAXSIZE = 8
+RETRY_STATUSES = (502, 503, 504)
+
+
+def get_session(base_url):
+    """base_url ごとの接続プール付き Session を取得"""
+    with _lock:
+        session = _sessions.get(base_url)
+        if session is None:
+            session = requests.Session()
+            # 合成ワーカーが並列に叩いても接続を作り直さないよう、プールを広めに取る
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_MAXSIZE, max_retries=0)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _sessions[base_url] = session
+        return session
+
+
+def post(base_url, path, timeout, retries=2, backoff=0.1, **kwargs):
+    """
+    接続プールを使って POST する。
+    接続エラーと 502/503/504 は retries 回まで再試行し、待ち時間は backoff * 2^n を上限とするランダム値（full jitter）。
+    読み取りタイムアウトは合成が重いだけのことが多いので再試行しない。
+    """
+    session = get_session(base_url)
+    url = base_url + path
+    for attempt in range(retries + 1):
+        try:
+            response = session.post(url, timeout=timeout, **kwargs)
+            if response.status_code in RETRY_STATUSES and attempt < retries:
+                logging.debug(f"TTS server returned {response.status_code}. Retrying: {path}")
+            else:
+                response.raise_for_status()
+                return response
+        except (requests.exceptions.ConnectionError, requests.exceptions.ConnectTimeout) as e:
+            if attempt >= retries:
+                raise
+            logging.debug(f"TTS server connection failed ({e}). Retrying: {path}")
+        time.sleep(random.uniform(0, backoff * (2 ** attempt)))
+
+
+def close_sessions():
+    with _lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
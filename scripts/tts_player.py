@@ -2,23 +2,49 @@
 import threading
 import queue
 import logging
-import re
 import time
+from concurrent.futures import ThreadPoolExecutor, CancelledError, TimeoutError as FutureTimeoutError
 import scripts.voice as voice
+from scripts.audio_output import get_output_engine
+from scripts.tts_stream import StreamingAudio
+from scripts.tts_chunker import AdaptiveChunker
 
 class TTSManager:
     """
     音声合成(TTS)と再生のキュー管理、およびバックグラウンド実行を担うクラス。
     gui/app.py から重いロジックを抽出。
     """
-    def __init__(self, on_playback_start=None, on_playback_end=None):
+    # 次の文がこの秒数内に届かなければ、保留中の末尾をそのまま書き出す
+    TAIL_HOLD_TIMEOUT = 0.05
+
+    def __init__(self, on_playback_start=None, on_playback_end=None, crossfade_ms=30, volume=0.5,
+                 synthesis_workers=2, max_ahead=3):
+        """
+        crossfade_ms: 連続する文の前後の無音を削ってつなぐクロスフェード長（0 で無効）
+        volume: 再生音量の倍率
+        synthesis_workers: 並列に合成する文の数
+        max_ahead: 再生済みでない（合成中・合成済み）文の上限。これを超えると投入を待つ
+        """
         self.tts_queue = queue.Queue()
         self.playback_queue = queue.Queue()
         
         # コールバック (UI更新用)
         self.on_playback_start = on_playback_start
         self.on_playback_end = on_playback_end
+        self.crossfade_ms = crossfade_ms
+        self.volume = volume
         
+        # 応答の最初は短く、以降は合成速度に合わせて長いチャンクに分ける
+        self.synthesis_workers = max(1, synthesis_workers)
+        self.chunker = AdaptiveChunker(parallelism=self.synthesis_workers)
+        self.max_ahead = max(1, max_ahead)
+        self._executor = None
+        # 合成中・再生待ちの文の数を max_ahead に抑える
+        self._ahead = threading.Semaphore(self.max_ahead)
+        # clear_queues のたびに進める。古い世代の合成結果は再生しない
+        self._generation = 0
+        self._gen_lock = threading.Lock()
+
         self.is_running = False
         self.threads = []
 
@@ -27,8 +53,9 @@ class TTSManager:
         if self.is_running:
             return
         self.is_running = True
+        self._executor = ThreadPoolExecutor(max_workers=self.synthesis_workers, thread_name_prefix="TTS-Synthesis")
         
-        t1 = threading.Thread(target=self._synthesis_worker, daemon=True, name="TTS-Synthesis")
+        t1 = threading.Thread(target=self._dispatch_worker, daemon=True, name="TTS-Dispatch")
         t2 = threading.Thread(target=self._playback_worker, daemon=True, name="TTS-Playback")
         
         self.threads = [t1, t2]
@@ -39,15 +66,13 @@ class TTSManager:
     def stop(self):
         """ワーカー停止"""
         self.is_running = False
+        # 進行中のキューをクリアしてから終了の合図を入れる
+        self._advance_generation()
+        self._drain_queues()
         self.tts_queue.put(None)
         self.playback_queue.put(None)
-        # 進行中のキューをクリア
-        while not self.tts_queue.empty():
-            try: self.tts_queue.get_nowait()
-            except queue.Empty: break
-        while not self.playback_queue.empty():
-            try: self.playback_queue.get_nowait()
-            except queue.Empty: break
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
         logging.info("TTSManager workers stopping.")
 
     def put_text(self, text):
@@ -56,66 +81,135 @@ class TTSManager:
             self.tts_queue.put(text)
 
     def clear_queues(self):
-        """再生待ちを中断しキューを空にする"""
+        """再生待ちを中断しキューを空にする（合成中の文の結果も再生しない）"""
         voice.stop_playback_event.set()
+        self._advance_generation()
+        self._drain_queues()
+        self.chunker.reset()
+        # 中断した応答と次の応答の間を文間の隙間として数えない
+        get_output_engine().end_utterance(flush=False)
+        # 少し待ってからリセット
+        time.sleep(0.1)
+        voice.stop_playback_event.clear()
+
+    def _advance_generation(self):
+        with self._gen_lock:
+            self._generation += 1
+
+    def _drain_queues(self):
         while not self.tts_queue.empty():
             try: self.tts_queue.get_nowait()
             except queue.Empty: break
         while not self.playback_queue.empty():
-            try: self.playback_queue.get_nowait()
+            try: item = self.playback_queue.get_nowait()
             except queue.Empty: break
-        # 少し待ってからリセット
-        time.sleep(0.1)
-        voice.stop_playback_event.clear()
+            self._discard(item)
+
+    def _discard(self, item):
+        """再生しない合成ジョブを取り消し、先行枠を返す"""
+        if isinstance(item, tuple):
+            _, future = item
+            if not future.cancel():
+                self._cancel_stream(future)
+            self._ahead.release()
+
+    @staticmethod
+    def _cancel_stream(future):
+        """合成済みの結果が受信中のストリームなら受信を打ち切る"""
+        if future.done() and not future.cancelled() and isinstance(future.result(), StreamingAudio):
+            future.result().cancel()
+
+    def _split(self, text):
+        """現在のエンジンの実測合成速度に合わせて文をチャンクに分ける"""
+        return self.chunker.split(text, voice.get_tts_engine().name)
 
-    def _synthesis_worker(self):
-        """文を音声データに変換する（先行合成）スレッド"""
+    def _dispatch_worker(self):
+        """
+        テキストを文に分けて合成プールへ投入し、Future を投入順に再生キューへ並べるスレッド。
+        再生キューが Future の列になっているため、合成がどの順に終わっても再生順は投入順になる。
+        """
         while self.is_running:
             item = self.tts_queue.get()
             if item is None: break
             
             if item == "END_MARKER":
+                self.chunker.reset()
                 self.playback_queue.put("END_MARKER")
                 self.tts_queue.task_done()
                 continue
 
-            # 長文分割ロジック
-            sentences = [s.strip() for s in re.split(r'([、,])', item) if s.strip()] if len(item) > 100 else [item]
-            
-            for sub in sentences:
-                try:
-                    if voice.stop_playback_event.is_set(): break
-                    logging.debug(f"Synthesis starting: {sub[:20]}...")
-                    wav_data = voice.generate_speech_data(sub)
-                    if wav_data:
-                        self.playback_queue.put(wav_data)
-                except Exception as e:
-                    logging.error(f"TTS Synthesis error: {e}")
+            generation = self._generation
+            for sub in self._split(item):
+                # 先行しすぎないよう、再生が追いつくまで待つ
+                while self.is_running and not self._ahead.acquire(timeout=0.2):
+                    pass
+                if not self.is_running:
+                    break
+                if generation != self._generation or voice.stop_playback_event.is_set():
+                    self._ahead.release()
+                    break
+                future = self._executor.submit(self._synthesize, generation, sub)
+                self.playback_queue.put((generation, future))
             
             self.tts_queue.task_done()
 
+    def _synthesize(self, generation, text):
+        """合成プールのスレッドで1文を合成する。取り消された世代なら何もしない"""
+        if generation != self._generation or voice.stop_playback_event.is_set():
+            return None
+        try:
+            logging.debug(f"Synthesis starting: {text[:20]}...")
+            # ストリーミング対応エンジンではヘッダ受信時点で StreamingAudio が返る
+            return voice.generate_speech_stream(text)
+        except Exception as e:
+            logging.error(f"TTS Synthesis error: {e}")
+            return None
+
     def _playback_worker(self):
-        """合成済み音声を順次再生するスレッド"""
+        """合成済み音声を投入順に再生するスレッド（連続する文はクロスフェードでつなぐ）"""
+        engine = get_output_engine()
         while self.is_running:
-            item = self.playback_queue.get()
+            try:
+                # 末尾を保留している間は次の文を短時間だけ待ち、来なければ書き出す
+                item = self.playback_queue.get(timeout=self.TAIL_HOLD_TIMEOUT if engine.has_tail() else None)
+            except queue.Empty:
+                engine.flush_tail(voice.stop_playback_event)
+                continue
             if item is None: break
             
             if item == "END_MARKER":
+                engine.end_utterance(flush=not voice.stop_playback_event.is_set())
                 if self.on_playback_end:
                     self.on_playback_end(is_final=True)
                 self.playback_queue.task_done()
                 continue
 
-            wav_data = item
+            generation, future = item
             try:
-                if not voice.stop_playback_event.is_set():
+                result = self._wait_result(engine, future)
+                if result and generation == self._generation and not voice.stop_playback_event.is_set():
                     if self.on_playback_start:
                         self.on_playback_start()
                     
-                    # 音量調整込みで再生
-                    voice.play_wav_data(wav_data, volume=0.5)
+                    # 音量調整込みで再生。末尾は次の文とのクロスフェード用に保留する
+                    play = engine.play_stream if isinstance(result, StreamingAudio) else engine.play
+                    play(result, volume=self.volume, stop_event=voice.stop_playback_event,
+                         crossfade_ms=self.crossfade_ms, hold_tail=bool(self.crossfade_ms))
+                elif isinstance(result, StreamingAudio):
+                    result.cancel()
+            except CancelledError:
+                pass
             except Exception as e:
                 logging.error(f"TTS Playback error: {e}")
             finally:
+                self._ahead.release()
                 self.playback_queue.task_done()
-                # 連続再生中の「文の間」では end(final=False) を呼ぶ必要があればここ
+
+    def _wait_result(self, engine, future):
+        """合成結果を待つ。末尾を保留中に次の文が間に合わなければ先に書き出す"""
+        if engine.has_tail():
+            try:
+                return future.result(timeout=self.TAIL_HOLD_TIMEOUT)
+            except FutureTimeoutError:
+                engine.flush_tail(voice.stop_playback_event)
+        return future.result()
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+import io
+import time
+import wave
+import queue
+import struct
+import asyncio
+import logging
+import threading
+import concurrent.futures
+
+# aiohttp optional（無い場合はストリーミングを使わず通常の合成にフォールバックする）
+try:
+    import aiohttp  # type: ignore
+    _HAS_AIOHTTP = True
+except Exception:
+    _HAS_AIOHTTP = False
+
+READ_BLOCK = 8192
+_END = object()
+
+
+class StreamingAudio:
+    """
+    受信中のWAV。WAVヘッダを受け取った時点で返され、PCMは iter_blocks() で届いた順に取り出す。
+    最後まで受信できたら on_complete(wav_bytes) を呼ぶ（キャッシュ保存用）。
+    接続の切断や途中で終わった応答はエラーとして扱い、on_complete は呼ばない。
+    """
+    def __init__(self, rate, channels, width, started_at, on_complete=None):
+        self.rate = rate
+        self.channels = channels
+        self.width = width
+        self.started_at = started_at        # リクエスト送信時刻 (perf_counter)
+        self.first_block_at = None
+        self.on_complete = on_complete
+        self._queue = queue.Queue()
+        self._chunks = []
+        self._cancel = None
+        self.cancelled = False
+
+    def _feed(self, data):
+        if self.first_block_at is None:
+            self.first_block_at = time.perf_counter()
+        self._chunks.append(data)
+        self._queue.put(data)
+
+    def _finish(self, error=None):
+        self._queue.put(error if error is not None else _END)
+        if error is None and not self.cancelled and self.on_complete:
+            try:
+                self.on_complete(self.wav_bytes())
+            except Exception as e:
+                logging.warning(f"Streaming TTS on_complete failed: {e}")
+
+    def next_block(self, timeout):
+        """
+        次の PCM ブロックを返す（受信が終わっていれば None）。
+        timeout 秒待っても届かなければ queue.Empty、受信エラーはその例外を送出する。
+        """
+        item = self._queue.get(timeout=timeout)
+        if item is _END:
+            return None
+        if isinstance(item, BaseException):
+            raise item
+        return item
+
+    def iter_blocks(self, timeout=60):
+        """フレーム境界に揃った PCM バイト列を届いた順に返す。受信エラーは例外として送出する"""
+        while True:
+            block = self.next_block(timeout)
+            if block is None:
+                return
+            yield block
+
+    def cancel(self):
+        """受信を打ち切る"""
+        self.cancelled = True
+        if self._cancel:
+            self._cancel()
+
+    def wav_bytes(self):
+        buf = io.BytesIO()
+        with wave.open(buf, "wb") as wf:
+            wf.setnchannels(self.channels)
+            wf.setsampwidth(self.width)
+            wf.setframerate(self.rate)
+            wf.writeframes(b"".join(self._chunks))
+        return buf.getvalue()
+
+
+async def _read_wav_header(content):
+    """RIFF ヘッダを読み、fmt チャンクの値を返す（data チャンクの先頭まで読み進める）"""
+    riff = await content.readexactly(12)
+    if riff[:4] != b"RIFF" or riff[8:12] != b"WAVE":
+        raise ValueError("Invalid WAV stream.")
+    fmt = None
+    while True:
+        chunk_id, size = struct.unpack("<4sI", await content.readexactly(8))
+        if chunk_id == b"data":
+            if fmt is None:
+                raise ValueError("WAV stream has no fmt chunk.")
+            return fmt
+        body = await content.readexactly(size + (size & 1))
+        if chunk_id == b"fmt ":
+            _, channels, rate, _, _, bits = struct.unpack_from("<HHIIHH", body)
+            fmt = (rate, channels, bits // 8)
+
+
+class AsyncTTSClient:
+    """
+    専用スレッドで asyncio ループを回し、aiohttp でTTSサーバーの応答をストリーミング受信するクライアント。
+    同期側（合成ワーカー）からは open_stream でヘッダ受信まで待ち、PCMは StreamingAudio から取り出す。
+    """
+    def __init__(self, pool_size=8):
+        self.pool_size = pool_size
+        self._loop = None
+        self._session = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is None:
+                ready = threading.Event()
+
+                def _run():
+                    self._loop = asyncio.new_event_loop()
+                    asyncio.set_event_loop(self._loop)
+                    ready.set()
+                    self._loop.run_forever()
+
+                threading.Thread(target=_run, daemon=True, name="TTS-AsyncClient").start()
+                ready.wait()
+        return self._loop
+
+    async def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=30)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    def open_stream(self, url, params=None, json=None, connect_timeout=10, read_timeout=60, on_complete=None):
+        """
+        POST してWAVヘッダを受け取るまで待ち、StreamingAudio を返す。
+        ヘッダ受信前のエラー（接続失敗・HTTPエラー）はこの呼び出しで例外になる。
+        on_complete は open_stream が返る前に受信が終わっても呼ばれるよう、StreamingAudio の作成時に渡す。
+        """
+        if not _HAS_AIOHTTP:
+            raise RuntimeError("aiohttp is not available.")
+        loop = self._ensure_loop()
+        header = concurrent.futures.Future()
+        task = asyncio.run_coroutine_threadsafe(
+            self._stream(url, params, json, connect_timeout, read_timeout, header, on_complete), loop)
+        try:
+            audio = header.result(timeout=connect_timeout + read_timeout)
+        except BaseException:
+            task.cancel()
+            raise
+        audio._cancel = task.cancel
+        return audio
+
+    async def _stream(self, url, params, json, connect_timeout, read_timeout, header, on_complete):
+        audio = None
+        try:
+            session = await self._get_session()
+            timeout = aiohttp.ClientTimeout(total=None, sock_connect=connect_timeout, sock_read=read_timeout)
+            started_at = time.perf_counter()
+            async with session.post(url, params=params, json=json, timeout=timeout) as response:
+                response.raise_for_status()
+                rate, channels, width = await _read_wav_header(response.content)
+                audio = StreamingAudio(rate, channels, width, started_at, on_complete)
+                header.set_result(audio)
+
+                frame = channels * width
+                pending = b""
+                async for data in response.content.iter_chunked(READ_BLOCK):
+                    pending += data
+                    usable = len(pending) - len(pending) % frame
+                    if usable:
+                        audio._feed(pending[:usable])
+                        pending = pending[usable:]
+                # サーバーが途中で打ち切った応答（フレームの途中で終わった・PCM が無い）は完了扱いにしない
+                if pending or not audio._chunks:
+                    raise ConnectionError("Streaming TTS response ended prematurely.")
+            audio._finish()
+        except asyncio.CancelledError:
+            if audio is not None:
+                audio._finish(RuntimeError("Streaming TTS was cancelled."))
+            raise
+        except Exception as e:
+            if not header.done():
+                header.set_exception(e)
+            elif audio is not None:
+                audio._finish(e)
+
+    def close(self):
+        if self._loop is None:
+            return
+
+        async def _close():
+            if self._session is not None:
+                await self._session.close()
+
+        asyncio.run_coroutine_threadsafe(_close(), self._loop).result(timeout=5)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_stream_client():
+    """プロセス全体で共有するストリーミングクライアントを取得"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = AsyncTTSClient()
+        return _client
+
+
+def is_available():
+    return _HAS_AIOHTTP
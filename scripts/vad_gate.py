@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+import logging
+import numpy as np
+from scripts.audio_buffer import int16_to_float32, mean_abs
+
+# webrtcvad optional（無い場合はエネルギー判定のみで動作する）
+try:
+    import webrtcvad  # type: ignore
+    _HAS_WEBRTCVAD = True
+except Exception:
+    _HAS_WEBRTCVAD = False
+
+
+class VADGate:
+    """
+    AudioService と文字起こしエンジンの間に置く、フレーム単位の発話区間ゲート。
+
+    int16 のマイク入力を webrtcvad 用の固定長フレーム（10/20/30ms）に切り直し、
+    まず平均振幅で明らかな無音を弾いてから webrtcvad で発話判定する。
+    発話区間とその前後（pre-roll / post-roll）だけを target(audio_float32) に流し、
+    ゲートが閉じている間は後段に一切音声を渡さない。
+    """
+    def __init__(self, target, sample_rate=16000, aggressiveness=2, frame_ms=30,
+                 pre_roll_ms=300, post_roll_ms=600, energy_threshold=150.0,
+                 min_speech_frames=2, on_open=None, on_close=None):
+        if frame_ms not in (10, 20, 30):
+            raise ValueError("frame_ms must be 10, 20 or 30 for webrtcvad.")
+        self.target = target
+        self.sample_rate = sample_rate
+        self.frame_samples = sample_rate * frame_ms // 1000
+        self.energy_threshold = energy_threshold
+        self.min_speech_frames = max(1, min_speech_frames)
+        self.post_roll_frames = max(1, post_roll_ms // frame_ms)
+        self.on_open = on_open
+        self.on_close = on_close
+
+        self.vad = webrtcvad.Vad(aggressiveness) if _HAS_WEBRTCVAD else None
+        if self.vad is None:
+            logging.warning("webrtcvad is not available. VADGate falls back to energy-only detection.")
+
+        # 入力をフレーム長に切り直すための作業バッファ
+        self._pending = np.zeros(self.frame_samples * 4, dtype=np.int16)
+        self._pending_len = 0
+        self._frame = np.zeros(self.frame_samples, dtype=np.int16)
+        self._float_frame = np.empty(self.frame_samples, dtype=np.float32)
+        self._meter_scratch = np.empty(self.frame_samples, dtype=np.float32)
+
+        # pre-roll 用の固定長リング（ゲートが閉じている間の直近フレーム）
+        self._pre_roll = np.zeros((max(1, pre_roll_ms // frame_ms), self.frame_samples), dtype=np.int16)
+        self._pre_roll_count = 0
+        self._pre_roll_pos = 0
+
+        self.is_open = False
+        self._speech_run = 0
+        self._silence_run = 0
+
+        # 統計（サンプル数）
+        self.gated_samples = 0
+        self.passed_samples = 0
+        self._next_report_samples = sample_rate * 600
+
+    def process(self, chunk):
+        """AudioService のリスナーとして int16 チャンクを受け取る"""
+        n = len(chunk)
+        if self._pending_len + n > len(self._pending):
+            grown = np.zeros(self._pending_len + n + self.frame_samples, dtype=np.int16)
+            grown[:self._pending_len] = self._pending[:self._pending_len]
+            self._pending = grown
+        self._pending[self._pending_len:self._pending_len + n] = chunk
+        self._pending_len += n
+
+        offset = 0
+        while self._pending_len - offset >= self.frame_samples:
+            np.copyto(self._frame, self._pending[offset:offset + self.frame_samples])
+            offset += self.frame_samples
+            self._process_frame(self._frame)
+
+        # 余りを先頭へ詰める
+        remain = self._pending_len - offset
+        if remain and offset:
+            self._pending[:remain] = self._pending[offset:self._pending_len]
+        self._pending_len = remain
+
+    def _is_speech(self, frame):
+        if mean_abs(frame, self._meter_scratch) < self.energy_threshold:
+            return False
+        if self.vad is None:
+            return True
+        try:
+            return self.vad.is_speech(frame.tobytes(), self.sample_rate)
+        except Exception as e:
+            logging.debug(f"webrtcvad error: {e}")
+            return True
+
+    def _process_frame(self, frame):
+        speech = self._is_speech(frame)
+
+        if self.is_open:
+            self._emit(frame)
+            if speech:
+                self._silence_run = 0
+            else:
+                self._silence_run += 1
+                if self._silence_run >= self.post_roll_frames:
+                    self._close()
+        else:
+            self._speech_run = self._speech_run + 1 if speech else 0
+            if self._speech_run >= self.min_speech_frames:
+                self._open()
+                self._emit(frame)
+            else:
+                self._push_pre_roll(frame)
+                self.gated_samples += self.frame_samples
+
+        if self.gated_samples + self.passed_samples >= self._next_report_samples:
+            self._next_report_samples += self.sample_rate * 600
+            logging.info(f"VAD gate stats: {self.get_stats()}")
+
+    def _push_pre_roll(self, frame):
+        self._pre_roll[self._pre_roll_pos] = frame
+        self._pre_roll_pos = (self._pre_roll_pos + 1) % len(self._pre_roll)
+        self._pre_roll_count = min(self._pre_roll_count + 1, len(self._pre_roll))
+
+    def _open(self):
+        self.is_open = True
+        self._silence_run = 0
+        # 直前の pre-roll を古い順に流す（ゲート済みとして数えた分をパス側へ振り替える）
+        size = len(self._pre_roll)
+        start = (self._pre_roll_pos - self._pre_roll_count) % size
+        for i in range(self._pre_roll_count):
+            self.gated_samples -= self.frame_samples
+            self._emit(self._pre_roll[(start + i) % size])
+        self._pre_roll_count = 0
+        if self.on_open:
+            self.on_open()
+
+    def _close(self):
+        self.is_open = False
+        self._speech_run = 0
+        if self.on_close:
+            self.on_close()
+
+    def _emit(self, frame):
+        self.passed_samples += self.frame_samples
+        self.target(int16_to_float32(frame, self._float_frame))
+
+    def get_stats(self):
+        """ゲートで捨てた秒数と後段に流した秒数"""
+        gated = self.gated_samples / self.sample_rate
+        passed = self.passed_samples / self.sample_rate
+        total = gated + passed
+        return {
+            "gated_sec": round(gated, 1),
+            "passed_sec": round(passed, 1),
+            "gated_ratio": round(gated / total, 3) if total else 0.0,
+        }
@@ -1,29 +1,55 @@
 # -*- coding: utf-8 -*-
 import os
+import re
+import gc
 import json
+import queue
+import struct
+import hashlib
+import asyncio
+import unicodedata
 import logging
+import argparse
+import threading
 import sys
 import time
+import concurrent.futures
+from collections import OrderedDict, Counter, defaultdict
 from typing import Optional, List
 from fastapi import FastAPI, Request, Response, Query
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 import uvicorn
-import torch
 import numpy as np
 
+# psutil optional（あればモデルごとのRSS増分も記録する）
+try:
+    import psutil  # type: ignore
+    _HAS_PSUTIL = True
+except Exception:
+    _HAS_PSUTIL = False
+
+# onnxruntime optional（あれば GPU の無い環境で ONNX Runtime による CPU 推論を使う）
+try:
+    import onnxruntime as ort  # type: ignore
+    _HAS_ORT = True
+except Exception:
+    _HAS_ORT = False
+
 # インポート前に環境変数を設定
 MODEL_DIR = "models/vits2"
 BERT_DIR = os.path.abspath(os.path.join(MODEL_DIR, "bert"))
 os.environ["BERT_MODELS_DIR"] = BERT_DIR
 
-# Style-Bert-VITS2 関連のインポート
-try:
-    from style_bert_vits2.tts_model import TTSModel
-    from style_bert_vits2.constants import Languages
-    from style_bert_vits2.nlp import bert_models
-except ImportError as e:
-    logging.critical(f"style-bert-vits2 のインポートに失敗しました: {e}", exc_info=True)
-    sys.exit(1)
+# torch と Style-Bert-VITS2 は重いので ensure_libraries で読み込む（起動直後から /speakers や /health に応答するため）
+torch = None
+TTSModel = None
+Languages = None
+DEFAULT_STYLE = None
+DEFAULT_STYLE_WEIGHT = None
+bert_models = None
+infer_module = None
+HyperParameters = None
+libraries_lock = threading.Lock()
 
 app = FastAPI(title="Style-Bert-VITS2 VOICEVOX Wrapper")
 
@@ -35,6 +61,738 @@ model_configs_cache = {}
 speakers_info = []
 # BERTモデルがロード済みかどうかのフラグ
 bert_loaded = False
+bert_lock = threading.Lock()
+# 推論スケジューラ {speaker_id: InferenceScheduler}
+schedulers = {}
+schedulers_lock = threading.Lock()
+# スケジューラの設定（起動引数で上書き）
+scheduler_options = {"max_queue": 16, "batch_window_ms": 0, "max_batch": 4, "batch_max_chars": 40}
+# 推論バックエンドの設定（起動引数で上書き）。auto は GPU が無く onnxruntime があれば onnx
+backend_options = {"backend": "auto", "threads": 0, "int8": False}
+
+# 推論パラメータ（/synthesis と /synthesis_stream で共通）
+INFER_PARAMS = {
+    "sdp_ratio": 0.0,      # リズムを固定して噛み・崩れを防止
+    "noise": 0.5,          # ノイズを抑えてクリアな声に
+    "noise_w": 0.9,        # 抑揚の強さ（デフォルト付近で維持）
+}
+
+class LoadProgress:
+    """
+    起動時の読み込み（ライブラリ → BERT → 既定の話者）の進捗。
+    /health で現在の状態を返し、/health/stream では変化するたびに通知する。
+    """
+    STAGES = {"imports": "ライブラリ", "bert": "BERT", "default_speaker": "既定の話者"}
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self.version = 0
+        self._stages = {name: {"status": "pending", "sec": None, "error": None} for name in self.STAGES}
+        self._begun = {}
+
+    def _update(self, stage, **fields):
+        with self._lock:
+            self._stages[stage].update(fields)
+            self.version += 1
+
+    def begin(self, stage):
+        self._begun[stage] = time.time()
+        self._update(stage, status="loading", error=None)
+
+    def finish(self, stage):
+        self._update(stage, status="done", sec=round(time.time() - self._begun.get(stage, self.started_at), 2))
+
+    def skip(self, stage):
+        self._update(stage, status="skipped")
+
+    def fail(self, stage, error):
+        self._update(stage, status="failed", error=str(error))
+
+    def snapshot(self):
+        with self._lock:
+            stages = {name: dict(info) for name, info in self._stages.items()}
+            version = self.version
+        finished = sum(info["status"] in ("done", "skipped") for info in stages.values())
+        started = any(info["status"] in ("loading", "done", "failed") for info in stages.values())
+        failed = next((name for name, info in stages.items() if info["status"] == "failed"), None)
+        # 読み込み中の段階（段階の切り替わりの間は次に読み込む段階）
+        stage = next((name for name, info in stages.items() if info["status"] == "loading"), None) \
+            or next((name for name, info in stages.items() if info["status"] == "pending"), None)
+        if finished == len(stages):
+            status, message = "ready", "準備完了"
+        elif failed is not None and (stage is None or stages[stage]["status"] != "loading"):
+            status, message = "error", f"{self.STAGES[failed]}の読み込みに失敗しました: {stages[failed]['error']}"
+        elif not started:
+            # --no-preload で起動し、まだリクエストが来ていない
+            status, message = "idle", "待機中（最初のリクエストで読み込みます）"
+        else:
+            status, message = "loading", f"{self.STAGES[stage]}を読み込み中"
+        return {
+            "status": status,
+            "message": message,
+            "progress": round(finished / len(stages), 2),
+            "stage": stage if status == "loading" else None,
+            "stages": stages,
+            "speakers": len(speakers_info),
+            "uptime_sec": round(time.time() - self.started_at, 1),
+            "version": version,
+        }
+
+progress = LoadProgress()
+
+def ensure_libraries():
+    """torch と Style-Bert-VITS2 を一度だけ読み込む（同時に呼ばれても読み込みは1回）"""
+    global torch, TTSModel, Languages, DEFAULT_STYLE, DEFAULT_STYLE_WEIGHT
+    global bert_models, infer_module, HyperParameters
+    with libraries_lock:
+        if infer_module is not None:
+            return
+        progress.begin("imports")
+        start_time = time.time()
+        try:
+            import torch
+            from style_bert_vits2.tts_model import TTSModel
+            from style_bert_vits2.constants import Languages, DEFAULT_STYLE, DEFAULT_STYLE_WEIGHT
+            from style_bert_vits2.nlp import bert_models
+            from style_bert_vits2.models.hyper_parameters import HyperParameters
+            import scipy.io.wavfile  # noqa: F401  /synthesis の WAV 書き出し用に先に読み込んでおく
+            from style_bert_vits2.models import infer as infer_module
+        except ImportError as e:
+            logging.critical(f"style-bert-vits2 のインポートに失敗しました: {e}", exc_info=True)
+            progress.fail("imports", e)
+            raise
+        if backend_options["threads"] > 0:
+            torch.set_num_threads(backend_options["threads"])
+        feature_cache.install()
+        progress.finish("imports")
+        backend = resolve_backend()
+        logging.info(f"ライブラリ読み込み完了 ({time.time() - start_time:.2f}秒)。推論バックエンド: {backend}"
+                     + (" (int8)" if backend_options["int8"] and backend == "onnx" else ""))
+
+FEATURE_CACHE_DIR = os.path.join(MODEL_DIR, ".cache", "features")
+
+class FeatureCache:
+    """
+    テキスト処理（g2p と BERT 特徴量）の結果のキャッシュ。
+
+    style_bert_vits2.models.infer.get_text を差し替え、正規化したテキスト・言語・モデルの
+    テキスト処理設定（バージョン, add_blank）が同じなら、BERT の forward を行わずに前回の結果を返す。
+    メモリ上は memory_mb までの LRU、cache_dir を指定すると disk_mb までディスクにも保存して再起動後も使う。
+    assist_text や音素・トーン指定がある呼び出しはキャッシュしない。
+    """
+    # 言語ごとに get_text が返す (bert, ja_bert, en_bert) のうち実際の特徴量が入る位置
+    _SLOTS = {"ZH": 0, "JP": 1, "EN": 2}
+
+    def __init__(self, memory_mb=256, cache_dir=FEATURE_CACHE_DIR, disk_mb=512):
+        self._original = None
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()   # key -> (slot, bert, phone, tone, language)
+        self._memory_size = 0
+        self._disk = OrderedDict()     # key -> size
+        self._disk_size = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.configure(memory_mb, cache_dir, disk_mb)
+
+    def configure(self, memory_mb=256, cache_dir=FEATURE_CACHE_DIR, disk_mb=512):
+        self.memory_bytes = memory_mb * 1024 * 1024
+        self.cache_dir = cache_dir
+        self.disk_bytes = disk_mb * 1024 * 1024 if cache_dir else 0
+        with self._lock:
+            self._disk.clear()
+            self._disk_size = 0
+        self._scan_disk()
+
+    def install(self):
+        """get_text を差し替える（TTSModel.infer とバッチ推論の両方がこれを通る）"""
+        if self._original is None:
+            self._original = infer_module.get_text
+            infer_module.get_text = self.get_text
+
+    def _scan_disk(self):
+        if not self.disk_bytes:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            entries = []
+            for name in os.listdir(self.cache_dir):
+                if name.endswith(".npz") and not name.endswith(".tmp.npz"):
+                    st = os.stat(os.path.join(self.cache_dir, name))
+                    entries.append((st.st_mtime, name[:-4], st.st_size))
+            with self._lock:
+                for _, key, size in sorted(entries):
+                    self._disk[key] = size
+                    self._disk_size += size
+            self._evict_disk()
+        except OSError as e:
+            logging.warning(f"特徴量キャッシュのディレクトリが使えません: {e}")
+            self.disk_bytes = 0
+
+    @staticmethod
+    def _key(text, language_str, hps):
+        norm = unicodedata.normalize("NFKC", text).strip()
+        source = f"{language_str}\x00{hps.version}\x00{hps.data.add_blank}\x00{norm}"
+        return hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+    def get_text(self, text, language_str, hps, device, assist_text=None, assist_text_weight=0.7,
+                 given_phone=None, given_tone=None):
+        if assist_text or given_phone is not None or given_tone is not None \
+                or str(language_str) not in self._SLOTS:
+            return self._original(text, language_str, hps, device, assist_text, assist_text_weight,
+                                  given_phone, given_tone)
+        key = self._key(text, language_str, hps)
+        entry = self._lookup(key)
+        if entry is None:
+            result = self._original(text, language_str, hps, device)
+            slot = self._SLOTS[str(language_str)]
+            entry = (slot, result[slot].detach().cpu(), result[3], result[4], result[5])
+            self._store(key, entry)
+            return result
+        slot, bert, phone, tone, language = entry
+        berts = [torch.zeros(bert.shape[0], bert.shape[1]) for _ in range(3)]
+        berts[slot] = bert
+        return berts[0], berts[1], berts[2], phone, tone, language
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry
+            on_disk = key in self._disk
+            if on_disk:
+                self._disk.move_to_end(key)
+        if on_disk:
+            path = os.path.join(self.cache_dir, key + ".npz")
+            try:
+                with np.load(path) as data:
+                    entry = (int(data["slot"]), torch.from_numpy(data["bert"]),
+                             *(torch.from_numpy(data[name]) for name in ("phone", "tone", "language")))
+                os.utime(path)
+                with self._lock:
+                    self.disk_hits += 1
+                    self._put_memory(key, entry)
+                return entry
+            except Exception as e:
+                logging.warning(f"特徴量キャッシュの読み込みに失敗しました: {e}")
+                self._remove_disk(key)
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _store(self, key, entry):
+        with self._lock:
+            self._put_memory(key, entry)
+            if not self.disk_bytes or key in self._disk:
+                return
+        slot, bert, phone, tone, language = entry
+        path = os.path.join(self.cache_dir, key + ".npz")
+        try:
+            # np.savez は拡張子 .npz を補うので、一時ファイル名も .npz で終える。
+            # 同じ文を複数のスレッドが同時に保存することがあるので、書き手ごとに名前を分ける
+            tmp = os.path.join(self.cache_dir, f"{key}.{os.getpid()}-{threading.get_ident()}.tmp.npz")
+            np.savez(tmp, slot=slot, bert=bert.numpy(), phone=phone.numpy(), tone=tone.numpy(),
+                     language=language.numpy())
+            size = os.path.getsize(tmp)
+            os.replace(tmp, path)
+        except Exception as e:
+            logging.warning(f"特徴量キャッシュの保存に失敗しました: {e}")
+            return
+        with self._lock:
+            # 書いている間に別のスレッドが同じキーを登録していたら、その分を差し引いてから数え直す
+            self._disk_size -= self._disk.pop(key, 0)
+            self._disk[key] = size
+            self._disk_size += size
+        self._evict_disk()
+
+    @staticmethod
+    def _entry_bytes(entry):
+        return sum(t.numel() * t.element_size() for t in entry[1:])
+
+    def _put_memory(self, key, entry):
+        size = self._entry_bytes(entry)
+        if size > self.memory_bytes:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_size -= self._entry_bytes(old)
+        self._memory[key] = entry
+        self._memory_size += size
+        while self._memory_size > self.memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= self._entry_bytes(evicted)
+
+    def _evict_disk(self):
+        while True:
+            with self._lock:
+                if self._disk_size <= self.disk_bytes or not self._disk:
+                    return
+                key, size = self._disk.popitem(last=False)
+                self._disk_size -= size
+            try:
+                os.remove(os.path.join(self.cache_dir, key + ".npz"))
+            except OSError:
+                pass
+
+    def _remove_disk(self, key):
+        with self._lock:
+            size = self._disk.pop(key, None)
+            if size is None:
+                return
+            self._disk_size -= size
+        try:
+            os.remove(os.path.join(self.cache_dir, key + ".npz"))
+        except OSError:
+            pass
+
+    def get_stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "lookups": lookups,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+                "memory_hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "memory_entries": len(self._memory),
+                "memory_mb": round(self._memory_size / 1e6, 1),
+                "disk_entries": len(self._disk),
+                "disk_mb": round(self._disk_size / 1e6, 1),
+            }
+
+feature_cache = FeatureCache()
+
+def length_from_speed(speed_scale):
+    return (1.0 / speed_scale) * 1.1 if speed_scale > 0 else 1.1 # 1.1倍に
+
+def pad_text_features(items):
+    """get_text の結果を文の長さを揃えてまとめる（phones, tones, lang_ids, [bert, ja_bert, en_bert], lengths）"""
+    n = len(items)
+    max_len = max(item[3].size(0) for item in items)
+    phones = torch.zeros(n, max_len, dtype=torch.long)
+    tones = torch.zeros(n, max_len, dtype=torch.long)
+    lang_ids = torch.zeros(n, max_len, dtype=torch.long)
+    berts = [torch.zeros(n, feature.size(0), max_len) for feature in items[0][:3]]
+    for i, (bert, ja_bert, en_bert, p, t, l) in enumerate(items):
+        length_i = p.size(0)
+        phones[i, :length_i] = p
+        tones[i, :length_i] = t
+        lang_ids[i, :length_i] = l
+        for dst, src in zip(berts, (bert, ja_bert, en_bert)):
+            dst[i, :, :length_i] = src
+    lengths = torch.LongTensor([item[3].size(0) for item in items])
+    return phones, tones, lang_ids, berts, lengths
+
+def infer_batch(model, texts, length):
+    """
+    短い文をまとめて1回の forward で合成する（-1〜1 の float32 の波形のリストを返す）。
+    TTSModel.infer にはバッチ API が無いため、テキスト処理を文ごとに行ってパディングし、
+    Generator (net_g) の infer を直接呼ぶ。出力は y_mask の長さで文ごとに切り出す。
+    """
+    if isinstance(model, OnnxTTSModel):
+        return model.infer_batch(texts, length)
+    net_g = getattr(model, "_TTSModel__net_g", None)
+    if net_g is None:
+        raise RuntimeError("net_g is not loaded.")
+    hps = model.hyper_parameters
+    is_jp_extra = hps.version.endswith("JP-Extra")
+    style_vec = model._TTSModel__get_style_vector(model.style2id[DEFAULT_STYLE], DEFAULT_STYLE_WEIGHT)
+    items = [infer_module.get_text(t, Languages.JP, hps, model.device) for t in texts]
+    n = len(items)
+    phones, tones, lang_ids, berts, lengths = pad_text_features(items)
+
+    device = model.device
+    with torch.no_grad():
+        args = [phones.to(device), lengths.to(device), torch.zeros(n, dtype=torch.long, device=device),
+                tones.to(device), lang_ids.to(device)]
+        if is_jp_extra:
+            args.append(berts[1].to(device))
+        else:
+            args.extend(b.to(device) for b in berts)
+        o, _, y_mask, _ = net_g.infer(
+            *args,
+            style_vec=torch.from_numpy(style_vec).to(device).unsqueeze(0).repeat(n, 1),
+            sdp_ratio=INFER_PARAMS["sdp_ratio"],
+            noise_scale=INFER_PARAMS["noise"],
+            noise_scale_w=INFER_PARAMS["noise_w"],
+            length_scale=length,
+        )
+        samples = (y_mask.sum(dim=(1, 2)).long() * hps.data.hop_length).tolist()
+        return [o[i, 0, :samples[i]].float().cpu().numpy() for i in range(n)]
+
+class InferenceScheduler:
+    """
+    1つのモデル（話者）の推論を専用スレッドで順に実行するスケジューラ。
+
+    リクエストは上限付きのキューに積み、非同期ハンドラは結果の Future を await するので、
+    推論中もイベントループ（/speakers など）は止まらない。キューが一杯なら queue.Full を送出する。
+    batch_window_ms > 0 のときは、batch_max_chars 以下の短い文が batch_window_ms 以内に続けて届いたら
+    最大 max_batch 文までまとめて1回の forward で合成する（マイクロバッチ）。
+    結果の波形はどちらの経路でも -1〜1 の float32 にそろえて返す。
+    """
+    def __init__(self, speaker_id, model, max_queue=16, batch_window_ms=0, max_batch=4, batch_max_chars=40):
+        self.speaker_id = speaker_id
+        self.model = model
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch = max(1, max_batch)
+        self.batch_max_chars = batch_max_chars
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()   # 停止判定と submit を排他する（停止後に積まれたジョブを取り残さない）
+        self._pending = []          # まとめられずに次の回へ回したジョブ
+        self._running = True
+        self.completed = 0
+        self.batches = 0
+        self.batched_jobs = 0
+        self._thread = threading.Thread(target=self._worker, daemon=True, name=f"VITS2-Infer-{speaker_id}")
+        self._thread.start()
+
+    def submit(self, text, length):
+        """推論を予約して concurrent.futures.Future を返す（結果は float32 の波形）"""
+        future = concurrent.futures.Future()
+        with self._lock:
+            if not self._running:
+                raise RuntimeError(f"Inference scheduler for speaker {self.speaker_id} has been stopped.")
+            self._queue.put_nowait((text, length, future))
+        return future
+
+    async def infer(self, text, length):
+        return await asyncio.wrap_future(self.submit(text, length))
+
+    def _batchable(self, job):
+        return self.batch_window > 0 and len(job[0]) <= self.batch_max_chars
+
+    def _next_jobs(self):
+        """次に実行するジョブ（バッチ）を取り出す"""
+        if self._pending:
+            job = self._pending.pop()
+        else:
+            while True:
+                try:
+                    job = self._queue.get(timeout=0.5)
+                    break
+                except queue.Empty:
+                    # 停止後は積まれていたジョブを捌き終えてから終了する
+                    if not self._running:
+                        return [None]
+        if job is None or not self._batchable(job):
+            return [job]
+        jobs = [job]
+        deadline = time.perf_counter() + self.batch_window
+        while len(jobs) < self.max_batch:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                nxt = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if nxt is None or not self._batchable(nxt) or nxt[1] != job[1]:
+                # まとめられないジョブは次の回に回す
+                self._pending.append(nxt)
+                break
+            jobs.append(nxt)
+        return jobs
+
+    def _worker(self):
+        while True:
+            jobs = self._next_jobs()
+            if jobs[0] is None:
+                with self._lock:
+                    if not self._running and self._queue.empty():
+                        break
+                continue
+            jobs = [job for job in jobs if job[2].set_running_or_notify_cancel()]
+            if not jobs:
+                continue
+            if len(jobs) > 1:
+                try:
+                    wavs = infer_batch(self.model, [job[0] for job in jobs], jobs[0][1])
+                    for (_, _, future), wav in zip(jobs, wavs):
+                        future.set_result(wav)
+                    self.batches += 1
+                    self.batched_jobs += len(jobs)
+                    self.completed += len(jobs)
+                    continue
+                except Exception as e:
+                    logging.warning(f"バッチ推論に失敗したため1文ずつ合成します: {e}")
+                    self.batch_window = 0
+            for text, length, future in jobs:
+                try:
+                    _, wav = self.model.infer(text=text, language=Languages.JP, speaker_id=0,
+                                              length=length, **INFER_PARAMS)
+                    future.set_result(to_float_wav(wav))
+                except Exception as e:
+                    future.set_exception(e)
+                self.completed += 1
+
+    def get_stats(self):
+        return {
+            "queued": self._queue.qsize(),
+            "completed": self.completed,
+            "batches": self.batches,
+            "avg_batch": round(self.batched_jobs / self.batches, 2) if self.batches else None,
+        }
+
+    def stop(self):
+        with self._lock:
+            self._running = False
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass
+
+def to_float_wav(wav):
+    """
+    波形を -1〜1 の float32 にそろえる。TTSModel.infer は 16bit に変換した値を返すが、
+    バッチ推論と ONNX 版は Generator の出力 (-1〜1) のままなので、スケジューラの結果はこちらに合わせる。
+    """
+    if np.issubdtype(wav.dtype, np.integer):
+        return wav.astype(np.float32) / 32768.0
+    return wav.astype(np.float32)
+
+def normalize_to_int16(wav):
+    """正規化（ノイズ対策）して int16 にする"""
+    wav = wav.astype(np.float32)
+    max_val = np.abs(wav).max()
+    if max_val > 0:
+        wav = (wav / max_val) * 0.9
+    return (wav * 32767).astype(np.int16)
+
+# ONNX Runtime による CPU 推論 ------------------------------------------------
+# Style-Bert-VITS2 には ONNX の書き出し・推論が無いため、Generator と日本語 BERT を
+# このサーバーで ONNX に変換し（初回のみ。モデルフォルダ/onnx と bert/onnx に保存）、ONNX Runtime で実行する。
+
+ONNX_SUBDIR = "onnx"
+BERT_ONNX_NAME = "deberta-v2-large-japanese-char-wwm"
+GENERATOR_INPUTS = ["x", "x_lengths", "tone", "language", "bert", "style_vec",
+                    "length_scale", "sdp_ratio", "noise_scale", "noise_scale_w"]
+
+def resolve_backend():
+    """実際に使う推論バックエンド（"torch" か "onnx"）"""
+    backend = backend_options["backend"]
+    if backend == "auto":
+        return "onnx" if _HAS_ORT and not torch.cuda.is_available() else "torch"
+    if backend == "onnx" and not _HAS_ORT:
+        logging.warning("onnxruntime がインストールされていないため PyTorch で推論します。")
+        return "torch"
+    return backend
+
+def create_ort_session(path):
+    """グラフ最適化とスレッド数を設定した CPU 用の InferenceSession"""
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    options.inter_op_num_threads = 1
+    if backend_options["threads"] > 0:
+        options.intra_op_num_threads = backend_options["threads"]
+    return ort.InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
+
+def quantize_int8(src, dst):
+    """重みを int8 にする動的量子化（活性は実行時に量子化される）"""
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    start = time.time()
+    tmp = dst + ".tmp"
+    quantize_dynamic(src, tmp, weight_type=QuantType.QInt8)
+    os.replace(tmp, dst)
+    logging.info(f"int8 量子化しました: {dst} ({time.time() - start:.1f}秒)")
+
+def prepare_onnx(source, path, export):
+    """
+    ONNX ファイルを用意してそのパスを返す。
+    path が無いか source（元の重み）より古ければ export(出力先) で書き出し、
+    int8 指定なら量子化版（*.int8.onnx）も作ってそちらを返す。
+    """
+    if not os.path.exists(path) or (source is not None and os.path.getmtime(source) > os.path.getmtime(path)):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        logging.info(f"ONNX に変換中: {path}")
+        start = time.time()
+        tmp = path + ".tmp"
+        export(tmp)
+        os.replace(tmp, path)
+        logging.info(f"ONNX 変換完了 ({time.time() - start:.1f}秒)")
+    if not backend_options["int8"] or path.endswith(".int8.onnx"):
+        return path
+    quantized = path[:-len(".onnx")] + ".int8.onnx"
+    if not os.path.exists(quantized) or os.path.getmtime(path) > os.path.getmtime(quantized):
+        quantize_int8(path, quantized)
+    return quantized
+
+def export_generator(conf, path):
+    """TTSModel の Generator を ONNX に書き出す（バッチ・音素数・出力長は可変）"""
+    class _GeneratorForExport(torch.nn.Module):
+        """net_g.infer を書き出すためのラッパー（推論パラメータも入力にし、出力の有効長も返す）"""
+        def __init__(self, net_g, is_jp_extra):
+            super().__init__()
+            self.net_g = net_g
+            self.is_jp_extra = is_jp_extra
+
+        def forward(self, x, x_lengths, tone, language, bert, style_vec,
+                    length_scale, sdp_ratio, noise_scale, noise_scale_w):
+            sid = torch.zeros_like(x_lengths)
+            # 日本語のみなので、JP-Extra 以外のモデルでは ja_bert 以外を 0 にする
+            berts = [bert] if self.is_jp_extra else [torch.zeros_like(bert), bert, torch.zeros_like(bert)]
+            o, _, y_mask, _ = self.net_g.infer(x, x_lengths, sid, tone, language, *berts, style_vec,
+                                               noise_scale=noise_scale, length_scale=length_scale,
+                                               noise_scale_w=noise_scale_w, sdp_ratio=sdp_ratio)
+            return o, y_mask.sum(dim=(1, 2)).long()
+
+    model = TTSModel(model_path=conf["model_path"], config_path=conf["config_path"],
+                     style_vec_path=conf["style_vec_path"], device="cpu")
+    model.load()
+    wrapper = _GeneratorForExport(model._TTSModel__net_g,
+                                  model.hyper_parameters.version.endswith("JP-Extra")).eval()
+    n = 32
+    style_vec = model._TTSModel__get_style_vector(model.style2id[DEFAULT_STYLE], DEFAULT_STYLE_WEIGHT)
+    dummy = (torch.zeros(1, n, dtype=torch.long), torch.LongTensor([n]),
+             torch.zeros(1, n, dtype=torch.long), torch.zeros(1, n, dtype=torch.long),
+             torch.randn(1, 1024, n), torch.from_numpy(style_vec).float().unsqueeze(0),
+             torch.tensor(1.0), torch.tensor(INFER_PARAMS["sdp_ratio"]),
+             torch.tensor(INFER_PARAMS["noise"]), torch.tensor(INFER_PARAMS["noise_w"]))
+    phones = {0: "batch", 1: "phones"}
+    with torch.no_grad():
+        torch.onnx.export(
+            wrapper, dummy, path, input_names=GENERATOR_INPUTS, output_names=["audio", "audio_lengths"],
+            dynamic_axes={"x": phones, "x_lengths": {0: "batch"}, "tone": phones, "language": phones,
+                          "bert": {0: "batch", 2: "phones"}, "style_vec": {0: "batch"},
+                          "audio": {0: "batch", 2: "samples"}, "audio_lengths": {0: "batch"}},
+            opset_version=17,
+        )
+    del model, wrapper
+    gc.collect()
+
+def export_bert(path, pretrained):
+    """日本語 BERT を ONNX に書き出す（書き出し後は PyTorch 版を解放する）"""
+    class _BertForExport(torch.nn.Module):
+        """extract_bert_feature と同じく、最後から3番目の隠れ層を返すラッパー"""
+        def __init__(self, bert, input_names):
+            super().__init__()
+            self.bert = bert
+            self.input_names = input_names
+
+        def forward(self, *inputs):
+            res = self.bert(**dict(zip(self.input_names, inputs)), output_hidden_states=True)
+            return res["hidden_states"][-3][0]
+
+    tokenizer = bert_models.load_tokenizer(Languages.JP, pretrained)
+    bert = bert_models.load_model(Languages.JP, pretrained).to("cpu").eval()
+    inputs = tokenizer("こんにちは、今日はいい天気ですね。", return_tensors="pt")
+    names = list(inputs.keys())
+    with torch.no_grad():
+        torch.onnx.export(
+            _BertForExport(bert, names), tuple(inputs[name] for name in names), path,
+            input_names=names, output_names=["hidden_state"],
+            dynamic_axes={**{name: {1: "tokens"} for name in names}, "hidden_state": {0: "tokens"}},
+            opset_version=17,
+        )
+    del bert
+    bert_models.unload_model(Languages.JP)
+    gc.collect()
+
+class OnnxBert:
+    """日本語 BERT の特徴量抽出を ONNX Runtime で行う（style_bert_vits2 の extract_bert_feature の置き換え）"""
+    def __init__(self, onnx_path, tokenizer):
+        self.session = create_ort_session(onnx_path)
+        self.tokenizer = tokenizer
+        self._inputs = [i.name for i in self.session.get_inputs()]
+
+    def _hidden(self, text):
+        inputs = self.tokenizer(text, return_tensors="np")
+        return self.session.run(None, {name: inputs[name].astype(np.int64) for name in self._inputs})[0]
+
+    def extract_bert_feature(self, text, word2ph, device, assist_text=None, assist_text_weight=0.7):
+        from style_bert_vits2.nlp.japanese.g2p import text_to_sep_kata
+        text = "".join(text_to_sep_kata(text, raise_yomi_error=False)[0])
+        res = self._hidden(text)
+        if assist_text:
+            assist_text = "".join(text_to_sep_kata(assist_text, raise_yomi_error=False)[0])
+            res = res * (1 - assist_text_weight) + self._hidden(assist_text).mean(0) * assist_text_weight
+        assert len(word2ph) == len(text) + 2, text
+        # 文字ごとの特徴量を音素数だけ繰り返して [1024, 音素数] にする
+        return torch.from_numpy(np.ascontiguousarray(np.repeat(res, word2ph, axis=0).T))
+
+    def install(self):
+        """get_text が日本語の特徴量抽出に使う関数を差し替える"""
+        from style_bert_vits2.nlp.japanese import bert_feature
+        bert_feature.extract_bert_feature = self.extract_bert_feature
+
+def load_onnx_bert(pretrained):
+    """ONNX 版の日本語 BERT を用意して特徴量抽出に組み込む（PyTorch 版はロードしない）"""
+    path = prepare_onnx(None, os.path.join(BERT_DIR, ONNX_SUBDIR, f"{BERT_ONNX_NAME}.onnx"),
+                        lambda out: export_bert(out, pretrained))
+    bert = OnnxBert(path, bert_models.load_tokenizer(Languages.JP, pretrained))
+    bert.install()
+    return path
+
+class OnnxTTSModel:
+    """
+    Generator を ONNX Runtime で実行する、TTSModel 互換のモデル（CPU 用）。
+    テキスト処理は TTSModel と同じ get_text（特徴量キャッシュ・ONNX 版 BERT）を通す。
+    グラフはバッチ次元が可変なので、マイクロバッチも infer_batch でまとめて1回の実行にする。
+    """
+    device = "cpu"
+
+    def __init__(self, conf, onnx_path):
+        self.model_path = conf["model_path"]
+        self.onnx_path = onnx_path
+        self.hyper_parameters = HyperParameters.load_from_json(conf["config_path"])
+        data = self.hyper_parameters.data
+        self.style2id = getattr(data, "style2id", None) or {str(i): i for i in range(data.num_styles)}
+        self._style_vectors = np.load(conf["style_vec_path"])
+        self.session = create_ort_session(onnx_path)
+        self._inputs = {i.name for i in self.session.get_inputs()}
+
+    def get_style_vector(self, style_id, weight=None):
+        weight = DEFAULT_STYLE_WEIGHT if weight is None else weight
+        mean = self._style_vectors[0]
+        return mean + (self._style_vectors[style_id] - mean) * weight
+
+    def _run(self, texts, language, length, sdp_ratio, noise, noise_w):
+        hps = self.hyper_parameters
+        items = [infer_module.get_text(t, language, hps, self.device) for t in texts]
+        phones, tones, lang_ids, berts, lengths = pad_text_features(items)
+        n = len(items)
+        style_vec = self.get_style_vector(self.style2id[DEFAULT_STYLE]).astype(np.float32)
+        feeds = {
+            "x": phones.numpy(), "x_lengths": lengths.numpy(), "tone": tones.numpy(),
+            "language": lang_ids.numpy(), "bert": berts[1].numpy(),
+            "style_vec": np.repeat(style_vec[None], n, axis=0),
+            "length_scale": np.array(length, dtype=np.float32),
+            "sdp_ratio": np.array(sdp_ratio, dtype=np.float32),
+            "noise_scale": np.array(noise, dtype=np.float32),
+            "noise_scale_w": np.array(noise_w, dtype=np.float32),
+        }
+        audio, audio_lengths = self.session.run(
+            ["audio", "audio_lengths"], {k: v for k, v in feeds.items() if k in self._inputs})
+        samples = audio_lengths * hps.data.hop_length
+        return [audio[i, 0, :samples[i]] for i in range(n)]
+
+    def infer(self, text, language=None, speaker_id=0, sdp_ratio=INFER_PARAMS["sdp_ratio"],
+              noise=INFER_PARAMS["noise"], noise_w=INFER_PARAMS["noise_w"], length=1.0, **kwargs):
+        """
+        TTSModel.infer と同じく (サンプリングレート, 波形) を返す。
+        ただし波形は 16bit に変換せず、Generator の出力のまま (-1〜1 の float32) で返す。
+        """
+        wav = self._run([text], language or Languages.JP, length, sdp_ratio, noise, noise_w)[0]
+        return self.hyper_parameters.data.sampling_rate, wav
+
+    def infer_batch(self, texts, length):
+        return self._run(texts, Languages.JP, length, INFER_PARAMS["sdp_ratio"], INFER_PARAMS["noise"],
+                         INFER_PARAMS["noise_w"])
+
+def build_onnx_model(conf):
+    """ONNX 版の Generator を用意して OnnxTTSModel を作る"""
+    model_path = conf["model_path"]
+    if model_path.endswith(".onnx"):
+        # 書き出し済みの ONNX だけが置かれたモデル
+        path = prepare_onnx(None, model_path, None)
+    else:
+        stem = os.path.splitext(os.path.basename(model_path))[0]
+        path = prepare_onnx(model_path, os.path.join(os.path.dirname(model_path), ONNX_SUBDIR, f"{stem}.onnx"),
+                            lambda out: export_generator(conf, out))
+    logging.info(f"ONNX Runtime で推論します: {os.path.basename(path)}")
+    return OnnxTTSModel(conf, path)
 
 def scan_models():
     """ディレクトリをスキャンして利用可能なモデルのリストを作成する"""
@@ -93,80 +851,354 @@ def scan_models():
 
     logging.info(f"スキャン完了。見つかったモデル数: {len(speakers_info)}")
 
-def ensure_model_loaded(speaker_id: int):
-    """リクエストされたモデルとBERTが必要な場合にロードする"""
-    global bert_loaded, models
-    start_time = time.time()
-    
-    # 1. BERTのロード
-    if not bert_loaded:
+def ensure_bert_loaded():
+    """BERTを一度だけロードする（同時に呼ばれても読み込みは1回）"""
+    global bert_loaded
+    ensure_libraries()
+    with bert_lock:
+        if bert_loaded:
+            return
+        progress.begin("bert")
+        start_time = time.time()
         try:
             # os.sep を使用してパス区切り文字の問題を回避
             bert_pt_dir = os.path.relpath(os.path.join(BERT_DIR, "deberta-v2-large-japanese-char-wwm")).replace(os.sep, "/")
-            logging.info(f"BERTモデル(PyTorch)のロードを開始します: {bert_pt_dir}")
-            
-            if os.path.exists(bert_pt_dir):
-                bert_models.load_tokenizer(Languages.JP, bert_pt_dir)
-                bert_models.load_model(Languages.JP, bert_pt_dir)
-            else:
-                logging.info("指定されたBERTパスが見つからないためデフォルトをロードします...")
-                bert_models.load_bert_models()
-            
-            bert_loaded = True
-            logging.info(f"BERTモデルロード完了 ({time.time() - start_time:.2f}秒)")
+            if resolve_backend() == "onnx":
+                try:
+                    path = load_onnx_bert(bert_pt_dir if os.path.exists(bert_pt_dir) else None)
+                    bert_loaded = True
+                    logging.info(f"BERTモデル(ONNX Runtime)ロード完了: {os.path.basename(path)} ({time.time() - start_time:.2f}秒)")
+                except Exception as e:
+                    logging.warning(f"ONNX版BERTの準備に失敗したため PyTorch 版をロードします: {e}")
+            if not bert_loaded:
+                logging.info(f"BERTモデル(PyTorch)のロードを開始します: {bert_pt_dir}")
+
+                if os.path.exists(bert_pt_dir):
+                    bert_models.load_tokenizer(Languages.JP, bert_pt_dir)
+                    bert_models.load_model(Languages.JP, bert_pt_dir)
+                else:
+                    logging.info("指定されたBERTパスが見つからないためデフォルトをロードします...")
+                    bert_models.load_bert_models()
+
+                bert_loaded = True
+                logging.info(f"BERTモデルロード完了 ({time.time() - start_time:.2f}秒)")
+            progress.finish("bert")
         except Exception as e:
             logging.error(f"BERTロード失敗: {e}")
+            progress.fail("bert", e)
             raise
 
-    # 2. TTSモデルのロード
-    if speaker_id not in models:
+def build_model(speaker_id: int):
+    """TTSModel（CPU で ONNX バックエンドなら OnnxTTSModel）を作って暖機する"""
+    conf = model_configs_cache[speaker_id]
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    model = None
+    # .onnx しか無いモデルは TTSModel では読めないので常に ONNX Runtime を使う
+    if resolve_backend() == "onnx" or conf["model_path"].endswith(".onnx"):
+        logging.info(f"モデル '{conf['name']}' を ONNX Runtime (CPU) にロード中...")
+        try:
+            model = build_onnx_model(conf)
+        except Exception as e:
+            if conf["model_path"].endswith(".onnx"):
+                logging.error(f"モデルロード中にエラーが発生しました: {e}")
+                raise
+            logging.warning(f"ONNX モデルの準備に失敗したため PyTorch でロードします: {e}")
+    if model is None:
+        model = build_torch_model(conf, device)
+
+    # Warm-up (初回の推論遅延を防止)
+    try:
+        logging.info("暖機運転中 (Warm-up)...")
+        model.infer(text="わん！", language=Languages.JP, speaker_id=0)
+    except Exception as e:
+        logging.warning(f"暖機運転中にエラー: {e}")
+    return model
+
+def build_torch_model(conf, device):
+    logging.info(f"モデル '{conf['name']}' を {device} にロード中...")
+    try:
+        model = TTSModel(
+            model_path=conf["model_path"],
+            config_path=conf["config_path"],
+            style_vec_path=conf["style_vec_path"],
+            device=device
+        )
+        
+        # torch.compile (PyTorch 2.0+ & CUDA)
+        if hasattr(torch, "compile") and device == "cuda":
+            try:
+                logging.info("モデル最適化中 (torch.compile)...")
+                # TTSModel 内部の Generator (net_g) をコンパイル
+                model.net_g = torch.compile(model.net_g)
+                logging.info("最適化が有効になりました。")
+            except Exception as e:
+                logging.warning(f"最適化失敗（スキップ）: {e}")
+    except Exception as e:
+        logging.error(f"モデルロード中にエラーが発生しました: {e}")
+        raise e
+    return model
+
+def _process_rss():
+    return psutil.Process().memory_info().rss if _HAS_PSUTIL else 0
+
+def _cuda_allocated():
+    return torch.cuda.memory_allocated() if torch.cuda.is_available() else 0
+
+def _param_bytes(model):
+    if isinstance(model, OnnxTTSModel):
+        return os.path.getsize(model.onnx_path)
+    net_g = getattr(model, "_TTSModel__net_g", None)
+    if net_g is None:
+        return 0
+    return sum(p.numel() * p.element_size() for p in net_g.parameters())
+
+class _Load:
+    """ロード中の話者（single-flight 用）"""
+    def __init__(self):
+        self.event = threading.Event()
+        self.error = None
+
+class ModelResidency:
+    """
+    TTSModel の常駐管理。
+
+    ロード済みモデルの合計サイズを budget_mb 以内に保ち、超える場合は最も長く使われていない
+    モデルから解放する（pinned の話者は解放しない）。同じ話者の初回リクエストが同時に来ても
+    ロードは1回だけ行い、他のリクエストはその完了を待つ。
+    話者の切り替わりの履歴から次に使われそうな話者を予測し、予算に空きがあれば裏でロードしておく。
+    """
+    def __init__(self, budget_mb=4096, pinned=0, prefetch=True):
+        self.budget = budget_mb * 1024 * 1024
+        self.pinned = pinned
+        self.prefetch = prefetch
+        self._lock = threading.Lock()
+        self._loading = {}                        # speaker_id -> _Load
+        self._info = OrderedDict()                # speaker_id -> 常駐情報（LRU 順）
+        self._transitions = defaultdict(Counter)  # 直前の話者 -> 次の話者の回数
+        self._last = None
+        self.evictions = 0
+        self.prefetches = 0
+
+    def get(self, speaker_id, prefetch=False):
+        """モデルを返す（常駐していなければロードする）"""
         if speaker_id not in model_configs_cache:
             raise ValueError(f"Speaker ID {speaker_id} not found.")
-            
+        while True:
+            with self._lock:
+                model = models.get(speaker_id)
+                if model is not None:
+                    self._info.move_to_end(speaker_id)
+                    self._info[speaker_id]["hits"] += 1
+                    if not prefetch:
+                        self._record_use(speaker_id)
+                    return model
+                load = self._loading.get(speaker_id)
+                owner = load is None
+                if owner:
+                    load = self._loading[speaker_id] = _Load()
+            if not owner:
+                load.event.wait()
+                if load.error is not None:
+                    raise load.error
+                continue
+            try:
+                self._load(speaker_id, prefetch)
+            except Exception as e:
+                load.error = e
+                raise
+            finally:
+                with self._lock:
+                    self._loading.pop(speaker_id, None)
+                load.event.set()
+
+    def _load(self, speaker_id, prefetch):
         conf = model_configs_cache[speaker_id]
-        model_start_time = time.time()
-        device = "cuda" if torch.cuda.is_available() else "cpu"
-        logging.info(f"モデル '{conf['name']}' を {device} にロード中...")
-        
+        # 読み込む前にファイルサイズ分の空きを作る
+        self._make_room(os.path.getsize(conf["model_path"]), keep=speaker_id)
+        ensure_libraries()
+        start = time.time()
+        rss_before, vram_before = _process_rss(), _cuda_allocated()
+        default = speaker_id == self.pinned
+        if default:
+            progress.begin("default_speaker")
         try:
-            model = TTSModel(
-                model_path=conf["model_path"],
-                config_path=conf["config_path"],
-                style_vec_path=conf["style_vec_path"],
-                device=device
-            )
-            
-            # torch.compile (PyTorch 2.0+ & CUDA)
-            if hasattr(torch, "compile") and device == "cuda":
-                try:
-                    logging.info("モデル最適化中 (torch.compile)...")
-                    # TTSModel 内部の Generator (net_g) をコンパイル
-                    model.net_g = torch.compile(model.net_g)
-                    logging.info("最適化が有効になりました。")
-                except Exception as e:
-                    logging.warning(f"最適化失敗（スキップ）: {e}")
+            model = build_model(speaker_id)
         except Exception as e:
-            logging.error(f"モデルロード中にエラーが発生しました: {e}")
-            raise e
+            if default:
+                progress.fail("default_speaker", e)
+            raise
+        info = {
+            "name": conf["name"],
+            "param_bytes": _param_bytes(model) or os.path.getsize(conf["model_path"]),
+            "rss_bytes": max(0, _process_rss() - rss_before),
+            "vram_bytes": max(0, _cuda_allocated() - vram_before),
+            "load_sec": round(time.time() - start, 2),
+            "hits": 0,
+            "prefetched": prefetch,
+            "backend": "onnx" if isinstance(model, OnnxTTSModel) else "torch",
+        }
+        with self._lock:
+            models[speaker_id] = model
+            self._info[speaker_id] = info
+            if not prefetch:
+                self._record_use(speaker_id)
+        logging.info(f"モデル '{conf['name']}' 準備完了 ({info['load_sec']:.2f}秒, "
+                     f"{info['param_bytes'] / 1e6:.0f} MB)")
+        if default:
+            progress.finish("default_speaker")
+        self._make_room(0, keep=speaker_id)
+
+    def _resident_bytes(self):
+        return sum(info["param_bytes"] for info in self._info.values())
+
+    def _make_room(self, incoming, keep=None):
+        """incoming バイトを追加しても予算に収まるまで、古いモデルから解放する"""
+        while True:
+            with self._lock:
+                if self._resident_bytes() + incoming <= self.budget:
+                    return
+                victim = next((sid for sid in self._info if sid not in (self.pinned, keep)), None)
+                if victim is None:
+                    logging.warning(f"モデルのメモリ予算 ({self.budget / 1e6:.0f} MB) を超えていますが、解放できるモデルがありません。")
+                    return
+                info = self._info.pop(victim)
+                models.pop(victim, None)
+                self.evictions += 1
+                # モデルと同じロックの中で外すので、get_scheduler が解放済みのモデルで作り直すことはない
+                with schedulers_lock:
+                    scheduler = schedulers.pop(victim, None)
+            if scheduler is not None:
+                scheduler.stop()
+            gc.collect()
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+            logging.info(f"モデル '{info['name']}' (ID: {victim}) を解放しました（LRU）。")
 
-        # Warm-up (初回の推論遅延を防止)
+    def get_scheduler(self, speaker_id, model):
+        """
+        常駐中のモデルの推論スケジューラを取得（無ければ作る）。
+        model がすでに解放されていたら None を返す（呼び出し側でロードし直す）。
+        """
+        with self._lock:
+            if models.get(speaker_id) is not model:
+                return None
+            with schedulers_lock:
+                scheduler = schedulers.get(speaker_id)
+                if scheduler is None or scheduler.model is not model:
+                    if scheduler is not None:
+                        scheduler.stop()
+                    scheduler = InferenceScheduler(speaker_id, model, **scheduler_options)
+                    schedulers[speaker_id] = scheduler
+                return scheduler
+
+    def _record_use(self, speaker_id):
+        """ロックを保持した状態で呼ぶ。話者の切り替わりを記録し、次の話者を先読みする"""
+        if self._last is not None and self._last != speaker_id:
+            self._transitions[self._last][speaker_id] += 1
+        self._last = speaker_id
+        if not self.prefetch or not self._transitions[speaker_id]:
+            return
+        predicted = self._transitions[speaker_id].most_common(1)[0][0]
+        if predicted in models or predicted in self._loading:
+            return
+        # 他のモデルを追い出してまでは先読みしない
+        size = os.path.getsize(model_configs_cache[predicted]["model_path"])
+        if self._resident_bytes() + size > self.budget:
+            return
+        self.prefetches += 1
+        logging.info(f"次の話者を先読みします: ID {predicted}")
+        threading.Thread(target=self._prefetch, args=(predicted,), daemon=True,
+                         name=f"VITS2-Prefetch-{predicted}").start()
+
+    def _prefetch(self, speaker_id):
         try:
-            logging.info("暖機運転中 (Warm-up)...")
-            model.infer(text="わん！", language=Languages.JP, speaker_id=0)
+            self.get(speaker_id, prefetch=True)
         except Exception as e:
-            logging.warning(f"暖機運転中にエラー: {e}")
+            logging.warning(f"先読みに失敗しました (ID: {speaker_id}): {e}")
 
-        models[speaker_id] = model
-        logging.info(f"モデル '{conf['name']}' 準備完了 ({time.time() - model_start_time:.2f}秒)")
-    
+    def get_stats(self):
+        mb = lambda b: round(b / 1e6, 1)
+        with self._lock:
+            return {
+                "budget_mb": mb(self.budget),
+                "resident_mb": mb(self._resident_bytes()),
+                "pinned": self.pinned,
+                "evictions": self.evictions,
+                "prefetches": self.prefetches,
+                "loading": sorted(self._loading),
+                "models": [
+                    {"speaker": sid, "name": info["name"], "param_mb": mb(info["param_bytes"]),
+                     "rss_mb": mb(info["rss_bytes"]) if _HAS_PSUTIL else None,
+                     "vram_mb": mb(info["vram_bytes"]), "load_sec": info["load_sec"],
+                     "hits": info["hits"], "prefetched": info["prefetched"], "backend": info["backend"]}
+                    for sid, info in reversed(self._info.items())
+                ],
+            }
+
+residency = ModelResidency()
+
+def ensure_model_loaded(speaker_id: int):
+    """リクエストされたモデルとBERTが必要な場合にロードし、モデルを返す"""
+    start_time = time.time()
+    ensure_bert_loaded()
+    model = residency.get(speaker_id)
     total_time = time.time() - start_time
     if total_time > 0.5:
         logging.info(f"ロードプロセス終了 (総計: {total_time:.2f}秒)")
+    return model
+
+def preload(speaker_id: int):
+    """起動直後に裏でライブラリ・BERT・既定の話者を読み込む（その間も /speakers などには応答する）"""
+    try:
+        ensure_bert_loaded()
+        if speaker_id in model_configs_cache:
+            residency.get(speaker_id, prefetch=True)
+    except Exception as e:
+        logging.error(f"起動時の読み込みに失敗しました: {e}")
+
+def load_for_synthesis(speaker_id: int):
+    """モデルをロードして (モデル, 推論スケジューラ) を返す。取得の間に解放されたらロードし直す"""
+    while True:
+        model = ensure_model_loaded(speaker_id)
+        scheduler = residency.get_scheduler(speaker_id, model)
+        if scheduler is not None:
+            return model, scheduler
+        logging.info(f"モデルが解放されたためロードし直します (ID: {speaker_id})")
 
 @app.get("/speakers")
 async def get_speakers():
     return speakers_info
 
+@app.get("/health")
+async def health():
+    """読み込みの進捗。準備完了なら 200、読み込み中・失敗なら 503（本文は同じ形式）"""
+    snapshot = progress.snapshot()
+    return JSONResponse(status_code=200 if snapshot["status"] == "ready" else 503, content=snapshot)
+
+@app.get("/health/stream")
+async def health_stream():
+    """
+    読み込みの進捗を Server-Sent Events で送る。進捗が変わるたびに /health と同じ JSON を送り、
+    準備完了か失敗で終える。変化が無い間も 15 秒ごとにコメント行を送って接続を保つ。
+    """
+    async def _events():
+        version = None
+        last_sent = time.monotonic()
+        while True:
+            snapshot = progress.snapshot()
+            if snapshot["version"] != version:
+                version = snapshot["version"]
+                last_sent = time.monotonic()
+                yield f"data: {json.dumps(snapshot, ensure_ascii=False)}\n\n"
+                if snapshot["status"] in ("ready", "error"):
+                    return
+            elif time.monotonic() - last_sent > 15:
+                last_sent = time.monotonic()
+                yield ": keepalive\n\n"
+            await asyncio.sleep(0.2)
+
+    return StreamingResponse(_events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
 @app.post("/initialize")
 def initialize_model(speaker: int = Query(0)):
     try:
@@ -190,53 +1222,157 @@ def audio_query(text: str, speaker: int):
 
 @app.post("/synthesis")
 async def synthesis(request: Request, speaker: int):
-    # synthesisのみ、bodyを非同期で受け取るため async def のままにする
-    # ただし、中の重い処理はブロックしないよう配慮
+    # ロードはスレッドで、推論はモデルごとのスケジューラで行い、イベントループを止めない
     try:
         query_data = await request.json()
         text = query_data.get("text", "")
         speed_scale = query_data.get("speedScale", 1.0)
 
-        # ロードと推論を同期的に実行
-        ensure_model_loaded(speaker)
-        
-        if speaker not in models:
-             raise RuntimeError(f"Speaker ID {speaker} not loaded.")
-             
-        model = models[speaker]
+        model, scheduler = await asyncio.to_thread(load_for_synthesis, speaker)
         
         # デバッグログ：使用中のモデル名を確認
         model_name = model_configs_cache.get(speaker, {}).get("name", "Unknown")
         logging.info(f"合成に使用中のモデル: {model_name} (ID: {speaker})")
         
-        sr, wav = model.infer(
-            text=text,
-            language=Languages.JP,
-            speaker_id=0,
-            sdp_ratio=0.0,      # リズムを固定して噛み・崩れを防止
-            noise=0.5,          # ノイズを抑えてクリアな声に
-            noise_w=0.9,        # 抑揚の強さ（デフォルト付近で維持）
-            length=(1.0 / speed_scale) * 1.1 if speed_scale > 0 else 1.1 # 1.1倍に
-        )
-        
-        # 正規化（ノイズ対策）
-        wav = wav.astype(np.float32)
-        max_val = np.abs(wav).max()
-        if max_val > 0:
-            wav = (wav / max_val) * 0.9
-        
-        wav_int16 = (wav * 32767).astype(np.int16)
+        try:
+            wav = await scheduler.infer(text, length_from_speed(speed_scale))
+        except queue.Full:
+            logging.warning(f"推論キューが一杯のためリクエストを断りました (ID: {speaker})")
+            return JSONResponse(status_code=503, content={"detail": "Inference queue is full."})
         
         import io
         import scipy.io.wavfile as wavfile
         byte_io = io.BytesIO()
-        wavfile.write(byte_io, sr, wav_int16)
+        wavfile.write(byte_io, model.hyper_parameters.data.sampling_rate, normalize_to_int16(wav))
         return Response(content=byte_io.getvalue(), media_type="audio/wav")
     except Exception as e:
         logging.error(f"合成エラー: {e}", exc_info=True)
         return JSONResponse(status_code=500, content={"detail": str(e)})
 
+@app.get("/models")
+async def resident_models():
+    """常駐しているモデルとメモリ使用量"""
+    return residency.get_stats()
+
+@app.get("/feature_cache")
+async def feature_cache_stats():
+    return feature_cache.get_stats()
+
+@app.get("/scheduler_stats")
+async def scheduler_stats():
+    with schedulers_lock:
+        return {str(speaker): scheduler.get_stats() for speaker, scheduler in schedulers.items()}
+
+def split_phrases(text, min_chars=8):
+    """ストリーミング合成用に句読点で区切る（短すぎる句は次の句とまとめる）"""
+    pieces = [p for p in re.split(r'(?<=[、。！？!?,\n])', text) if p.strip()]
+    phrases = []
+    buf = ""
+    for piece in pieces:
+        buf += piece
+        if len(buf) >= min_chars:
+            phrases.append(buf)
+            buf = ""
+    if buf:
+        if phrases and len(buf) < min_chars:
+            phrases[-1] += buf
+        else:
+            phrases.append(buf)
+    return phrases or [text]
+
+def streaming_wav_header(sr, channels=1, width=2):
+    """長さ未定のWAVヘッダ（RIFF/data のサイズは 0xFFFFFFFF）"""
+    byte_rate = sr * channels * width
+    return (b"RIFF" + struct.pack("<I", 0xFFFFFFFF) + b"WAVE"
+            + b"fmt " + struct.pack("<IHHIIHH", 16, 1, channels, sr, byte_rate, channels * width, width * 8)
+            + b"data" + struct.pack("<I", 0xFFFFFFFF))
+
+@app.post("/synthesis_stream")
+async def synthesis_stream(request: Request, speaker: int):
+    """
+    /synthesis と同じクエリを受け取り、句ごとに合成した PCM を順に返す。
+    先頭に長さ未定のWAVヘッダを送るので、クライアントは最初の句が届いた時点で再生を始められる。
+    音量の正規化は最初の句で決めた倍率を使い、以降の句はクリップしない範囲に抑える。
+    """
+    try:
+        query_data = await request.json()
+        text = query_data.get("text", "")
+        speed_scale = query_data.get("speedScale", 1.0)
+        model, scheduler = await asyncio.to_thread(load_for_synthesis, speaker)
+    except Exception as e:
+        logging.error(f"合成エラー: {e}", exc_info=True)
+        return JSONResponse(status_code=500, content={"detail": str(e)})
+
+    phrases = split_phrases(text)
+    sr = model.hyper_parameters.data.sampling_rate
+
+    def _generate():
+        # 同期ジェネレータは Starlette がスレッドプールで回す。推論はスケジューラで行い、
+        # 次の句を1つ先に予約しておくので、送信中も推論が進む
+        yield streaming_wav_header(sr)
+        length = length_from_speed(speed_scale)
+        futures = []
+        scale = None
+        try:
+            for i, phrase in enumerate(phrases):
+                while len(futures) < 2 and i + len(futures) < len(phrases):
+                    futures.append(scheduler.submit(phrases[i + len(futures)], length))
+                wav = futures.pop(0).result()
+                max_val = np.abs(wav).max()
+                if max_val > 0:
+                    scale = 0.9 / max_val if scale is None else min(scale, 0.9 / max_val)
+                    wav = wav * scale
+                yield (wav * 32767).astype(np.int16).tobytes()
+        except queue.Full:
+            # 送出して接続を切る（正常に閉じるとクライアントが途中までの音声を完成品としてキャッシュする）
+            logging.warning(f"推論キューが一杯のためストリーミング合成を打ち切りました (ID: {speaker})")
+            raise
+        except Exception as e:
+            logging.error(f"句の合成に失敗しました: {e}")
+            raise
+        finally:
+            for future in futures:
+                future.cancel()
+
+    logging.info(f"ストリーミング合成: {len(phrases)}句 (ID: {speaker})")
+    return StreamingResponse(_generate(), media_type="audio/wav")
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Style-Bert-VITS2 VOICEVOX互換サーバー")
+    parser.add_argument("--port", type=int, default=50021)
+    parser.add_argument("--max-queue", type=int, default=scheduler_options["max_queue"],
+                        help="モデルごとの推論待ちの上限（超えたら 503）")
+    parser.add_argument("--batch-window-ms", type=float, default=scheduler_options["batch_window_ms"],
+                        help="短い文をまとめて推論する待ち時間（0 でマイクロバッチ無効）")
+    parser.add_argument("--max-batch", type=int, default=scheduler_options["max_batch"])
+    parser.add_argument("--batch-max-chars", type=int, default=scheduler_options["batch_max_chars"])
+    parser.add_argument("--model-memory-mb", type=int, default=4096,
+                        help="常駐させる TTSModel の合計サイズの上限（超えたら LRU で解放）")
+    parser.add_argument("--default-speaker", type=int, default=0, help="解放しない話者 ID")
+    parser.add_argument("--no-prefetch", action="store_true", help="次の話者の先読みをしない")
+    parser.add_argument("--feature-cache-mb", type=int, default=256, help="g2p/BERT 特徴量キャッシュ（メモリ）の上限")
+    parser.add_argument("--feature-cache-dir", default=FEATURE_CACHE_DIR,
+                        help="特徴量キャッシュの保存先（空文字でディスク保存なし）")
+    parser.add_argument("--feature-disk-mb", type=int, default=512)
+    parser.add_argument("--backend", choices=["auto", "torch", "onnx"], default=backend_options["backend"],
+                        help="推論バックエンド（auto は GPU が無く onnxruntime があれば onnx）")
+    parser.add_argument("--threads", type=int, default=backend_options["threads"],
+                        help="CPU 推論のスレッド数（0 でライブラリの既定値）")
+    parser.add_argument("--int8", action="store_true", help="ONNX の Generator と BERT を int8 動的量子化する")
+    parser.add_argument("--no-preload", action="store_true",
+                        help="起動時に BERT と既定の話者を読み込まない（最初のリクエストで読み込む）")
+    args = parser.parse_args()
+    backend_options.update(backend=args.backend, threads=args.threads, int8=args.int8)
+    feature_cache.configure(args.feature_cache_mb, args.feature_cache_dir, args.feature_disk_mb)
+    residency = ModelResidency(budget_mb=args.model_memory_mb, pinned=args.default_speaker,
+                               prefetch=not args.no_prefetch)
+    scheduler_options.update(max_queue=args.max_queue, batch_window_ms=args.batch_window_ms,
+                             max_batch=args.max_batch, batch_max_chars=args.batch_max_chars)
+
     logging.basicConfig(level=logging.INFO)
     scan_models()
-    uvicorn.run(app, host="127.0.0.1", port=50021)
+    if args.default_speaker not in model_configs_cache:
+        progress.skip("default_speaker")
+    if not args.no_preload:
+        threading.Thread(target=preload, args=(args.default_speaker,), daemon=True, name="VITS2-Preload").start()
+    uvicorn.run(app, host="127.0.0.1", port=args.port)
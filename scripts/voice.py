@@ -1,16 +1,18 @@
-import requests
-import json
 import wave
 import threading
 import os
-import io
-import pyaudio
-import urllib.parse
+import logging
 import random
+import time
 from kokoro import KPipeline
 import soundfile as sf
 import torch
-from scripts.gemini import GeminiSession
+from scripts.audio_output import get_output_engine
+from scripts.tts_cache import get_tts_cache, make_key as make_cache_key
+from scripts.tts_stream import StreamingAudio
+from scripts.tts_chunker import get_synthesis_latency
+from scripts.earcons import get_earcon_player, init_earcons, close_earcons
+from scripts.tts_engines import VoicevoxEngine, create_engine as create_tts_engine
 
 stop_playback_event = threading.Event()
 
@@ -24,100 +26,103 @@ RANDOM_NOD = [
     "2.wav",
 ]
 
-_gemini_session_for_tts = None
+# 現在のTTSエンジン。bind_settings で SettingsManager に結びつけ、設定変更の通知で差し替える
+_engine = None
+_engine_lock = threading.Lock()
+_settings_manager = None
+TTS_SETTING_KEYS = ("tts_engine", "vits2_speaker_id", "vits2_streaming")
+
+
+def bind_settings(settings_manager):
+    """
+    TTSエンジンの設定をメモリ上の SettingsManager から取得し、変更を購読する。
+    合成のたびに settings.json を読まずに済む。
+    """
+    global _settings_manager
+    if _settings_manager is not None:
+        _settings_manager.unsubscribe(_on_settings_changed)
+    _settings_manager = settings_manager
+    settings_manager.subscribe(_on_settings_changed, keys=TTS_SETTING_KEYS)
+    _rebuild_engine()
+
+
+def _on_settings_changed(key, value):
+    logging.info(f"TTS setting changed: {key}={value}")
+    _rebuild_engine()
+
+
+def _rebuild_engine():
+    global _engine
+    engine = create_tts_engine(_settings_manager.get("tts_engine", "voicevox"), _settings_manager)
+    with _engine_lock:
+        _engine = engine
+
+
+def get_tts_engine():
+    """現在のTTSエンジン（未設定なら settings.json を一度だけ読んで作る）"""
+    if _engine is None:
+        from scripts.settings import SettingsManager
+        bind_settings(SettingsManager())
+    return _engine
+
+
+def _engine_for(speaker_id, core_version):
+    engine = get_tts_engine()
+    if isinstance(engine, VoicevoxEngine) and (speaker_id, core_version) != (engine.speaker_id, engine.core_version):
+        engine = VoicevoxEngine(speaker_id, core_version)
+    return engine
+
 
 def generate_speech_data(text, speaker_id=46, core_version=None):
     """
     与えられたテキストを音声データに変換する。
-    設定に応じてVOICEVOXまたはGemini TTSを使用する。
+    設定に応じてVOICEVOX / Style-Bert-VITS2 / Gemini TTSを使用する。
+    同じ (エンジン, 話者, テキスト) の合成結果はキャッシュから返し、サーバーへの問い合わせを省く。
     """
-    global _gemini_session_for_tts
-    try:
-        with open('settings.json', 'r', encoding="utf-8") as f:
-            settings = json.load(f)
-        tts_engine = settings.get("tts_engine", "voicevox")
-    except (FileNotFoundError, json.JSONDecodeError):
-        tts_engine = "voicevox"
-
-    if tts_engine == "gemini":
-        if _gemini_session_for_tts is None:
-            _gemini_session_for_tts = GeminiSession()
-        pcm_data = _gemini_session_for_tts.generate_speech(text)
-        if pcm_data:
-            # PCMデータをWAV形式に変換
-            wav_data = io.BytesIO()
-            with wave.open(wav_data, 'wb') as wf:
-                wf.setnchannels(1)
-                wf.setsampwidth(2)
-                wf.setframerate(24000)
-                wf.writeframes(pcm_data)
-            wav_data.seek(0)
-            return wav_data.read()
-    elif tts_engine == "style_bert_vits2":
-        # Style-Bert-VITS2 ブリッジサーバーを使用
-        base_url = "http://localhost:50021"
-        
-        # 選択されたモデル(speaker)を取得（デフォルトは0）
-        vits2_speaker_id = settings.get("vits2_speaker_id", 0)
-        
-        # 1. クエリ作成
-        encoded_text = urllib.parse.quote(text)
-        query_url = f"{base_url}/audio_query?text={encoded_text}&speaker={vits2_speaker_id}"
-        
-        try:
-            # タイムアウトを少し長めに設定
-            response = requests.post(query_url, timeout=10)
-            response.raise_for_status()
-            query_data = response.json()
-            
-            # 2. 音声合成
-            synthesis_url = f"{base_url}/synthesis?speaker={vits2_speaker_id}"
-            # 大型モデル向けにさらに長いタイムアウトを設定
-            response = requests.post(synthesis_url, json=query_data, timeout=60)
-            response.raise_for_status()
-            return response.content
-        except Exception as e:
-            print(f"Style-Bert-VITS2接続エラー: {e}")
-            return None
-    else: # voicevox
-        base_url = "http://localhost:50021"
-
-        # 1. クエリ作成APIを呼び出す
-        encoded_text = urllib.parse.quote(text)
-        query_url = f"{base_url}/audio_query?text={encoded_text}&speaker={speaker_id}"
-        if core_version:
-            query_url += f"&core_version={core_version}"
-
-        try:
-            response = requests.post(query_url, timeout=3)
-            response.raise_for_status()
-            query_data = response.json()
-            
-            # 2. 音声合成APIを呼び出す
-            synthesis_url = f"{base_url}/synthesis?speaker={speaker_id}"
-            if core_version:
-                synthesis_url += f"&core_version={core_version}"
-
-            response = requests.post(synthesis_url, headers={"Content-Type": "application/json"}, data=json.dumps(query_data), timeout=10)
-            response.raise_for_status()
-            return response.content
-
-        except (requests.exceptions.RequestException, json.JSONDecodeError) as e:
-            print(f"VOICEVOX接続エラーのため、Gemini TTSにフォールバックします: {e}")
-            if _gemini_session_for_tts is None:
-                _gemini_session_for_tts = GeminiSession()
-            pcm_data = _gemini_session_for_tts.generate_speech(text)
-            if pcm_data:
-                wav_data = io.BytesIO()
-                with wave.open(wav_data, 'wb') as wf:
-                    wf.setnchannels(1)
-                    wf.setsampwidth(2)
-                    wf.setframerate(24000)
-                    wf.writeframes(pcm_data)
-                wav_data.seek(0)
-                return wav_data.read()
-
-    return None
+    engine = _engine_for(speaker_id, core_version)
+    cache = get_tts_cache()
+    key = make_cache_key(engine.name, engine.voice_id, text)
+    wav_data = cache.get(key)
+    if wav_data:
+        return wav_data
+
+    start = time.perf_counter()
+    wav_data, used_engine = engine.synthesize(text)
+    # フォールバックした結果は元のエンジンのキーで保存しない
+    if wav_data and used_engine == engine.name:
+        get_synthesis_latency().record(engine.name, len(text), time.perf_counter() - start)
+        cache.put(key, wav_data)
+    return wav_data
+
+
+def generate_speech_stream(text, speaker_id=46, core_version=None):
+    """
+    generate_speech_data のストリーミング版。
+    ストリーミング合成に対応したエンジンでは、受信中の tts_stream.StreamingAudio を返す
+    （最後まで受信できたらキャッシュに保存する）。キャッシュヒット・非対応エンジンでは WAVデータを返す。
+    """
+    engine = _engine_for(speaker_id, core_version)
+    if not hasattr(engine, "synthesize_stream"):
+        return generate_speech_data(text, speaker_id, core_version)
+
+    cache = get_tts_cache()
+    key = make_cache_key(engine.name, engine.voice_id, text)
+    wav_data = cache.get(key)
+    if wav_data:
+        return wav_data
+
+    start = time.perf_counter()
+
+    def _on_complete(wav):
+        get_synthesis_latency().record(engine.name, len(text), time.perf_counter() - start)
+        cache.put(key, wav)
+
+    # StreamingAudio は最後まで受信できたときに _on_complete で記録・保存する
+    result, used_engine = engine.synthesize_stream(text, on_complete=_on_complete)
+    if not isinstance(result, StreamingAudio) and result and used_engine == engine.name:
+        get_synthesis_latency().record(engine.name, len(text), time.perf_counter() - start)
+        cache.put(key, result)
+    return result
 
 def text_to_speech_kokoro(text):
     """
@@ -140,63 +145,32 @@ def play_wav_data(wav_data, volume=1.0):
     """
     WAVデータを再生する。
     volume: 0.0 〜 1.0 (またはそれ以上) の倍率
+    出力ストリームは常駐エンジンで開いたまま使い回す。
     """
     # 再生開始時に停止フラグを強制リセット
     stop_playback_event.clear()
     try:
-        import numpy as np
-        
-        wf = wave.open(io.BytesIO(wav_data), 'rb')
-        sample_width = wf.getsampwidth()
-        channels = wf.getnchannels()
-        rate = wf.getframerate()
-        
-        p_audio = pyaudio.PyAudio()
-        stream = p_audio.open(format=p_audio.get_format_from_width(sample_width),
-                        channels=channels,
-                        rate=rate,
-                        output=True)
-
-        # チャンクごとに処理
-        chunk_size = 1024
-        data = wf.readframes(chunk_size)
-        
-        while data:
-            if stop_playback_event.is_set():
-                print("音声再生を中断しました。")
-                break
-            
-            # 音量調整が必要な場合 (1.0以外)
-            if volume != 1.0:
-                # バイナリデータを数値配列に変換
-                if sample_width == 2: # 16-bit
-                    audio_array = np.frombuffer(data, dtype=np.int16).astype(np.float32)
-                    audio_array *= volume
-                    # オーバーフロー防止
-                    audio_array = np.clip(audio_array, -32768, 32767)
-                    data = audio_array.astype(np.int16).tobytes()
-                elif sample_width == 1: # 8-bit
-                    audio_array = np.frombuffer(data, dtype=np.uint8).astype(np.float32)
-                    audio_array = (audio_array - 128) * volume + 128
-                    audio_array = np.clip(audio_array, 0, 255)
-                    data = audio_array.astype(np.uint8).tobytes()
-
-            stream.write(data)
-            data = wf.readframes(chunk_size)
-
-        stream.stop_stream()
-        stream.close()
-        p_audio.terminate()
-
+        get_output_engine().play(wav_data, volume=volume, stop_event=stop_playback_event)
     except wave.Error as e:
         print(f"WAVデータエラー: {e}")
     except Exception as e:
         print(f"PyAudioエラー: {e}")
 
+def preload_earcons(settings_manager=None):
+    """頷き音などをデコードしてメモリに置き、専用の低遅延ストリームを開いておく"""
+    return init_earcons(settings_manager)
+
+
 def play_random_nod():
     """
-    wav/nod ディレクトリからランダムにWAVファイルを選び、再生する。
+    頷き音をランダムに1つ鳴らす。
+    preload_earcons 済みならメモリ上の PCM を専用ストリームで鳴らしてすぐ戻る。
     """
+    player = get_earcon_player()
+    if player is not None and player.play_random():
+        # play_wav_data と同じく、鳴らした時点で停止フラグを解除する（ストップワード後の応答を再び再生させる）
+        stop_playback_event.clear()
+        return
     try:
         # パスを確実に取得
         base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -228,7 +202,14 @@ def play_random_nod():
 def play_wav_file(filepath):
     """
     指定されたWAVファイルを再生する。
+    読み込み済みの earcon ならメモリ上の PCM を専用ストリームで鳴らす。
     """
+    player = get_earcon_player()
+    if player is not None:
+        name = player.name_for_path(filepath)
+        if name is not None and player.play(name):
+            stop_playback_event.clear()
+            return
     try:
         with open(filepath, 'rb') as f:
             wav_data = f.read()
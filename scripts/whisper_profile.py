@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import time
+import logging
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import numpy as np
+
+# Windows でのスレッド単位のアフィニティ指定用（optional）
+try:
+    import win32api  # type: ignore
+    import win32process  # type: ignore
+    _HAS_WIN32 = True
+except Exception:
+    _HAS_WIN32 = False
+
+GPU_COMPUTE_TYPE = "int8_float16"
+CPU_COMPUTE_TYPE = "int8"
+
+
+@dataclass
+class WhisperProfile:
+    """WhisperModel に渡す実行プロファイル"""
+    device: str
+    compute_type: str
+    cpu_threads: int = 0       # 0 = CTranslate2 の既定
+    num_workers: int = 1
+    cpu_affinity: Optional[List[int]] = field(default=None)
+
+    def describe(self):
+        text = f"{self.device}/{self.compute_type}"
+        if self.device == "cpu":
+            text += f", cpu_threads={self.cpu_threads}, num_workers={self.num_workers}"
+            if self.cpu_affinity:
+                text += f", affinity={self.cpu_affinity}"
+        return text
+
+
+def cuda_available():
+    """CTranslate2 から CUDA デバイスが見えるか"""
+    try:
+        import ctranslate2
+        return ctranslate2.get_cuda_device_count() > 0
+    except Exception as e:
+        logging.debug(f"CUDA detection failed: {e}")
+        return False
+
+
+def default_cpu_threads():
+    """
+    CPU推論時のスレッド数。llama.cpp の要約 (n_threads=8) や埋め込みモデルと
+    コアを取り合わないよう、論理コアの半分・最大4に抑える。
+    """
+    return max(1, min(4, (os.cpu_count() or 2) // 2))
+
+
+def resolve_profile(device="auto", compute_type="auto", cpu_threads=0, num_workers=1, cpu_affinity=None):
+    """
+    設定値から WhisperProfile を決める。
+    device="auto": CUDA があれば cuda、無ければ cpu
+    compute_type="auto": cuda なら int8_float16、cpu なら int8
+    """
+    if device == "auto":
+        device = "cuda" if cuda_available() else "cpu"
+    elif device == "cuda" and not cuda_available():
+        logging.warning("CUDA was requested for Whisper but no device was found. Falling back to CPU.")
+        device = "cpu"
+        if compute_type not in ("auto", CPU_COMPUTE_TYPE, "int8_float32", "float32"):
+            compute_type = "auto"
+
+    if compute_type == "auto":
+        compute_type = GPU_COMPUTE_TYPE if device == "cuda" else CPU_COMPUTE_TYPE
+
+    if device == "cpu":
+        cpu_threads = int(cpu_threads) or default_cpu_threads()
+        if cpu_affinity:
+            available = get_thread_affinity()
+            cpu_affinity = [c for c in cpu_affinity if available is None or c in available] or None
+    else:
+        cpu_threads = int(cpu_threads)
+        cpu_affinity = None
+
+    return WhisperProfile(device, compute_type, cpu_threads, max(1, int(num_workers)), cpu_affinity)
+
+
+def get_thread_affinity():
+    """呼び出し元スレッドのアフィニティ（取得できない環境では None）"""
+    if hasattr(os, "sched_getaffinity"):
+        return set(os.sched_getaffinity(0))
+    return None
+
+
+def set_thread_affinity(cores):
+    """
+    呼び出し元スレッドを cores に固定する。
+    Linux: sched_setaffinity(0) は呼び出し元スレッドだけに効き、以降そのスレッドが作るスレッドにも継承される。
+    Windows: pywin32 があれば SetThreadAffinityMask で現在のスレッドだけを固定する。
+    """
+    if not cores:
+        return False
+    try:
+        if hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, set(cores))
+            return True
+        if sys.platform == "win32" and _HAS_WIN32:
+            mask = 0
+            for c in cores:
+                mask |= 1 << c
+            win32process.SetThreadAffinityMask(win32api.GetCurrentThread(), mask)
+            return True
+    except Exception as e:
+        logging.warning(f"Failed to set thread affinity {list(cores)}: {e}")
+        return False
+    logging.debug("Thread affinity is not supported on this platform.")
+    return False
+
+
+@contextmanager
+def pinned_affinity(cores):
+    """
+    with の間だけ呼び出し元スレッドを cores に固定する。
+    CTranslate2 はモデル生成時に推論スレッドを作るため、ロードをこの中で行うとスレッドプールごと固定される。
+    """
+    previous = get_thread_affinity() if cores else None
+    pinned = set_thread_affinity(cores)
+    try:
+        yield pinned
+    finally:
+        if pinned and previous:
+            set_thread_affinity(previous)
+
+
+def measure_rtf(model, seconds=2.0, sample_rate=16000):
+    """
+    弱いノイズを seconds 秒デコードして実時間比 (処理時間 / 音声長) を返す。
+    初回デコードの初期化コストも含むため、起動時のウォームアップを兼ねる。
+    """
+    rng = np.random.default_rng(0)
+    audio = (rng.standard_normal(int(sample_rate * seconds)) * 0.001).astype(np.float32)
+    start = time.perf_counter()
+    segments, _ = model.transcribe(audio, language="ja", beam_size=1)
+    for _ in segments:
+        pass
+    return (time.perf_counter() - start) / seconds
+
+
+def profile_from_settings(settings_manager=None, **overrides):
+    """asr_device / asr_compute_type / asr_cpu_threads / asr_num_workers / asr_cpu_affinity から解決する"""
+    def _setting(key, default):
+        if key in overrides:
+            return overrides[key]
+        return settings_manager.get(key, default) if settings_manager else default
+
+    return resolve_profile(
+        device=_setting("asr_device", "auto"),
+        compute_type=_setting("asr_compute_type", "auto"),
+        cpu_threads=_setting("asr_cpu_threads", 0),
+        num_workers=_setting("asr_num_workers", 1),
+        cpu_affinity=_setting("asr_cpu_affinity", None),
+    )
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+import logging
+import threading
+
+from scripts.whisper_profile import pinned_affinity, measure_rtf
+
+# プロセス全体で共有する WhisperModel
+# (model, device, compute_type) -> _Entry
+_entries = {}
+_lock = threading.Lock()
+
+LOCAL_MODEL_PATH = "./models/kotoba-whisper-v2.0-faster"
+
+
+class _Entry:
+    """ロード中・ロード済みのモデル1つ分。ready が立つまで他のスレッドは待つ"""
+    def __init__(self):
+        self.ready = threading.Event()
+        self.model = None
+        self.error = None
+        self.load_sec = None
+        self.warmup_rtf = None
+
+
+def resolve_model_path(model_size):
+    """ローカルにモデルがあればそのパスを使う"""
+    if os.path.exists(LOCAL_MODEL_PATH) and os.listdir(LOCAL_MODEL_PATH):
+        return LOCAL_MODEL_PATH
+    return model_size
+
+
+def _key(model_size, profile):
+    return (resolve_model_path(model_size), profile.device, profile.compute_type)
+
+
+def _load(key, entry, profile):
+    from faster_whisper import WhisperModel
+
+    model_path, device, compute_type = key
+    # faster-whisperのログを抑制
+    logging.getLogger("faster_whisper").setLevel(logging.WARNING)
+    if model_path == LOCAL_MODEL_PATH:
+        logging.info(f"Loading local Whisper model from: {model_path}")
+    else:
+        logging.info(f"Local model not found. Downloading from HF: {model_path}")
+    try:
+        start = time.perf_counter()
+        # CTranslate2 の推論スレッドはモデル生成時に作られるので、固定する場合はロード中だけピン留めする
+        with pinned_affinity(profile.cpu_affinity):
+            model = WhisperModel(
+                model_path,
+                device=device,
+                compute_type=compute_type,
+                cpu_threads=profile.cpu_threads,
+                num_workers=profile.num_workers,
+            )
+            entry.load_sec = time.perf_counter() - start
+            # 無音をデコードして CUDA / CTranslate2 の初期化を済ませておく
+            entry.warmup_rtf = measure_rtf(model)
+        entry.model = model
+        logging.info(f"Whisper model ready: {model_path} ({profile.describe()}, "
+                     f"load {entry.load_sec:.1f}s, warm-up RTF {entry.warmup_rtf:.2f})")
+    except Exception as e:
+        entry.error = e
+        logging.error(f"Failed to load Whisper model {model_path}: {e}")
+        with _lock:
+            # 次回の get_model で再試行できるよう登録を外す
+            if _entries.get(key) is entry:
+                del _entries[key]
+    finally:
+        entry.ready.set()
+
+
+def _acquire(model_size, profile):
+    """エントリを取得し、自分がロード担当になった場合は True を返す"""
+    key = _key(model_size, profile)
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None:
+            return key, entry, False
+        entry = _Entry()
+        _entries[key] = entry
+        return key, entry, True
+
+
+def preload(model_size, profile):
+    """バックグラウンドでロードとウォームアップを開始する（ロード中・ロード済みなら何もしない）"""
+    key, entry, owner = _acquire(model_size, profile)
+    if owner:
+        threading.Thread(target=_load, args=(key, entry, profile), daemon=True, name="WhisperPreload").start()
+    return entry
+
+
+def get_model(model_size, profile):
+    """
+    ウォームアップ済みの WhisperModel を返す。
+    未ロードならこのスレッドでロードし、他のスレッドがロード中なら完了を待つ。
+    """
+    key, entry, owner = _acquire(model_size, profile)
+    if owner:
+        _load(key, entry, profile)
+    elif not entry.ready.is_set():
+        logging.info(f"Waiting for Whisper model preload: {key[0]}")
+        entry.ready.wait()
+    if entry.error is not None:
+        raise entry.error
+    return entry.model, entry.warmup_rtf
+
+
+def get_stats():
+    """ロード済みモデルの一覧（ログ用）"""
+    with _lock:
+        items = list(_entries.items())
+    return {
+        f"{path} ({device}/{compute_type})": {
+            "ready": entry.ready.is_set() and entry.error is None,
+            "load_sec": round(entry.load_sec, 1) if entry.load_sec is not None else None,
+            "warmup_rtf": round(entry.warmup_rtf, 2) if entry.warmup_rtf is not None else None,
+        }
+        for (path, device, compute_type), entry in items
+    }